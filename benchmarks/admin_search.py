@@ -0,0 +1,147 @@
+"""Admin changelist searches at the scale of millions of comments.
+
+    python -m benchmarks.admin_search --comments 5000000
+
+Every lookup is a full request of the comment or post changelist
+by a logged in superuser. Its queries, the search, the bounded count,
+the page and the date hierarchy, are timed apart from the request:
+the rendering of a page of 100 rows costs the same whatever found
+them. The script exits with 1 when the p95 of the queries of a lookup
+is over --budget milliseconds. Words found in most posts are
+reported, not held to the budget: every query of their page reads
+the whole doclist of the word from the full-text index. Seeding 5M
+comments into the in-memory database takes a while and a few
+gigabytes.
+"""
+import argparse
+import json
+import logging
+import sys
+from urllib.parse import parse_qsl
+
+from benchmarks.utils import measure, setup_django, summary
+
+PREFIX = 'bench'
+# the seeded texts draw on 15 words, each in most posts; a word
+# of its own is given to a few posts with their comments
+RARE_WORD = 'маяк'
+RARE_POSTS = 20
+RARE_COMMENTS = 50
+BROAD = ('comments by a common word', 'posts by common words')
+
+
+class Collector(logging.Handler):
+    """To keep db_ms of every request from core.metrics"""
+
+    def __init__(self):
+        super().__init__(logging.INFO)
+        self.db_ms = []
+
+    def emit(self, record):
+        if record.levelno == logging.INFO:
+            self.db_ms.append(json.loads(record.getMessage())['db_ms'])
+
+
+def add_rare_word(author):
+    from posts.models import Comment, Post
+
+    for number in range(RARE_POSTS):
+        # created one by one, so signals index them
+        post = Post.objects.create(author=author,
+                                   text=f'{RARE_WORD} {number}')
+        Comment.objects.bulk_create(
+            Comment(post=post, author=author, text='Комментарий')
+            for _ in range(RARE_COMMENTS)
+        )
+
+
+def lookups(post_id, month):
+    """(changelist, query parameters) by name"""
+    return {
+        'comments, first page': ('comment', {}),
+        'comments, next page': ('comment', None),
+        'comments by post id': ('comment', {'q': str(post_id)}),
+        'comments by author': ('comment', {'q': f'@{PREFIX}1234'}),
+        'comments by author and post': ('comment', {
+            'q': f'@{PREFIX}12 {post_id}',
+        }),
+        'comments by a rare word': ('comment', {'q': RARE_WORD}),
+        'comments by a common word': ('comment', {'q': 'море'}),
+        'comments by month': ('comment', {
+            'created__year': month.year, 'created__month': month.month,
+        }),
+        'posts by id': ('post', {'q': str(post_id)}),
+        'posts by author': ('post', {'q': f'@{PREFIX}1234'}),
+        'posts by a rare word': ('post', {'q': RARE_WORD}),
+        'posts by common words': ('post', {'q': 'море дождь'}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--comments', type=int, default=5000000)
+    parser.add_argument('--posts', type=int, default=200000)
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--budget', type=float, default=100)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test import Client, override_settings
+    from django.urls import reverse
+    from posts.models import Comment, Post, User
+    from posts.seeding import Seeder
+
+    # cached templates, as in production
+    override_settings(DEBUG=False).enable()
+    collector = Collector()
+    metrics_logger = logging.getLogger('core.metrics')
+    metrics_logger.handlers = [collector]
+    metrics_logger.setLevel(logging.INFO)
+    report = Seeder(batch_size=20000, raw=True, prefix=PREFIX).seed(
+        args.users, 10, args.posts, args.comments, 0
+    )
+    admin = User.objects.create_superuser('admin', 'admin@example.com',
+                                          'password')
+    add_rare_word(admin)
+    client = Client()
+    client.force_login(admin)
+    post_id = Post.objects.order_by('-created').values_list(
+        'pk', flat=True
+    )[args.posts // 2]
+    month = Comment.objects.latest('created').created
+
+    def get(model, params):
+        response = client.get(reverse(f'admin:posts_{model}_changelist'),
+                              params)
+        assert response.status_code == 200, response.status_code
+        return response
+
+    result = {
+        'comments': args.comments,
+        'posts': args.posts,
+        'seeding, s': {table: round(seconds, 1)
+                       for table, (rows, seconds) in report.items()},
+    }
+    slow = []
+    for name, (model, params) in lookups(post_id, month).items():
+        if params is None:
+            # the cursor of the first page, read once
+            params = dict(parse_qsl(
+                get(model, {}).context['cl'].next_page_url[1:]
+            ))
+        get(model, params)
+        collector.db_ms.clear()
+        timings = measure(lambda: get(model, params), args.repeat)
+        queries = summary(collector.db_ms)
+        result[name] = {'request': summary(timings), 'queries': queries}
+        if name not in BROAD and queries['p95'] > args.budget:
+            slow.append(name)
+    result['over budget'] = slow
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    if slow:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Comment blacklist: the former replace() loop against the
+compiled trie regex of posts.blacklist.
+
+    python -m benchmarks.blacklist --length 2000
+
+Terms are random cyrillic words, the comment is random words
+with a few banned ones mixed in.
+"""
+import argparse
+import json
+import random
+import time
+
+from benchmarks.utils import measure, setup_django, summary
+
+TERMS = (10, 1000, 50000)
+LETTERS = 'абвгдеёжзийклмнопрстуфхцчшщъыьэюя'
+MASK = '******'
+
+
+def random_word(rand):
+    return ''.join(rand.choice(LETTERS) for _ in range(rand.randint(4, 10)))
+
+
+def comment(rand, words, length):
+    parts = []
+    while sum(len(part) + 1 for part in parts) < length:
+        if rand.random() < 0.02:
+            parts.append(rand.choice(words).capitalize())
+        else:
+            parts.append(random_word(rand))
+    return ' '.join(parts)
+
+
+def replace_loop(text, words):
+    text = text.lower()
+    for word in words:
+        text = text.replace(word, MASK)
+    return text.capitalize()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--length', type=int, default=2000,
+                        help='characters in the comment')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django(database=False)
+    from posts.blacklist import compile_pattern, mask_with
+
+    rand = random.Random(0)
+    result = {'length': args.length}
+    for count in TERMS:
+        words = sorted({random_word(rand) for _ in range(count)})
+        text = comment(rand, words, args.length)
+        start = time.perf_counter()
+        pattern = compile_pattern(words)
+        build = (time.perf_counter() - start) * 1000
+        result[f'{count} terms'] = {
+            'replace loop': summary(measure(
+                lambda: replace_loop(text, words), args.repeat
+            )),
+            'trie regex': summary(measure(
+                lambda: mask_with(pattern, text), args.repeat
+            )),
+            'trie build ms': round(build, 3),
+        }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Fragment cache hit rate of per-process LocMemCache against the
+shared SQLiteCache when requests are spread over several workers.
+
+    python -m benchmarks.cache_workers --requests 8000 --pages 200
+
+Every worker serves its share of requests for random feed pages:
+a miss "renders" the fragment and stores it, as feed_cache does.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from benchmarks.utils import setup_django
+
+WORKERS = (1, 4, 16)
+FRAGMENT = '<article>' + 'x' * 4000 + '</article>'
+
+
+def serve(backend, location, requests, pages, seed, results):
+    from django.core.cache.backends.locmem import LocMemCache
+    from core.cache import SQLiteCache
+
+    if backend == 'sqlite':
+        cache = SQLiteCache(location, {'TIMEOUT': None})
+    else:
+        cache = LocMemCache(location, {'TIMEOUT': None})
+    rand = random.Random(seed)
+    hits = 0
+    for _ in range(requests):
+        key = f'index_page:{rand.randrange(pages)}'
+        if cache.get(key) is None:
+            cache.set(key, FRAGMENT)
+        else:
+            hits += 1
+    results.put(hits)
+
+
+def run(backend, workers, requests, pages):
+    tmp_dir = tempfile.mkdtemp()
+    location = os.path.join(tmp_dir, 'cache.sqlite3')
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(
+            target=serve,
+            args=(backend, location, requests // workers, pages, seed,
+                  results),
+        ) for seed in range(workers)
+    ]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    hits = sum(results.get() for _ in processes)
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - start
+    shutil.rmtree(tmp_dir)
+    total = requests // workers * workers
+    return {
+        'hit_rate': round(hits / total, 3),
+        'requests_per_second': round(total / elapsed),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=8000)
+    parser.add_argument('--pages', type=int, default=200)
+    args = parser.parse_args()
+
+    setup_django(database=False)
+    result = {}
+    for workers in WORKERS:
+        result[f'{workers} workers'] = {
+            backend: run(backend, workers, args.requests, args.pages)
+            for backend in ('locmem', 'sqlite')
+        }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Synthetic yatube data for the benchmarks.
+
+Rows are written by posts.seeding, then a share of the posts gets
+one of a few generated images, whose thumbnails are rendered once
+per distinct file.
+"""
+import os
+import random
+
+SCALES = {
+    '10k': {'users': 1000, 'groups': 20, 'posts': 10000,
+            'comments': 30000, 'follows': 10, 'images': 500},
+    '1m': {'users': 50000, 'groups': 200, 'posts': 1000000,
+           'comments': 3000000, 'follows': 20, 'images': 10000},
+}
+IMAGE_FILES = 8
+IMAGE_SIZE = (1280, 853)
+
+
+def make_images(directory):
+    """To write IMAGE_FILES gradient JPEGs, returns their storage names"""
+    from PIL import Image
+
+    os.makedirs(os.path.join(directory, 'posts'), exist_ok=True)
+    names = []
+    for number in range(IMAGE_FILES):
+        image = Image.linear_gradient('L').resize(IMAGE_SIZE).convert('RGB')
+        image = Image.merge('RGB', [
+            channel.point(lambda value, shift=shift: (value + shift) % 256)
+            for shift, channel in zip((0, number * 30, number * 60),
+                                      image.split())
+        ])
+        name = f'posts/bench_{number}.jpg'
+        image.save(os.path.join(directory, name), quality=90)
+        names.append(name)
+    return names
+
+
+def generate(users, groups, posts, comments, follows, images, seed=0):
+    """To fill the empty database, returns ids to aim requests at"""
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from posts import images as post_images
+    from posts.models import Group, Post
+    from posts.seeding import Seeder
+
+    Seeder(raw=True, seed=seed).seed(
+        users=users, groups=groups, posts=posts,
+        comments=comments, follows=follows,
+    )
+    rand = random.Random(seed)
+    post_ids = list(Post.objects.values_list('pk', flat=True))
+    with_images = rand.sample(post_ids, min(images, len(post_ids)))
+    names = make_images(settings.MEDIA_ROOT) if with_images else []
+    for number, name in enumerate(names):
+        share = with_images[number::len(names)]
+        # SQLite takes at most 999 parameters per statement
+        for start in range(0, len(share), 500):
+            Post.objects.filter(
+                pk__in=share[start:start + 500]
+            ).update(image=name)
+        # render once, share the urls with every post of the file
+        post = Post.objects.filter(image=name).first()
+        post_images.generate_thumbnail(post.pk)
+        post.refresh_from_db()
+        Post.objects.filter(image=name).update(
+            thumbnail_url=post.thumbnail_url,
+            image_sources=post.image_sources,
+        )
+    return {
+        'users': rand.sample(
+            list(get_user_model().objects.values_list('pk', flat=True)),
+            min(100, users)
+        ),
+        'groups': list(Group.objects.values_list('slug', flat=True)),
+        'posts': rand.sample(post_ids, min(100, len(post_ids))),
+    }
@@ -0,0 +1,110 @@
+"""Bytes of thumbnails downloaded for one feed page, the single
+960px thumbnail against the srcset variants.
+
+    python -m benchmarks.image_bytes --posts 10
+
+A client is described by its viewport width and pixel ratio, it
+takes the first source (modern formats come first) and the
+smallest candidate covering the rendered width, as browsers do.
+"""
+import argparse
+import json
+import random
+import shutil
+import tempfile
+from io import BytesIO
+
+from benchmarks.utils import setup_django
+
+CLIENTS = {
+    'small phone': (320, 1),
+    'phone': (360, 2),
+    'tablet': (768, 1),
+    'desktop': (1280, 1),
+}
+CARD_WIDTH = 960
+
+
+def photo(seed):
+    """To draw a noisy gradient that compresses like a photo"""
+    from PIL import Image
+
+    rand = random.Random(seed)
+    image = Image.linear_gradient('L').resize((1600, 1200)).convert('RGB')
+    noise = Image.effect_noise((1600, 1200), 40).convert('RGB')
+    tint = Image.new('RGB', (1600, 1200), tuple(
+        rand.randrange(256) for _ in range(3)
+    ))
+    image = Image.blend(Image.blend(image, noise, 0.3), tint, 0.3)
+    data = BytesIO()
+    image.save(data, 'JPEG', quality=90)
+    return data.getvalue()
+
+
+def size(url):
+    from django.conf import settings
+    from django.core.files.storage import default_storage
+
+    return default_storage.size(url[len(settings.MEDIA_URL):])
+
+
+def pick(srcset, width):
+    candidates = sorted(
+        (int(descriptor[:-1]), url) for url, descriptor in
+        (candidate.rsplit(' ', 1) for candidate in srcset.split(', '))
+    )
+    for candidate_width, url in candidates:
+        if candidate_width >= width:
+            return url
+    return candidates[-1][1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--posts', type=int, default=10)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth import get_user_model
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from django.test import override_settings
+    from posts.images import generate_thumbnail, variant_formats
+    from posts.models import Post
+
+    media_root = tempfile.mkdtemp()
+    try:
+        with override_settings(MEDIA_ROOT=media_root):
+            author = get_user_model().objects.create_user(username='bench')
+            for i in range(args.posts):
+                post = Post.objects.create(
+                    author=author,
+                    text=f'Пост {i}',
+                    image=SimpleUploadedFile(
+                        f'photo_{i}.jpg', photo(i), 'image/jpeg'
+                    ),
+                )
+                generate_thumbnail(post.pk)
+            posts = list(Post.objects.all())
+            before = sum(size(post.thumbnail_url) for post in posts)
+            result = {
+                'posts': args.posts,
+                'formats': variant_formats(),
+                'before': before,
+            }
+            for client, (viewport, ratio) in CLIENTS.items():
+                width = min(viewport, CARD_WIDTH) * ratio
+                after = sum(
+                    size(pick(next(iter(post.sources.values())), width))
+                    for post in posts
+                )
+                result[client] = {
+                    'bytes': after,
+                    'saved': round(1 - after / before, 3),
+                }
+    finally:
+        shutil.rmtree(media_root, ignore_errors=True)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+"""Latency, throughput and query counts of the posts views, driven
+through the WSGI application in-process.
+
+    python -m benchmarks.load --scale 10k
+    python -m benchmarks.load --scale 10k --save-baseline
+
+The database is filled by benchmarks.data, every request goes
+through the whole middleware stack, query counts come from the
+core.metrics log. Each view is compared with the stored baseline
+of the same scale: a p95 slower than the baseline by more than
+--tolerance or more queries than the baseline is a regression
+and the script exits with 1. Timings only compare on the machine
+that recorded the baseline, query counts compare everywhere.
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+from wsgiref.util import setup_testing_defaults
+
+from benchmarks.data import SCALES, generate
+from benchmarks.utils import setup_django, summary
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'baseline.json')
+
+
+class Collector(logging.Handler):
+    """To keep the query count of the last request from core.metrics"""
+
+    def __init__(self):
+        super().__init__(logging.INFO)
+        self.queries = None
+
+    def emit(self, record):
+        if record.levelno == logging.INFO:
+            self.queries = json.loads(record.getMessage())['queries']
+
+
+class WSGIClient:
+    """Calls the WSGI application directly, keeping cookies"""
+
+    def __init__(self, app):
+        self.app = app
+        self.cookies = SimpleCookie()
+
+    def request(self, method, path, data=None):
+        body = urlencode(data or {}).encode()
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': io.BytesIO(body),
+            'HTTP_COOKIE': '; '.join(
+                f'{key}={morsel.value}' for key, morsel in self.cookies.items()
+            ),
+        }
+        if 'csrftoken' in self.cookies:
+            environ['HTTP_X_CSRFTOKEN'] = self.cookies['csrftoken'].value
+        setup_testing_defaults(environ)
+        status = []
+
+        def start_response(response_status, headers, exc_info=None):
+            status.append(int(response_status.split()[0]))
+            for name, value in headers:
+                if name.lower() == 'set-cookie':
+                    self.cookies.load(value)
+
+        response = self.app(environ, start_response)
+        try:
+            b''.join(response)
+        finally:
+            response.close()
+        return status[0]
+
+
+def login(app, user):
+    from django.test import Client
+
+    client = WSGIClient(app)
+    django_client = Client()
+    django_client.force_login(user)
+    client.cookies.update(django_client.cookies)
+    # any page with a form sets the csrftoken cookie
+    client.request('GET', '/create/')
+    return client
+
+
+def scenarios(targets, rand):
+    """To return {view: function returning (method, path, data)}"""
+    from posts.models import User
+
+    usernames = dict(User.objects.filter(
+        pk__in=targets['users']
+    ).values_list('pk', 'username'))
+    return {
+        'index': lambda: ('GET', '/', None),
+        'group_posts': lambda: (
+            'GET', f'/group/{rand.choice(targets["groups"])}/', None
+        ),
+        'profile': lambda: (
+            'GET', f'/profile/{usernames[rand.choice(targets["users"])]}/',
+            None
+        ),
+        'post_detail': lambda: (
+            'GET', f'/posts/{rand.choice(targets["posts"])}/', None
+        ),
+        'follow_index': lambda: ('GET', '/follow/', None),
+        'post_create': lambda: (
+            'POST', '/create/', {'text': f'Новый пост {rand.random()}'}
+        ),
+        'add_comment': lambda: (
+            'POST', f'/posts/{rand.choice(targets["posts"])}/comment/',
+            {'text': 'Комментарий'}
+        ),
+    }
+
+
+def run(client, collector, scenario, requests, warmup):
+    for _ in range(warmup):
+        client.request(*scenario())
+    timings, queries = [], []
+    for _ in range(requests):
+        method, path, data = scenario()
+        start = time.perf_counter()
+        status = client.request(method, path, data)
+        timings.append((time.perf_counter() - start) * 1000)
+        if status >= 400:
+            raise RuntimeError(f'{method} {path} answered {status}')
+        queries.append(collector.queries)
+    return {
+        **summary(timings),
+        'rps': round(len(timings) / sum(timings) * 1000, 1),
+        'queries': {'p50': sorted(queries)[len(queries) // 2],
+                    'max': max(queries)},
+    }
+
+
+def regressions(result, baseline, tolerance):
+    found = []
+    for view, measured in result.items():
+        base = baseline.get(view)
+        if base is None:
+            continue
+        if measured['p95'] > base['p95'] * (1 + tolerance):
+            found.append(f'{view}: p95 {measured["p95"]} ms, '
+                         f'baseline {base["p95"]} ms')
+        if measured['queries']['max'] > base['queries']['max']:
+            found.append(f'{view}: {measured["queries"]["max"]} queries, '
+                         f'baseline {base["queries"]["max"]}')
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scale', choices=SCALES, default='10k')
+    parser.add_argument('--requests', type=int, default=200,
+                        help='measured requests per view')
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed share of p95 above the baseline')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth import get_user_model
+    from django.core.wsgi import get_wsgi_application
+    from django.test import override_settings
+
+    media = tempfile.mkdtemp()
+    # one process sees every invalidation, its cache is as good as
+    # shared and the cached entries keep their long timeouts
+    override_settings(DEBUG=False, MEDIA_ROOT=media,
+                      CACHE_SHARED=True).enable()
+    # django.setup() again, it would replace the handlers set below
+    app = get_wsgi_application()
+    collector = Collector()
+    metrics_logger = logging.getLogger('core.metrics')
+    metrics_logger.handlers = [collector]
+    metrics_logger.setLevel(logging.INFO)
+    try:
+        start = time.perf_counter()
+        targets = generate(**SCALES[args.scale])
+        filled = time.perf_counter() - start
+        user = get_user_model().objects.get(pk=targets['users'][0])
+        anonymous, member = WSGIClient(app), login(app, user)
+        rand = random.Random(1)
+        views = {}
+        for view, scenario in scenarios(targets, rand).items():
+            client = member if view in (
+                'follow_index', 'post_create', 'add_comment'
+            ) else anonymous
+            views[view] = run(client, collector, scenario,
+                              args.requests, args.warmup)
+    finally:
+        shutil.rmtree(media, ignore_errors=True)
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baselines = json.load(file)
+    found = regressions(views, baselines.get(args.scale, {}), args.tolerance)
+    print(json.dumps({
+        'scale': args.scale,
+        'fill seconds': round(filled, 1),
+        'views': views,
+        'regressions': found,
+    }, indent=2, ensure_ascii=False))
+    if args.save_baseline:
+        baselines[args.scale] = views
+        with open(args.baseline, 'w') as file:
+            json.dump(baselines, file, indent=2, sort_keys=True)
+            file.write('\n')
+    elif found:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
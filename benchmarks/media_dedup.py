@@ -0,0 +1,112 @@
+"""Disk and thumbnail CPU saved by the content-addressed Post.image.
+
+    python -m benchmarks.media_dedup --uploads 500 --distinct 150
+
+The corpus is drawn the way reposts spread: upload i picks one of
+--distinct photos with a Zipf weight 1 / rank ** --skew, so a few
+memes come back again and again and most photos once. Every upload
+is processed as the thumbnail workers do it, cleaned and rendered
+with its variants, once with a plain FileSystemStorage, once with
+the content-addressed one. CPU is the process time spent there.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from benchmarks.image_bytes import photo
+from benchmarks.utils import setup_django
+
+
+def disk(directory):
+    """(files, bytes) under directory"""
+    files = total = 0
+    for root, _, names in os.walk(directory):
+        for name in names:
+            files += 1
+            total += os.path.getsize(os.path.join(root, name))
+    return files, total
+
+
+def corpus(uploads, distinct, skew, seed=0):
+    rand = random.Random(seed)
+    weights = [1 / rank ** skew for rank in range(1, distinct + 1)]
+    return rand.choices(range(distinct), weights, k=uploads)
+
+
+def run(storage, picks, photos):
+    from django.core.cache import caches
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from django.test import override_settings
+    from posts.images import process_image
+    from posts.models import Post, User
+    from sorl.thumbnail.kvstores.cached_db_kvstore import KVStoreModel
+
+    field = Post._meta.get_field('image')
+    field.storage, default = storage, field.storage
+    media_root = tempfile.mkdtemp()
+    caches['default'].clear()
+    caches['thumbnails'].clear()
+    KVStoreModel.objects.all().delete()
+    author = User.objects.get_or_create(username='bench')[0]
+    cpu = 0
+    try:
+        with override_settings(MEDIA_ROOT=media_root):
+            for number, pick in enumerate(picks):
+                post = Post.objects.create(
+                    author=author, text=f'Пост {number}', image_pending=True,
+                    image=SimpleUploadedFile(f'photo_{pick}.jpg',
+                                             photos[pick], 'image/jpeg'),
+                )
+                started = time.process_time()
+                process_image(post.pk)
+                cpu += time.process_time() - started
+            images = disk(os.path.join(media_root, 'posts'))
+            thumbnails = disk(os.path.join(media_root, 'cache'))
+    finally:
+        field.storage = default
+        shutil.rmtree(media_root, ignore_errors=True)
+    return {
+        'image files': images[0],
+        'image bytes': images[1],
+        'thumbnail files': thumbnails[0],
+        'thumbnail bytes': thumbnails[1],
+        'cpu, s': round(cpu, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--uploads', type=int, default=500)
+    parser.add_argument('--distinct', type=int, default=150)
+    parser.add_argument('--skew', type=float, default=1.1)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.files.storage import FileSystemStorage
+    from django.test import override_settings
+    from core.storage import ContentAddressedStorage
+
+    picks = corpus(args.uploads, args.distinct, args.skew)
+    photos = {pick: photo(pick) for pick in set(picks)}
+    with override_settings(THUMBNAIL_WORKERS=0):
+        before = run(FileSystemStorage(), picks, photos)
+        after = run(ContentAddressedStorage(), picks, photos)
+    result = {
+        'uploads': args.uploads,
+        'distinct uploaded': len(photos),
+        'filesystem': before,
+        'content-addressed': after,
+        'saved': {
+            key: round(1 - after[key] / before[key], 3)
+            for key in ('image bytes', 'thumbnail bytes', 'cpu, s')
+        },
+    }
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+"""Throughput of MEDIA_URL, django.views.static.serve as DEBUG served
+it before against core.media.serve_media as a view and in front of
+Django as the MediaFiles WSGI middleware.
+
+    python -m benchmarks.media_serving --clients 8 --requests 300
+
+All three run in the threaded WSGI server of runserver, the way small
+deployments serve media, with --clients connections at a time. The
+files are a feed thumbnail and an uploaded photo under hash names.
+Browsers ask for a range of a photo when resuming or seeking and
+revalidate with both If-None-Match and If-Modified-Since. Under
+gunicorn or uWSGI the whole files of serve_media go through sendfile,
+which wsgiref has not, and with MEDIA_ACCEL they leave Python
+altogether; neither is measured here.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from benchmarks.image_bytes import photo
+from benchmarks.utils import setup_django, summary
+
+RANGE = 64 * 1024
+
+
+def write_files(media_root):
+    """To store a thumbnail and a photo, returns their names"""
+    from PIL import Image
+
+    original = photo(0)
+    thumbnail = BytesIO()
+    Image.open(BytesIO(original)).resize((960, 339)).save(
+        thumbnail, 'JPEG', quality=85
+    )
+    names = {}
+    for kind, content in (('thumbnail', thumbnail.getvalue()),
+                          ('photo', original)):
+        digest = hashlib.sha256(content).hexdigest()
+        names[kind] = f'posts/{digest[:2]}/{digest}.jpg'
+        path = os.path.join(media_root, names[kind])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(content)
+    return names
+
+
+def url_module(name, pattern):
+    """To make a module of one url pattern for ROOT_URLCONF"""
+    module = types.ModuleType(name)
+    module.urlpatterns = [pattern]
+    return module
+
+
+def get(address, path, headers):
+    """To GET path, returns (status, body bytes)"""
+    lines = [f'GET {path} HTTP/1.0', f'Host: {address[0]}',
+             *(f'{name}: {value}' for name, value in headers.items())]
+    with socket.create_connection(address) as client:
+        client.sendall(('\r\n'.join(lines) + '\r\n\r\n').encode())
+        chunks = []
+        while True:
+            data = client.recv(262144)
+            if not data:
+                break
+            chunks.append(data)
+    head, _, body = b''.join(chunks).partition(b'\r\n\r\n')
+    return int(head.split()[1]), len(body)
+
+
+def validators(address, path):
+    from django.utils.http import http_date
+
+    with socket.create_connection(address) as client:
+        client.sendall(f'HEAD {path} HTTP/1.0\r\n\r\n'.encode())
+        head = client.makefile('rb').read().decode('latin-1')
+    fields = dict(line.split(': ', 1) for line in head.splitlines()[1:]
+                  if ': ' in line)
+    return {'If-None-Match': fields.get('ETag', '"none"'),
+            'If-Modified-Since': fields.get('Last-Modified', http_date())}
+
+
+def load(address, path, headers, clients, requests):
+    timings, statuses, sizes = [], set(), []
+
+    def one(_):
+        begin = time.perf_counter()
+        status, size = get(address, path, headers)
+        timings.append((time.perf_counter() - begin) * 1000)
+        statuses.add(status)
+        sizes.append(size)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(one, range(requests)))
+    elapsed = time.perf_counter() - start
+    return {
+        **summary(timings),
+        'rps': round(requests / elapsed, 1),
+        'MB/s': round(sum(sizes) / elapsed / 2 ** 20, 1),
+        'status': sorted(statuses),
+        'bytes per response': round(sum(sizes) / len(sizes)),
+    }
+
+
+def start_server(app):
+    from django.core.servers.basehttp import (ThreadedWSGIServer,
+                                              WSGIRequestHandler)
+
+    server = type('Server', (ThreadedWSGIServer,), {
+        'request_queue_size': 1024,
+    })(('127.0.0.1', 0), WSGIRequestHandler)
+    server.set_app(app)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def urlconf_app(urlconf):
+    """To serve the site with urlconf in place of ROOT_URLCONF"""
+    from django.core.handlers.wsgi import WSGIHandler
+
+    class Handler(WSGIHandler):
+        def get_response(self, request):
+            # as a middleware may route a request
+            request.urlconf = urlconf
+            return super().get_response(request)
+
+    return Handler()
+
+
+def median_run(runs):
+    """The run of median rps, with the rps of every round"""
+    ordered = sorted(runs, key=lambda run: run['rps'])
+    return {**ordered[len(ordered) // 2],
+            'rounds, rps': [run['rps'] for run in runs]}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=300,
+                        help='requests of a case in one round')
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.core.wsgi import get_wsgi_application
+    from django.test import override_settings
+    from django.urls import re_path
+    from django.views.static import serve as static_serve
+
+    from core.media import MediaFiles, serve_media
+
+    logging.getLogger('django.server').setLevel(logging.ERROR)
+    logging.getLogger('core.metrics').setLevel(logging.ERROR)
+    media_root = tempfile.mkdtemp()
+    apps = {
+        'static.serve': urlconf_app(url_module('static_serve', re_path(
+            r'^media/(?P<path>.*)$', static_serve,
+            {'document_root': media_root},
+        ))),
+        'serve_media view': urlconf_app(url_module('serve_media', re_path(
+            r'^media/(?P<path>.*)$', serve_media,
+        ))),
+        'MediaFiles': MediaFiles(get_wsgi_application()),
+    }
+    servers = {}
+    try:
+        with override_settings(DEBUG=False, MEDIA_ROOT=media_root,
+                               MEDIA_ACCEL=None):
+            names = write_files(media_root)
+            servers = {name: start_server(app) for name, app in apps.items()}
+            thumbnail = f'/media/{names["thumbnail"]}'
+            original = f'/media/{names["photo"]}'
+            cases = {
+                'thumbnail': (thumbnail, {}),
+                'photo': (original, {}),
+                'photo, 64 KB range': (original,
+                                       {'Range': f'bytes=0-{RANGE - 1}'}),
+                # with the validators each path gave the browser
+                'thumbnail revalidated': (thumbnail, None),
+            }
+            result = {
+                'clients': args.clients,
+                'block size': settings.MEDIA_BLOCK_SIZE,
+                'file bytes': {kind: os.path.getsize(
+                    os.path.join(media_root, name)
+                ) for kind, name in names.items()},
+            }
+            for case, (path, headers) in cases.items():
+                # rounds take turns, so warming up and noise
+                # fall on every path alike
+                runs = {name: [] for name in servers}
+                for _ in range(args.rounds):
+                    for name, server in servers.items():
+                        address = server.server_address
+                        runs[name].append(load(
+                            address, path,
+                            validators(address, path)
+                            if headers is None else headers,
+                            args.clients, args.requests,
+                        ))
+                result[case] = {name: median_run(name_runs)
+                                for name, name_runs in runs.items()}
+    finally:
+        for server in servers.values():
+            server.shutdown()
+            server.server_close()
+        shutil.rmtree(media_root, ignore_errors=True)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""OFFSET paginator against the keyset paginator.
+
+    python -m benchmarks.pagination --posts 100010
+
+Deep keyset pages are measured the way users reach them,
+through the cursor of the previous page.
+"""
+import argparse
+import json
+
+from benchmarks.utils import measure, setup_django, summary
+
+PAGES = (1, 100, 10000)
+PER_PAGE = 10
+
+
+def fill(posts):
+    from django.contrib.auth import get_user_model
+    from posts.models import Post
+
+    author = get_user_model().objects.create_user(username='bench')
+    batch = 5000
+    for start in range(0, posts, batch):
+        Post.objects.bulk_create(
+            Post(author=author, text=f'Пост {i}')
+            for i in range(start, min(posts, start + batch))
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--posts', type=int, default=PAGES[-1] * PER_PAGE)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.paginator import Paginator
+    from posts.models import Post
+    from posts.paginators import KeysetPaginator, encode_cursor
+
+    fill(args.posts)
+    queryset = Post.objects.select_related('author', 'group')
+    result = {'posts': args.posts}
+    for number in PAGES:
+        if (number - 1) * PER_PAGE >= args.posts:
+            continue
+        cursor = None
+        if number > 1:
+            cursor = encode_cursor(
+                queryset.order_by(*KeysetPaginator.ordering)
+                [(number - 1) * PER_PAGE - 1]
+            )
+
+        def offset_page():
+            list(Paginator(queryset, PER_PAGE).get_page(number))
+
+        def keyset_page():
+            list(KeysetPaginator(
+                queryset, PER_PAGE, after=cursor
+            ).get_page(number))
+
+        result[f'page {number}'] = {
+            'offset': summary(measure(offset_page, args.repeat)),
+            'keyset': summary(measure(keyset_page, args.repeat)),
+        }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
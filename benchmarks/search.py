@@ -0,0 +1,104 @@
+"""LIKE '%term%' scans against the full-text index of posts.search.
+
+    python -m benchmarks.search --posts 1000000
+
+Texts are drawn from a Zipf-distributed vocabulary, so there are
+common, medium and rare words to look for. Each query is timed for
+the admin changelist (filter + count) and for the first two pages
+of the ranked /search/ results, page 2 reached through page 1.
+--python measures the SearchTerm fallback instead of FTS5,
+filling it takes a while.
+"""
+import argparse
+import json
+import random
+from itertools import accumulate
+
+from benchmarks.utils import measure, setup_django, summary
+
+VOCABULARY = 20000
+WORDS_PER_POST = (20, 50)
+BATCH = 10000
+
+
+def word(rank):
+    letters = 'абвгдежзиклмнопрстуфхцчшэюя'
+    name = ''
+    rank += 1
+    while rank:
+        rank, digit = divmod(rank, len(letters))
+        name += letters[digit]
+    return name + 'ка'
+
+
+def fill(posts, rand):
+    from django.contrib.auth import get_user_model
+    from posts.models import Post
+
+    author = get_user_model().objects.create_user(username='bench')
+    cum_weights = list(accumulate(
+        1 / (rank + 1) for rank in range(VOCABULARY)
+    ))
+    vocabulary = [word(rank) for rank in range(VOCABULARY)]
+    for start in range(0, posts, BATCH):
+        Post.objects.bulk_create(
+            Post(author=author, text=' '.join(rand.choices(
+                vocabulary, cum_weights=cum_weights,
+                k=rand.randint(*WORDS_PER_POST)
+            )))
+            for _ in range(min(BATCH, posts - start))
+        )
+    return vocabulary
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--posts', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--python', action='store_true',
+                        help='measure the SearchTerm fallback')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test import override_settings
+    from posts import search
+    from posts.models import Post
+
+    override_settings(POST_SEARCH_FTS=not args.python).enable()
+    vocabulary = fill(args.posts, random.Random(0))
+    search.rebuild()
+    queries = {
+        'common': vocabulary[0],
+        'medium': vocabulary[100],
+        'rare': vocabulary[5000],
+        'two words': f'{vocabulary[10]} {vocabulary[300]}',
+    }
+    result = {
+        'posts': args.posts,
+        'index': 'SearchTerm' if args.python else 'FTS5',
+    }
+    for name, query in queries.items():
+        posts = Post.objects.all()
+        for term in query.split():
+            posts = posts.filter(text__icontains=term)
+
+        def second_page():
+            cursor = search.search(query)[1]
+            search.search(query, cursor)
+
+        result[name] = {
+            'like count': summary(measure(posts.count, args.repeat)),
+            'index count': summary(measure(
+                lambda: search.filter_queryset(Post.objects, query).count(),
+                args.repeat
+            )),
+            'ranked page 1': summary(measure(
+                lambda: search.search(query), args.repeat
+            )),
+            'ranked page 2': summary(measure(second_page, args.repeat)),
+        }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
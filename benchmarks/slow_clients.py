@@ -0,0 +1,117 @@
+"""Requests per second of the WSGI application under concurrent slow
+clients, served by a single thread against a thread per connection.
+
+    python -m benchmarks.slow_clients --rate 50 --delay 0.05
+
+Clients arrive at --rate per second. Each sends the request line,
+waits --delay seconds before the rest of the request, as a client
+on a slow link does, then reads the response; the paths go round
+index, group_posts, profile and post_detail. The same arrivals are
+served the way a sync worker and a threaded worker would serve
+them. Django 2.2 has neither an ASGI handler nor async views, this
+measures how much slow clients hold a worker of this deployment
+and what threads buy against them.
+"""
+import argparse
+import json
+import logging
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle
+
+from benchmarks.utils import setup_django, summary
+
+FILL = {'users': 200, 'groups': 5, 'posts': 2000, 'comments': 2000,
+        'follows': 5, 'images': 0}
+MAX_CLIENTS = 512
+
+
+def paths(targets):
+    from django.contrib.auth import get_user_model
+
+    username = get_user_model().objects.get(pk=targets['users'][0]).username
+    return [
+        '/',
+        f'/group/{targets["groups"][0]}/',
+        f'/profile/{username}/',
+        f'/posts/{targets["posts"][0]}/',
+    ]
+
+
+def slow_get(address, path, delay):
+    with socket.create_connection(address) as client:
+        client.sendall(f'GET {path} HTTP/1.0\r\n'.encode())
+        time.sleep(delay)
+        client.sendall(f'Host: {address[0]}\r\n\r\n'.encode())
+        response = b''
+        while True:
+            data = client.recv(65536)
+            if not data:
+                break
+            response += data
+    if not response.startswith(b'HTTP/1.1 200'):
+        raise RuntimeError(f'{path}: {response[:80]!r}')
+
+
+def load(server_class, app, rate, requests, delay, urls):
+    from django.core.servers.basehttp import WSGIRequestHandler
+
+    # a listen backlog of a production server, socketserver's 5
+    # resets the clients a single thread is not accepting yet
+    server = type(server_class.__name__, (server_class,), {
+        'request_queue_size': 1024,
+    })(('127.0.0.1', 0), WSGIRequestHandler)
+    server.set_app(app)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    timings = []
+
+    start = time.perf_counter()
+
+    def one(number, path):
+        time.sleep(max(0, start + number / rate - time.perf_counter()))
+        begin = time.perf_counter()
+        slow_get(server.server_address, path, delay)
+        timings.append((time.perf_counter() - begin) * 1000)
+
+    with ThreadPoolExecutor(max_workers=MAX_CLIENTS) as pool:
+        list(pool.map(one, range(requests), cycle(urls)))
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    server.server_close()
+    return {**summary(timings), 'rps': round(requests / elapsed, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rate', type=float, default=50,
+                        help='clients arriving per second')
+    parser.add_argument('--requests', type=int, default=250)
+    parser.add_argument('--delay', type=float, default=0.05,
+                        help='seconds a client takes to send its request')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.servers.basehttp import ThreadedWSGIServer, WSGIServer
+    from django.core.wsgi import get_wsgi_application
+    from django.test import override_settings
+
+    from benchmarks.data import generate
+
+    override_settings(DEBUG=False).enable()
+    app = get_wsgi_application()
+    logging.getLogger('django.server').setLevel(logging.ERROR)
+    logging.getLogger('core.metrics').setLevel(logging.ERROR)
+    urls = paths(generate(**FILL))
+    result = {'rate': args.rate, 'delay': args.delay}
+    for name, server_class in (('single thread', WSGIServer),
+                               ('thread per connection', ThreadedWSGIServer)):
+        result[name] = load(server_class, app, args.rate,
+                            args.requests, args.delay, urls)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Helpers shared by the benchmark scripts.
+
+Every script is started from the repository root, e.g.
+``python -m benchmarks.pagination``, and works on a throwaway
+in-memory test database, so the dev db.sqlite3 is never touched.
+"""
+import os
+import statistics
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_DIR = os.path.join(BASE_DIR, 'yatube')
+
+
+def setup_django(database=True):
+    """To configure django and create an empty test database"""
+    sys.path.insert(0, PROJECT_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+    import django
+    django.setup()
+    if not database:
+        return
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+
+
+def measure(func, repeat=20):
+    """To run func repeat times and return timings in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def percentile(timings, share):
+    ordered = sorted(timings)
+    index = min(len(ordered) - 1, int(round(share * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summary(timings):
+    return {
+        'p50': round(statistics.median(timings), 3),
+        'p95': round(percentile(timings, 0.95), 3),
+        'p99': round(percentile(timings, 0.99), 3),
+    }
@@ -0,0 +1,11 @@
+"""pytest does not go through TEST_RUNNER, the settings it applies
+to the tests of tests/ come from here"""
+import pytest
+
+
+@pytest.fixture(autouse=True, scope='session')
+def testing_settings():
+    from core.runner import testing_settings
+
+    with testing_settings():
+        yield
@@ -0,0 +1,203 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+INTEGER, TEXT, JSON = range(3)
+CULL_EVERY = 100
+
+
+def shared_timeout(timeout):
+    """To return timeout for an entry other processes invalidate, capped
+    at CACHE_LOCAL_TIMEOUT unless the cache is shared by them all.
+    None, for no expiry, is capped too"""
+    if settings.CACHE_SHARED:
+        return timeout
+    if timeout is None:
+        return settings.CACHE_LOCAL_TIMEOUT
+    return min(timeout, settings.CACHE_LOCAL_TIMEOUT)
+
+
+def current(key) -> int:
+    """To return the invalidation counter at key of the default cache.
+    A lost counter restarts from the clock, so entries keyed on its old
+    values can not match the new one by accident. Unless the cache is
+    shared, the counter lives CACHE_LOCAL_TIMEOUT, the bumps of other
+    processes reach no further"""
+    value = cache.get(key)
+    if value is None:
+        value = int(time.time() * 1000)
+        if not cache.add(key, value, shared_timeout(None)):
+            value = cache.get(key, value)
+    return value
+
+
+def bump(key) -> None:
+    """To move the counter at key, invalidating the entries keyed on it"""
+    try:
+        cache.incr(key)
+    except ValueError:
+        current(key)
+
+
+def encode(value):
+    """To turn a value into (kind, stored) without pickle"""
+    if type(value) is int:
+        return INTEGER, value
+    if isinstance(value, str):
+        return TEXT, str(value)
+    return JSON, json.dumps(value)
+
+
+def decode(kind, stored):
+    if kind == JSON:
+        return json.loads(stored)
+    return stored
+
+
+class SQLiteCache(BaseCache):
+    """Cache shared by all worker processes through one SQLite file.
+
+    LOCATION is the path of the file. Values are stored without
+    pickle: integers natively, so incr() is a single UPDATE, strings
+    (rendered HTML) as text and anything else as JSON.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+        self._writes = 0
+
+    @property
+    def _db(self):
+        # connections are per thread and must not cross a fork
+        if getattr(self._local, 'pid', None) != os.getpid():
+            db = sqlite3.connect(self._path, timeout=30,
+                                 isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, kind INTEGER NOT NULL, '
+                'value, expires REAL)'
+            )
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return self._local.db
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def get(self, key, default=None, version=None):
+        row = self._db.execute(
+            'SELECT kind, value FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self._key(key, version), time.time())
+        ).fetchone()
+        if row is None:
+            return default
+        return decode(*row)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        if not keys:
+            return {}
+        rows = self._db.execute(
+            'SELECT key, kind, value FROM cache WHERE key IN (%s) '
+            'AND (expires IS NULL OR expires > ?)'
+            % ', '.join('?' * len(keys)),
+            (*keys, time.time())
+        )
+        return {keys[key]: decode(kind, value) for key, kind, value in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._db.execute(
+            'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)',
+            (self._key(key, version), *encode(value),
+             self.get_backend_timeout(timeout))
+        )
+        self._wrote()
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        with self._db:
+            self._db.execute('BEGIN IMMEDIATE')
+            self._db.executemany(
+                'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)',
+                ((self._key(key, version), *encode(value), expires)
+                 for key, value in data.items())
+            )
+        self._wrote()
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self._db.execute(
+            'INSERT INTO cache VALUES (?, ?, ?, ?) ON CONFLICT (key) '
+            'DO UPDATE SET kind = excluded.kind, value = excluded.value, '
+            'expires = excluded.expires WHERE cache.expires <= ?',
+            (self._key(key, version), *encode(value),
+             self.get_backend_timeout(timeout), time.time())
+        ).rowcount
+        self._wrote()
+        return bool(added)
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        with self._db:
+            self._db.execute('BEGIN IMMEDIATE')
+            changed = self._db.execute(
+                'UPDATE cache SET value = value + ? WHERE key = ? '
+                'AND kind = ? AND (expires IS NULL OR expires > ?)',
+                (delta, key, INTEGER, time.time())
+            ).rowcount
+            if not changed:
+                raise ValueError("Key '%s' not found" % key)
+            return self._db.execute(
+                'SELECT value FROM cache WHERE key = ?', (key,)
+            ).fetchone()[0]
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return bool(self._db.execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout),
+             self._key(key, version), time.time())
+        ).rowcount)
+
+    def delete(self, key, version=None):
+        return bool(self._db.execute(
+            'DELETE FROM cache WHERE key = ?', (self._key(key, version),)
+        ).rowcount)
+
+    def has_key(self, key, version=None):
+        return self._db.execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self._key(key, version), time.time())
+        ).fetchone() is not None
+
+    def clear(self):
+        self._db.execute('DELETE FROM cache')
+
+    def _wrote(self):
+        self._writes += 1
+        if self._writes % CULL_EVERY:
+            return
+        self._db.execute(
+            'DELETE FROM cache WHERE expires <= ?', (time.time(),)
+        )
+        count = self._db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count > self._max_entries:
+            self._db.execute(
+                'DELETE FROM cache WHERE rowid IN '
+                '(SELECT rowid FROM cache ORDER BY rowid LIMIT ?)',
+                (count // self._cull_frequency,)
+            )
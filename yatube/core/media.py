@@ -0,0 +1,177 @@
+"""MEDIA_ROOT served by the application.
+
+Small deployments have no front server for MEDIA_URL, so the files
+go through here. A whole file is a FileResponse with a large block
+size: a WSGI server with a sendfile file_wrapper (gunicorn, uWSGI,
+mod_wsgi) sends it without copying it through Python, others read it
+in a few large blocks. A byte range is sliced off a memory map of the
+file. Files are validated by a strong ETag made of their size and
+mtime; thumbnails and uploads named after a hash never change and
+are cached for a year as immutable.
+
+With MEDIA_ACCEL set the front server sends the file itself: nginx
+by X-Accel-Redirect to an internal location at MEDIA_ACCEL_PREFIX,
+Apache mod_xsendfile or lighttpd by X-Sendfile with the full path.
+
+MediaFiles wraps the WSGI application, so runserver and any WSGI
+server answer MEDIA_URL before the middleware and the URL resolution
+of Django, which cost more than sending a thumbnail; those requests
+are not in core.metrics. The view at MEDIA_URL serves the rest, and
+anything missing gets the 404 page of the site.
+"""
+import mimetypes
+import mmap
+import os
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.handlers.wsgi import WSGIRequest, get_path_info
+from django.http import (FileResponse, Http404, HttpResponse,
+                         StreamingHttpResponse)
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+# sorl thumbnails are md5 hex digests, core.storage names sha256 ones
+HASHED_NAME = re.compile(r'(?:^|/)[0-9a-f]{32,}\.\w+$')
+SINGLE_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def byte_range(header: str, size: int):
+    """To return (start, end) of the bytes a Range header asks for,
+    end excluded, or None to send the whole file: several ranges and
+    invalid headers are ignored. Raises ValueError when the range
+    is past the end of the file, as any range of an empty file is"""
+    match = SINGLE_RANGE.match(header.strip())
+    if match is None or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        # the last bytes of the file
+        if not (int(last) and size):
+            raise ValueError(header)
+        return max(0, size - int(last)), size
+    start = int(first)
+    if start >= size:
+        raise ValueError(header)
+    end = min(int(last) + 1, size) if last else size
+    if end <= start:
+        return None
+    return start, end
+
+
+def mapped_chunks(path: str, start: int, end: int, block_size: int):
+    """To yield the bytes from start to end of the file mapped
+    in memory, block_size at a time"""
+    with open(path, 'rb') as file, mmap.mmap(
+            file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        for offset in range(start, end, block_size):
+            yield mapped[offset:min(offset + block_size, end)]
+
+
+def cache_control(name: str) -> str:
+    if HASHED_NAME.search(name):
+        return (f'public, max-age={settings.MEDIA_IMMUTABLE_MAX_AGE}, '
+                f'immutable')
+    return f'public, max-age={settings.MEDIA_MAX_AGE}'
+
+
+def accel_response(path: str, name: str, content_type: str):
+    response = HttpResponse(content_type=content_type)
+    if settings.MEDIA_ACCEL == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = quote(
+            settings.MEDIA_ACCEL_PREFIX + name
+        )
+    else:
+        response['X-Sendfile'] = path
+    return response
+
+
+def file_response(request, path: str, size: int, content_type: str,
+                  validators) -> HttpResponse:
+    requested = request.META.get('HTTP_RANGE')
+    # a range of another version of the file is no use to the client
+    if requested and request.META.get('HTTP_IF_RANGE',
+                                      validators[0]) in validators:
+        try:
+            span = byte_range(requested, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        if span is not None:
+            start, end = span
+            response = StreamingHttpResponse(
+                mapped_chunks(path, start, end, settings.MEDIA_BLOCK_SIZE),
+                status=206,
+                content_type=content_type,
+            )
+            response['Content-Length'] = end - start
+            response['Content-Range'] = f'bytes {start}-{end - 1}/{size}'
+            return response
+    response = FileResponse(open(path, 'rb'), content_type=content_type)
+    # the default 4 KB blocks are as many writes with wsgiref
+    response.block_size = settings.MEDIA_BLOCK_SIZE
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        status = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404
+    if not stat.S_ISREG(status.st_mode):
+        raise Http404
+    etag = f'"{status.st_mtime_ns:x}-{status.st_size:x}"'
+    last_modified = int(status.st_mtime)
+    response = get_conditional_response(request, etag=etag,
+                                        last_modified=last_modified)
+    if response is None:
+        content_type = (mimetypes.guess_type(path)[0]
+                        or 'application/octet-stream')
+        if settings.MEDIA_ACCEL:
+            response = accel_response(full_path, path, content_type)
+        else:
+            response = file_response(
+                request, full_path, status.st_size, content_type,
+                (etag, http_date(last_modified)),
+            )
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = cache_control(path)
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+class MediaFiles:
+    """WSGI middleware answering GET and HEAD of MEDIA_URL
+    with serve_media, anything else goes on to application"""
+
+    def __init__(self, application):
+        self.application = application
+
+    def __call__(self, environ, start_response):
+        path_info = get_path_info(environ)
+        prefix = settings.MEDIA_URL
+        if (environ['REQUEST_METHOD'] not in ('GET', 'HEAD')
+                or not path_info.startswith(prefix)):
+            return self.application(environ, start_response)
+        try:
+            response = serve_media(WSGIRequest(environ),
+                                   path_info[len(prefix):])
+        except Http404:
+            return self.application(environ, start_response)
+        # as django.core.handlers.wsgi.WSGIHandler answers
+        start_response(f'{response.status_code} {response.reason_phrase}',
+                       list(response.items()))
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        if getattr(response, 'file_to_stream', None) is not None and (
+                file_wrapper):
+            return file_wrapper(response.file_to_stream, response.block_size)
+        return response
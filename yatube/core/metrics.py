@@ -0,0 +1,257 @@
+"""Per request metrics: SQL queries and their time, template render
+time, cache hits and misses, by view name.
+
+RequestMetricsMiddleware logs one JSON line per request to the
+core.metrics logger, adds it to the in-process histograms served by
+core.views.request_metrics and checks it against REQUEST_BUDGETS.
+Histograms live in the worker process, each worker counts its own
+requests.
+"""
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+from functools import wraps
+from itertools import accumulate
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.base import Template
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+COUNT_BOUNDS = (1, 2, 3, 5, 8, 13, 20, 50, 100)
+MS_BOUNDS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+BOUNDS = {
+    'queries': COUNT_BOUNDS,
+    'db_ms': MS_BOUNDS,
+    'render_ms': MS_BOUNDS,
+    'total_ms': MS_BOUNDS,
+    'cache_hits': COUNT_BOUNDS,
+    'cache_misses': COUNT_BOUNDS,
+}
+UNRESOLVED = '-'
+
+_local = threading.local()
+_lock = threading.Lock()
+_histograms = {}
+_MISSING = object()
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.view = UNRESOLVED
+        self.queries = 0
+        self.db_ms = 0.0
+        self.render_ms = 0.0
+        self.total_ms = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # nested renders and cache calls are counted once, outermost
+        self.rendering = False
+        self.in_cache = False
+
+    def execute(self, execute, sql, params, many, context):
+        """To time a query, as a connection.execute_wrapper"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_ms += (time.perf_counter() - start) * 1000
+
+    def as_dict(self) -> dict:
+        return {'view': self.view, **{
+            name: round(getattr(self, name), 3) for name in BOUNDS
+        }}
+
+
+def current():
+    """To return the RequestMetrics of the request of this thread"""
+    return getattr(_local, 'metrics', None)
+
+
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def as_dict(self) -> dict:
+        """Buckets are cumulative, as 'less or equal' in Prometheus"""
+        cumulative = list(accumulate(self.counts))
+        return {
+            'count': cumulative[-1],
+            'sum': round(self.sum, 3),
+            'buckets': dict(zip(
+                [*map(str, self.bounds), '+Inf'], cumulative
+            )),
+        }
+
+
+def record(metrics: RequestMetrics) -> None:
+    with _lock:
+        histograms = _histograms.setdefault(metrics.view, {
+            name: Histogram(bounds) for name, bounds in BOUNDS.items()
+        })
+        for name, histogram in histograms.items():
+            histogram.observe(getattr(metrics, name))
+
+
+def snapshot() -> dict:
+    with _lock:
+        return {view: {
+            name: histogram.as_dict()
+            for name, histogram in histograms.items()
+        } for view, histograms in _histograms.items()}
+
+
+def reset() -> None:
+    with _lock:
+        _histograms.clear()
+
+
+def over_budget(metrics: RequestMetrics) -> dict:
+    """To return {metric: (value, budget)} of what went over budget"""
+    budget = settings.REQUEST_BUDGETS.get(metrics.view, {})
+    return {
+        name: (getattr(metrics, name), limit)
+        for name, limit in budget.items()
+        if getattr(metrics, name) > limit
+    }
+
+
+def check_budget(metrics: RequestMetrics) -> None:
+    over = over_budget(metrics)
+    if not over:
+        return
+    message = f'{metrics.view} is over budget: ' + ', '.join(
+        f'{name} {value:g} > {limit:g}'
+        for name, (value, limit) in over.items()
+    )
+    if settings.REQUEST_BUDGETS_RAISE:
+        raise BudgetExceeded(message)
+    logger.warning(message)
+
+
+def _timed_render(render):
+    @wraps(render)
+    def timed(self, context):
+        metrics = current()
+        if metrics is None or metrics.rendering:
+            return render(self, context)
+        metrics.rendering = True
+        start = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            metrics.rendering = False
+            metrics.render_ms += (time.perf_counter() - start) * 1000
+    timed.counted = True
+    return timed
+
+
+def _counted_get(get):
+    @wraps(get)
+    def counted(self, key, default=None, version=None):
+        metrics = current()
+        if metrics is None or metrics.in_cache:
+            return get(self, key, default, version)
+        metrics.in_cache = True
+        try:
+            value = get(self, key, _MISSING, version)
+        finally:
+            metrics.in_cache = False
+        if value is _MISSING:
+            metrics.cache_misses += 1
+            return default
+        metrics.cache_hits += 1
+        return value
+    counted.counted = True
+    return counted
+
+
+def _counted_get_many(get_many):
+    @wraps(get_many)
+    def counted(self, keys, version=None):
+        metrics = current()
+        if metrics is None or metrics.in_cache:
+            return get_many(self, keys, version)
+        keys = list(keys)
+        metrics.in_cache = True
+        try:
+            values = get_many(self, keys, version)
+        finally:
+            metrics.in_cache = False
+        metrics.cache_hits += len(values)
+        metrics.cache_misses += len(keys) - len(values)
+        return values
+    counted.counted = True
+    return counted
+
+
+def _wrap(owner, name, wrapper):
+    method = getattr(owner, name)
+    if not getattr(method, 'counted', False):
+        setattr(owner, name, wrapper(method))
+
+
+def install() -> None:
+    """To count template renders and reads of the caches named in
+    REQUEST_METRICS_CACHES, called once from CoreConfig.ready. The
+    methods are wrapped on their classes, so other caches of the same
+    backend are counted as well"""
+    if settings.REQUEST_METRICS_TEMPLATES:
+        _wrap(Template, 'render', _timed_render)
+    for alias in settings.REQUEST_METRICS_CACHES:
+        backend = import_string(settings.CACHES[alias]['BACKEND'])
+        _wrap(backend, 'get', _counted_get)
+        _wrap(backend, 'get_many', _counted_get_many)
+
+
+class RequestMetricsMiddleware:
+    """Goes first in MIDDLEWARE, so the queries of the session and
+    auth middleware are counted too"""
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = _local.metrics = RequestMetrics()
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(metrics.execute)
+                    )
+                response = self.get_response(request)
+        finally:
+            _local.metrics = None
+        metrics.total_ms = (time.perf_counter() - start) * 1000
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            metrics.view = match.view_name
+        record(metrics)
+        logger.info(json.dumps(metrics.as_dict(), ensure_ascii=False))
+        response['Server-Timing'] = (
+            f'db;dur={metrics.db_ms:.1f}, '
+            f'render;dur={metrics.render_ms:.1f}, '
+            f'total;dur={metrics.total_ms:.1f}'
+        )
+        check_budget(metrics)
+        return response
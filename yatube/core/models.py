@@ -9,3 +9,18 @@ class CreatedModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class Blob(models.Model):
+    """A file of core.storage.ContentAddressedStorage and the number
+    of saves that returned its name and were not deleted since"""
+    name = models.CharField('Имя файла', max_length=255, unique=True)
+    size = models.PositiveIntegerField('Размер, байт')
+    references = models.PositiveIntegerField('Ссылок', default=1)
+
+    class Meta:
+        verbose_name = 'Файл'
+        verbose_name_plural = 'Файлы'
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,38 @@
+"""Settings of the test runs.
+
+While tests run, TEST_SETTINGS are applied over the settings and the
+loggers of LOGGING only let warnings through. manage.py test gets
+them from TestRunner, pytest from the conftest.py next to pytest.ini.
+"""
+import logging
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+@contextmanager
+def testing_settings():
+    loggers = [logging.getLogger(name)
+               for name in settings.LOGGING.get('loggers', ())]
+    levels = [logger.level for logger in loggers]
+    for logger in loggers:
+        logger.setLevel(max(logger.level, logging.WARNING))
+    try:
+        with override_settings(**settings.TEST_SETTINGS):
+            yield
+    finally:
+        for logger, level in zip(loggers, levels):
+            logger.setLevel(level)
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._settings = testing_settings()
+        self._settings.__enter__()
+
+    def teardown_test_environment(self, **kwargs):
+        self._settings.__exit__(None, None, None)
+        super().teardown_test_environment(**kwargs)
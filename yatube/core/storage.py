@@ -0,0 +1,103 @@
+"""Content-addressed file storage with reference counts.
+
+A file is saved under the SHA-256 of its content, next to the name
+it was given: posts/photo.jpg becomes posts/3f/3f9a...e1.jpg. The
+same content uploaded again is not written, its name is returned
+and the reference count of core.models.Blob goes up, a delete only
+takes the count down until the last one removes the file. Files
+without a count, stored before, are never deleted. Identical
+images thus share one file and, as sorl names thumbnails after
+their source, one set of thumbnails.
+
+Uploads get their hash as they stream in through
+HashingUploadHandler, other content is read once more to hash it.
+The counts live in the database, so saves and deletes of a name are
+serialized by its row.
+"""
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.db import transaction
+from django.db.models import F
+
+from .models import Blob
+
+
+def content_hash(content) -> str:
+    """To return the SHA-256 of content, read by chunks"""
+    digest = getattr(content, 'content_hash', None)
+    if digest:
+        return digest
+    hasher = hashlib.sha256()
+    for chunk in content.chunks():
+        hasher.update(chunk)
+    content.seek(0)
+    return hasher.hexdigest()
+
+
+class HashingUploadHandler(TemporaryFileUploadHandler):
+    """To write uploads to a temporary file, hashing the chunks
+    on the way"""
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hasher = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hasher.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.content_hash = self.hasher.hexdigest()
+        return file
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage writing each content once"""
+
+    def hashed_name(self, name: str, content) -> str:
+        digest = content_hash(content)
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        return os.path.join(directory, digest[:2], digest + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        with transaction.atomic():
+            # the UPDATE locks the row, or the table on SQLite, before
+            # a delete could remove the file
+            if Blob.objects.filter(name=name).update(
+                    references=F('references') + 1):
+                return name
+            # a file left by a rolled back save is taken over, a cut
+            # short one is kept apart
+            if not self.exists(name) or self.size(name) != content.size:
+                name = self._save(
+                    self.get_available_name(name, max_length), content
+                )
+            Blob.objects.create(name=name, size=content.size)
+        return name
+
+    def delete(self, name):
+        with transaction.atomic():
+            blobs = Blob.objects.filter(name=name)
+            # a file stored before the counts may be shared by names
+            # copied around, as seeded and imported posts do: kept
+            if blobs.update(references=F('references') - 1) and (
+                    blobs.filter(references__lte=0).delete()[0]):
+                super().delete(name)
+
+    def reference(self, name) -> bool:
+        """To count one more reference to a stored file, as saving
+        its content again would, False when it is not stored"""
+        return bool(Blob.objects.filter(name=name).update(
+            references=F('references') + 1
+        ))
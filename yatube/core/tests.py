@@ -1,5 +1,22 @@
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import time
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase, Client
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import (SimpleTestCase, TestCase, Client, RequestFactory,
+                         override_settings)
+from django.urls import reverse
+
+from . import metrics
+from .cache import SQLiteCache, bump, current, shared_timeout
+from .media import MediaFiles
+from .models import Blob
+from .storage import ContentAddressedStorage
 
 User = get_user_model()
 
@@ -15,3 +32,350 @@ class UnexistingPageTests(TestCase):
         authorized_client.force_login(user)
         response = authorized_client.get(url)
         self.assertTemplateUsed(response, template)
+
+
+class SQLiteCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.path, {})
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_values_round_trip(self):
+        """Проверяем что значения разных типов сохраняются"""
+        values = {
+            'html': '<p>Пост</p>',
+            'number': 42,
+            'ids': [1, 2, 3],
+            'flag': True,
+        }
+        for key, value in values.items():
+            with self.subTest(key=key):
+                self.cache.set(key, value)
+                self.assertEqual(self.cache.get(key), value)
+                self.assertIs(type(self.cache.get(key)), type(value))
+        self.assertEqual(self.cache.get_many(['html', 'number', 'none']),
+                         {'html': '<p>Пост</p>', 'number': 42})
+
+    def test_stored_without_pickle(self):
+        """Проверяем что в файле лежит читаемый текст, а не pickle"""
+        self.cache.set('html', '<p>Пост</p>')
+        stored = sqlite3.connect(self.path).execute(
+            'SELECT value FROM cache'
+        ).fetchone()[0]
+        self.assertEqual(stored, '<p>Пост</p>')
+        with self.assertRaises(TypeError):
+            self.cache.set('object', object())
+
+    def test_shared_between_instances(self):
+        """Проверяем что другой процесс видит те же данные"""
+        self.cache.set('key', 'value')
+        self.cache.set('counter', 1)
+        other = SQLiteCache(self.path, {})
+        self.assertEqual(other.get('key'), 'value')
+        other.incr('counter')
+        self.assertEqual(self.cache.incr('counter', 5), 7)
+
+    def test_expiry_and_add(self):
+        """Проверяем истечение срока, add и incr отсутствующего ключа"""
+        self.cache.set('old', 'value', timeout=0.01)
+        time.sleep(0.02)
+        self.assertIsNone(self.cache.get('old'))
+        self.assertTrue(self.cache.add('old', 'new'))
+        self.assertFalse(self.cache.add('old', 'newer'))
+        self.assertEqual(self.cache.get('old'), 'new')
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_cull(self):
+        """Проверяем что кэш не растёт больше MAX_ENTRIES"""
+        small = SQLiteCache(self.path, {'OPTIONS': {'MAX_ENTRIES': 10}})
+        for i in range(200):
+            small.set(f'key{i}', i)
+        count = sqlite3.connect(self.path).execute(
+            'SELECT COUNT(*) FROM cache'
+        ).fetchone()[0]
+        self.assertLess(count, 200)
+
+    def test_shared_timeout(self):
+        """Проверяем что без общего кэша записи живут недолго"""
+        with self.settings(CACHE_SHARED=True, CACHE_LOCAL_TIMEOUT=20):
+            self.assertEqual(shared_timeout(3600), 3600)
+        with self.settings(CACHE_SHARED=False, CACHE_LOCAL_TIMEOUT=20):
+            self.assertEqual(shared_timeout(3600), 20)
+            self.assertEqual(shared_timeout(5), 5)
+            self.assertEqual(shared_timeout(None), 20)
+
+    def test_counter(self):
+        """Проверяем что счётчик инвалидации растёт, а без общего кэша
+        живёт CACHE_LOCAL_TIMEOUT"""
+        cache.delete('counter')
+        value = current('counter')
+        bump('counter')
+        self.assertEqual(current('counter'), value + 1)
+        cache.delete('counter')
+        with self.settings(CACHE_SHARED=False, CACHE_LOCAL_TIMEOUT=0.05):
+            current('counter')
+            time.sleep(0.1)
+            self.assertIsNone(cache.get('counter'))
+
+
+class RequestMetricsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+
+    def last_record(self, url):
+        with self.assertLogs('core.metrics', 'INFO') as logs:
+            response = self.client.get(url)
+        return response, json.loads(logs.records[-1].getMessage())
+
+    def test_request_is_measured(self):
+        """Проверяем запись метрик запроса и заголовок Server-Timing"""
+        response, record = self.last_record(reverse('posts:all posts'))
+        self.assertEqual(record['view'], 'posts:all posts')
+        self.assertGreater(record['queries'], 0)
+        self.assertGreater(record['render_ms'], 0)
+        self.assertGreater(record['cache_misses'], 0)
+        self.assertIn('db;dur=', response['Server-Timing'])
+        histograms = metrics.snapshot()['posts:all posts']
+        self.assertEqual(histograms['queries']['count'], 1)
+        self.assertEqual(histograms['queries']['buckets']['+Inf'], 1)
+
+    def test_cache_hits_and_misses(self):
+        """Проверяем подсчёт попаданий и промахов кэша"""
+        request_metrics = metrics._local.metrics = metrics.RequestMetrics()
+        try:
+            cache.set('hit', 1)
+            cache.get('hit')
+            cache.get('miss')
+            cache.get_many(['hit', 'miss', 'other'])
+        finally:
+            metrics._local.metrics = None
+        self.assertEqual(request_metrics.cache_hits, 2)
+        self.assertEqual(request_metrics.cache_misses, 3)
+
+    @override_settings(REQUEST_BUDGETS={'posts:all posts': {'queries': 0}})
+    def test_budget_raises_in_tests(self):
+        """Проверяем что превышение бюджета в тестах - ошибка"""
+        with self.assertRaises(metrics.BudgetExceeded):
+            self.client.get(reverse('posts:all posts'))
+
+    @override_settings(REQUEST_BUDGETS={'posts:all posts': {'queries': 0}},
+                       REQUEST_BUDGETS_RAISE=False)
+    def test_budget_warns_in_production(self):
+        """Проверяем что вне тестов превышение бюджета пишется в лог"""
+        with self.assertLogs('core.metrics', 'WARNING') as logs:
+            response = self.client.get(reverse('posts:all posts'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('over budget: queries',
+                      logs.records[-1].getMessage())
+
+    @override_settings(REQUEST_METRICS_TOKEN='secret')
+    def test_histogram_endpoint(self):
+        """Проверяем что гистограммы доступны персоналу и по токену,
+        но не по адресу."""
+        self.client.get(reverse('posts:all posts'))
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, 404)
+        response = self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(url, HTTP_AUTHORIZATION='Bearer secret')
+        self.assertIn('posts:all posts', response.json())
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_histogram_endpoint_non_ascii_token(self):
+        """Проверяем что токен не из ASCII не роняет проверку"""
+        url = reverse('metrics')
+        # the WSGI server hands the header over as latin-1
+        sent = 'Bearer sécret'.encode().decode('latin-1')
+        with self.settings(REQUEST_METRICS_TOKEN='secret'):
+            response = self.client.get(url, HTTP_AUTHORIZATION=sent)
+            self.assertEqual(response.status_code, 404)
+        with self.settings(REQUEST_METRICS_TOKEN='sécret'):
+            response = self.client.get(url, HTTP_AUTHORIZATION=sent)
+            self.assertEqual(response.status_code, 200)
+
+
+class ContentAddressedStorageTests(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.storage = ContentAddressedStorage(location=self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def save(self, name, content=b'meme'):
+        return self.storage.save(name, ContentFile(content))
+
+    def test_same_content_stored_once(self):
+        """Проверяем что одинаковое содержимое хранится одним файлом
+        под своим хешем."""
+        digest = hashlib.sha256(b'meme').hexdigest()
+        names = {self.save('posts/a.JPG'), self.save('posts/b.jpg')}
+        self.assertEqual(names, {f'posts/{digest[:2]}/{digest}.jpg'})
+        self.assertEqual(Blob.objects.get().references, 2)
+        self.assertNotEqual(self.save('posts/c.jpg', b'other'), *names)
+
+    def test_deleted_with_last_reference(self):
+        """Проверяем что файл удаляется только с последней ссылкой."""
+        name = self.save('posts/a.jpg')
+        self.save('posts/b.jpg')
+        self.storage.delete(name)
+        self.assertTrue(self.storage.exists(name))
+        self.storage.delete(name)
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(Blob.objects.exists())
+        self.assertFalse(self.storage.reference(name))
+
+    def test_uncounted_file_kept(self):
+        """Проверяем что файл, сохранённый без подсчёта ссылок,
+        не удаляется."""
+        with open(os.path.join(self.tmp_dir.name, 'old.jpg'), 'wb') as file:
+            file.write(b'meme')
+        self.storage.delete('old.jpg')
+        self.assertTrue(self.storage.exists('old.jpg'))
+
+
+@override_settings(MEDIA_ACCEL=None)
+class MediaServingTests(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.content = bytes(range(256)) * 40
+        self.names = {'plain': 'posts/photo.jpg',
+                      'hashed': f'cache/ab/{"ab" * 16}.jpg'}
+        for name in self.names.values():
+            path = os.path.join(self.tmp_dir.name, name)
+            os.makedirs(os.path.dirname(path))
+            with open(path, 'wb') as file:
+                file.write(self.content)
+        override = self.settings(MEDIA_ROOT=self.tmp_dir.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def get(self, name='posts/photo.jpg', **headers):
+        response = self.client.get(f'/media/{name}', **headers)
+        body = (b''.join(response.streaming_content)
+                if response.streaming else response.content)
+        response.close()
+        return response, body
+
+    def test_whole_file(self):
+        """Проверяем отдачу файла с валидаторами и сроком кэша."""
+        response, body = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, self.content)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Content-Length'], str(len(self.content)))
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertNotIn('immutable', response['Cache-Control'])
+        response = self.get(self.names['hashed'])[0]
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_not_modified(self):
+        """Проверяем ответ 304 на совпавший ETag."""
+        etag = self.get()[0]['ETag']
+        response, body = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(body, b'')
+        self.assertEqual(response['ETag'], etag)
+
+    def test_ranges(self):
+        """Проверяем отдачу части файла."""
+        size = len(self.content)
+        cases = {
+            'bytes=0-99': (0, 100),
+            'bytes=10000-': (10000, size),
+            'bytes=-50': (size - 50, size),
+            'bytes=100-99999': (100, size),
+        }
+        for header, (start, end) in cases.items():
+            with self.subTest(header=header):
+                response, body = self.get(HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(body, self.content[start:end])
+                self.assertEqual(response['Content-Range'],
+                                 f'bytes {start}-{end - 1}/{size}')
+        for header in ('bytes=0-1,5-6', 'bytes=9-5', 'items=0-1'):
+            with self.subTest(header=header):
+                self.assertEqual(self.get(HTTP_RANGE=header)[0].status_code,
+                                 200)
+        response = self.get(HTTP_RANGE=f'bytes={size}-')[0]
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{size}')
+
+    def test_ranges_of_empty_file(self):
+        """Проверяем что у пустого файла нет ни одной части."""
+        open(os.path.join(self.tmp_dir.name, 'posts', 'empty.jpg'),
+             'wb').close()
+        for header in ('bytes=-50', 'bytes=0-', 'bytes=0-0'):
+            with self.subTest(header=header):
+                response = self.get('posts/empty.jpg', HTTP_RANGE=header)[0]
+                self.assertEqual(response.status_code, 416)
+                self.assertEqual(response['Content-Range'], 'bytes */0')
+
+    def test_if_range(self):
+        """Проверяем что часть другой версии файла не отдаётся."""
+        etag = self.get()[0]['ETag']
+        response = self.get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)[0]
+        self.assertEqual(response.status_code, 206)
+        response = self.get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"old"')[0]
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_files(self):
+        """Проверяем 404 для каталогов, пропавших файлов
+        и путей за пределами MEDIA_ROOT."""
+        for name in ('posts/', 'posts/missing.jpg', '../tests.py'):
+            with self.subTest(name=name):
+                self.assertEqual(self.get(name)[0].status_code, 404)
+
+    def test_accel(self):
+        """Проверяем передачу файла фронтовому серверу."""
+        with self.settings(MEDIA_ACCEL='x-accel-redirect'):
+            response, body = self.get()
+        self.assertEqual(response['X-Accel-Redirect'],
+                         '/protected-media/posts/photo.jpg')
+        self.assertEqual(body, b'')
+        with self.settings(MEDIA_ACCEL='x-sendfile'):
+            response = self.get()[0]
+        self.assertEqual(response['X-Sendfile'], os.path.join(
+            self.tmp_dir.name, 'posts', 'photo.jpg'
+        ))
+        self.assertIn('ETag', response)
+
+    def test_wsgi_middleware(self):
+        """Проверяем что WSGI-обёртка отдаёт файлы сама, а остальное
+        передаёт приложению."""
+        started = []
+
+        def application(environ, start_response):
+            start_response('404 Not Found', [])
+            return [b'site']
+
+        def start_response(status, headers):
+            started.append((status, dict(headers)))
+
+        media_files = MediaFiles(application)
+        factory = RequestFactory()
+        body = b''.join(media_files(
+            factory.get('/media/posts/photo.jpg').environ, start_response
+        ))
+        self.assertEqual(body, self.content)
+        self.assertEqual(started[-1][0], '200 OK')
+        self.assertIn('ETag', started[-1][1])
+        for path in ('/media/posts/missing.jpg', '/about/'):
+            with self.subTest(path=path):
+                self.assertEqual(b''.join(media_files(
+                    factory.get(path).environ, start_response
+                )), b'site')
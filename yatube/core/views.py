@@ -1,5 +1,12 @@
+import hmac
+
+from django.conf import settings
+from django.core.handlers.wsgi import get_bytes_from_wsgi
+from django.http import Http404, JsonResponse
 from django.shortcuts import render
 
+from . import metrics
+
 
 def page_not_found(request, exception):
 
@@ -16,3 +23,20 @@ def server_error(request):
 
 def permission_denied(request, exception):
     return render(request, 'core/403.html', status=403)
+
+
+def request_metrics(request):
+    """Histograms of the requests served by this worker process,
+    for staff and for scrapers sending REQUEST_METRICS_TOKEN. Behind
+    a reverse proxy every request comes from its address, so the
+    address grants nothing"""
+    token = settings.REQUEST_METRICS_TOKEN
+    # compare_digest takes str of ASCII only, the header holds the
+    # bytes as sent
+    scraper = bool(token) and hmac.compare_digest(
+        get_bytes_from_wsgi(request.META, 'HTTP_AUTHORIZATION', ''),
+        f'Bearer {token}'.encode(),
+    )
+    if not (request.user.is_staff or scraper):
+        raise Http404
+    return JsonResponse(metrics.snapshot())
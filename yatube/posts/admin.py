@@ -1,9 +1,276 @@
-from django.contrib import admin
+import datetime
+import time
 
-from .models import Post, Group, Comment
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.contrib.admin.views.main import PAGE_VAR, ChangeList
+from django.db.models import Count, F, Max, Min, QuerySet
+from django.template.response import TemplateResponse
+from django.forms.utils import flatatt
+from django.utils import timezone
+from django.utils.html import format_html, format_html_join
 
+from . import groups, moderation, search
+from .models import BannedWord, Post, Group, Comment, User
+from .paginators import (MAX_INTEGER, AdminKeysetPaginator,
+                         EstimatedCountPaginator)
 
-class PostAdmin(admin.ModelAdmin):
+CURSOR_VAR = 'after'
+# sorts after every other character of a username
+LAST_CHARACTER = '\U0010ffff'
+
+
+def _periods(first, last, kind):
+    """To yield (date, start, end) of every year, month or day
+    from the date first to the date last"""
+    day = first.replace(month=1, day=1) if kind == 'year' else (
+        first.replace(day=1) if kind == 'month' else first
+    )
+    while day <= last:
+        if kind == 'year':
+            end = day.replace(year=day.year + 1)
+        elif kind == 'month':
+            end = (day.replace(day=28) + datetime.timedelta(days=4)).replace(
+                day=1
+            )
+        else:
+            end = day + datetime.timedelta(days=1)
+        yield (day, *(timezone.make_aware(datetime.datetime.combine(
+            value, datetime.time()
+        )) for value in (day, end)))
+        day = end
+
+
+def _ordering(aggregate):
+    """To return the ordering whose first row is the value of
+    a Min or Max of a plain field, None for other aggregates"""
+    if not isinstance(aggregate, (Min, Max)) or aggregate.filter:
+        return None
+    field = aggregate.source_expressions[0]
+    if not isinstance(field, F):
+        return None
+    return ('-' if isinstance(aggregate, Max) else '') + field.name
+
+
+class IndexedDatesQuerySet(QuerySet):
+    """QuerySet whose dates() probes each year, month or day between
+    the first and the last row with an index seek, where the plain
+    one groups every row, for the date hierarchy of the admin"""
+
+    def aggregate(self, *args, **kwargs):
+        # MIN and MAX in one query read every row, each alone
+        # is the first row of the index
+        orderings = {name: _ordering(value) for name, value in kwargs.items()}
+        if args or not orderings or None in orderings.values():
+            return super().aggregate(*args, **kwargs)
+        # the date hierarchy asks for the bounds, and so does dates()
+        firsts = self.__dict__.setdefault('_firsts', {})
+        for ordering in orderings.values():
+            if ordering not in firsts:
+                firsts[ordering] = self.order_by(ordering).values_list(
+                    ordering.lstrip('-'), flat=True
+                ).first()
+        return {name: firsts[ordering]
+                for name, ordering in orderings.items()}
+
+    def dates(self, field_name, kind, order='ASC'):
+        if kind not in ('year', 'month', 'day'):
+            return super().dates(field_name, kind, order)
+        bounds = self.aggregate(first=Min(field_name), last=Max(field_name))
+        if bounds['first'] is None:
+            return []
+        first, last = (timezone.localtime(bounds[name]).date()
+                       for name in ('first', 'last'))
+        periods = list(_periods(first, last, kind))
+        # the first and the last period hold the bounds. The range of
+        # a probe goes first, SQLite seeks on the first range it meets
+        # and the queryset may have a wider one from the hierarchy
+        found = [
+            day for day, start, end in periods
+            if day in (periods[0][0], periods[-1][0])
+            or (self.model._default_manager.filter(**{
+                f'{field_name}__gte': start, f'{field_name}__lt': end,
+            }) & self).exists()
+        ]
+        return found[::-1] if order == 'DESC' else found
+
+
+class KeysetChangeList(ChangeList):
+    """ChangeList that passes the cursor of the next page along,
+    and loads only the list_only fields of the rows"""
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # a cursor only belongs to the link of the next page
+        if CURSOR_VAR not in (new_params or {}):
+            remove = [*(remove or ()), CURSOR_VAR]
+        return super().get_query_string(new_params, remove)
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if self.model_admin.list_only:
+            queryset = queryset.only(*self.model_admin.list_only)
+        return IndexedDatesQuerySet(model=queryset.model,
+                                    query=queryset.query.chain(),
+                                    using=queryset.db)
+
+    @property
+    def next_page_url(self):
+        cursor = getattr(self.paginator, 'next_cursor', '')
+        if not (self.multi_page and cursor):
+            return ''
+        return self.get_query_string({PAGE_VAR: self.page_num + 1,
+                                      CURSOR_VAR: cursor})
+
+
+class ChoicesSelect(forms.Select):
+    """Select rendered in Python, the template of the plain one
+    is rendered once for each option of each row of a changelist"""
+
+    def render(self, name, value, attrs=None, renderer=None):
+        selected = self.format_value(value)
+        return format_html(
+            '<select name="{}"{}>{}</select>', name,
+            flatatt(self.build_attrs(self.attrs, attrs)),
+            format_html_join('', '<option value="{}"{}>{}</option>', (
+                (key, ' selected' if str(key) in selected else '', label)
+                for key, label in self.choices
+            ))
+        )
+
+
+class ChangeListPerformanceMixin:
+    """Changelist of a big table: rows are counted by estimate,
+    paged by cursor in the default order and loaded with list_only
+    fields, groups come from one cached choice list"""
+
+    list_only = ()
+    show_full_result_count = False
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def get_paginator(self, request, queryset, per_page,
+                      orphans=0, allow_empty_first_page=True):
+        if tuple(queryset.query.order_by) == AdminKeysetPaginator.ordering:
+            return AdminKeysetPaginator(
+                queryset, per_page, after=request.GET.get(CURSOR_VAR)
+            )
+        return EstimatedCountPaginator(queryset, per_page, orphans,
+                                       allow_empty_first_page)
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        formfield = super().formfield_for_foreignkey(
+            db_field, request, **kwargs
+        )
+        if db_field.related_model is Group and formfield is not None:
+            # every row of list_editable renders the same select
+            formfield.widget = ChoicesSelect(attrs=formfield.widget.attrs)
+            formfield.choices = [('', formfield.empty_label),
+                                 *groups.choices()]
+        return formfield
+
+
+class IndexedSearchMixin:
+    """Search whose every part is sought on an index: numbers are
+    ids of posts, @name is a prefix of the username of the author,
+    the other words go to the full-text index of posts. search_fields
+    only show the search box and tell what is searched."""
+
+    # the field holding the post of a row
+    search_post_field = 'pk'
+
+    def get_search_results(self, request, queryset, search_term):
+        ids, names, words = [], [], []
+        for bit in search_term.split():
+            # isdigit() alone takes '²', ids past an SQLite INTEGER
+            # can not be bound, both are sought as words
+            if bit.isascii() and bit.isdigit() and int(bit) <= MAX_INTEGER:
+                ids.append(int(bit))
+            elif bit.startswith('@') and len(bit) > 1:
+                names.append(bit[1:])
+            else:
+                words.append(bit)
+        if ids:
+            queryset = queryset.filter(
+                **{f'{self.search_post_field}__in': ids}
+            )
+        for name in names:
+            # a range, unlike LIKE, is sought on the username index
+            queryset = queryset.filter(author__in=User.objects.filter(
+                username__gte=name, username__lt=name + LAST_CHARACTER
+            ).values('pk'))
+        return search.filter_queryset(
+            queryset, ' '.join(words), self.search_post_field
+        ), False
+
+
+class GroupActionForm(helpers.ActionForm):
+    group = forms.TypedChoiceField(
+        label='Группа', required=False, coerce=int, empty_value=None,
+        choices=lambda: [('', '---------'), *groups.choices()],
+    )
+
+
+class BulkModerationMixin:
+    """Actions run by posts.moderation as chunked UPDATE and DELETE
+    statements, rows are never loaded one by one"""
+
+    actions = ('delete_by_authors', 'censor')
+    # how many authors the confirmation page lists
+    shown_authors = 100
+
+    def _done(self, request, message, started):
+        self.message_user(
+            request, f'{message} за {time.perf_counter() - started:.1f} с',
+            messages.SUCCESS
+        )
+
+    def delete_by_authors(self, request, queryset):
+        authors = User.objects.filter(pk__in=queryset.values('author'))
+        rows = self.model.objects.filter(author__in=authors.values('pk'))
+        if not request.POST.get('post'):
+            return TemplateResponse(
+                request, 'admin/posts/delete_by_authors.html', {
+                    **self.admin_site.each_context(request),
+                    'title': 'Удалить всё от авторов?',
+                    'opts': self.model._meta,
+                    'authors': rows.order_by('author__username').values(
+                        'author__username'
+                    ).annotate(rows=Count('pk'))[:self.shown_authors],
+                    'total': rows.count(),
+                    'select_across': request.POST.get('select_across'),
+                    'selected': request.POST.getlist(
+                        helpers.ACTION_CHECKBOX_NAME
+                    ),
+                    'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+                }
+            )
+        started = time.perf_counter()
+        ids = list(rows.values_list('pk', flat=True))
+        delete = (moderation.delete_posts if self.model is Post
+                  else moderation.delete_comments)
+        self._done(request, f'Удалено {delete(ids)} из {len(ids)}', started)
+    delete_by_authors.short_description = 'Удалить всё от их авторов'
+    delete_by_authors.allowed_permissions = ('delete',)
+
+    def censor(self, request, queryset):
+        started = time.perf_counter()
+        ids = list(queryset.values_list('pk', flat=True))
+        changed = moderation.censor(self.model, ids)
+        self._done(request, f'Скрыты запрещённые слова в {changed} '
+                            f'из {len(ids)}', started)
+    censor.short_description = 'Скрыть запрещённые слова'
+    censor.allowed_permissions = ('change',)
+
+
+class PostAdmin(BulkModerationMixin, IndexedSearchMixin,
+                ChangeListPerformanceMixin, admin.ModelAdmin):
 
     list_display = ('pk',
                     'text',
@@ -11,11 +278,32 @@ class PostAdmin(admin.ModelAdmin):
                     'author',
                     'group',)
 
-    search_fields = ('text',)
+    search_fields = ('=id', '^author__username', 'text',)
+    date_hierarchy = 'created'
 
     list_filter = ('created',)
     empty_value_display = '-пусто-'
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    list_only = ('text', 'created', 'author', 'author__username',
+                 'group', 'group__title')
+    autocomplete_fields = ('author',)
+    action_form = GroupActionForm
+    actions = ('move_to_group', *BulkModerationMixin.actions)
+
+    def move_to_group(self, request, queryset):
+        form = self.action_form(request.POST)
+        form.fields['action'].choices = self.get_action_choices(request)
+        group_id = form.cleaned_data['group'] if form.is_valid() else None
+        if group_id is None:
+            self.message_user(request, 'Выберите группу', messages.ERROR)
+            return
+        started = time.perf_counter()
+        ids = list(queryset.values_list('pk', flat=True))
+        moved = moderation.move_posts(ids, group_id)
+        self._done(request, f'Перенесено {moved} из {len(ids)}', started)
+    move_to_group.short_description = 'Перенести в группу'
+    move_to_group.allowed_permissions = ('change',)
 
 
 class GroupAdmin(admin.ModelAdmin):
@@ -29,14 +317,29 @@ class GroupAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(BulkModerationMixin, IndexedSearchMixin,
+                   ChangeListPerformanceMixin, admin.ModelAdmin):
 
     list_display = ('pk',
                     'post',
                     'author',
                     'text',)
+    list_select_related = ('post', 'author')
+    list_only = ('text', 'created', 'post', 'post__text',
+                 'author', 'author__username')
+    autocomplete_fields = ('post', 'author')
+
+    search_fields = ('=post__id', '^author__username', 'post__text',)
+    search_post_field = 'post'
+    date_hierarchy = 'created'
 
-    search_fields = ('author', 'post',)
+
+class BannedWordAdmin(admin.ModelAdmin):
+
+    list_display = ('pk',
+                    'word',)
+
+    search_fields = ('word',)
 
 
 admin.site.register(Post, PostAdmin)
@@ -44,3 +347,5 @@ admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
 
 admin.site.register(Comment, CommentAdmin)
+
+admin.site.register(BannedWord, BannedWordAdmin)
@@ -0,0 +1,125 @@
+"""Banned words of comments.
+
+Words come from the BannedWord table and from the optional
+COMMENT_BLACKLIST_FILE, one per line. They are compiled into one
+regex shaped like a trie, so a comment is scanned once whatever the
+size of the list. Each process keeps the compiled matcher until the
+table (a version in the cache) or the file changes. A cache per
+process keeps the version CACHE_LOCAL_TIMEOUT at most, so the other
+workers see a change to the table by then.
+"""
+import os
+import re
+
+from django.conf import settings
+
+from core.cache import bump, current
+
+from .models import BannedWord
+
+VERSION_KEY = 'posts:blacklist:version'
+MASK = '******'
+
+_matcher = None
+
+
+def version() -> int:
+    return current(VERSION_KEY)
+
+
+def changed() -> None:
+    """To make every process rebuild its matcher"""
+    bump(VERSION_KEY)
+
+
+def trie_pattern(words) -> str:
+    """To build a regex matching any of words, sharing their prefixes"""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    return _branches(trie)
+
+
+def _branches(node) -> str:
+    branches = [re.escape(char) + _branches(child)
+                for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ''
+    pattern = '(?:' + '|'.join(branches) + ')'
+    if '' in node:
+        # a word ends here, a longer one may go on
+        pattern += '?'
+    return pattern
+
+
+def _file_mtime():
+    path = settings.COMMENT_BLACKLIST_FILE
+    if not path:
+        return None
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+def load_words() -> set:
+    words = set(BannedWord.objects.values_list('word', flat=True))
+    if _file_mtime() is not None:
+        with open(settings.COMMENT_BLACKLIST_FILE, encoding='utf-8') as file:
+            words.update(
+                line.strip().lower() for line in file
+                if not line.startswith('#')
+            )
+    words.discard('')
+    return words
+
+
+def compile_pattern(words):
+    """To compile words, None for an empty list"""
+    if not words:
+        return None
+    return re.compile(trie_pattern(words))
+
+
+def matcher():
+    """To return the compiled pattern of the current list"""
+    global _matcher
+    state = (version(), _file_mtime())
+    if _matcher is None or _matcher[0] != state:
+        _matcher = (state, compile_pattern(load_words()))
+    return _matcher[1]
+
+
+def _lower(text: str) -> str:
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    # a few characters lower to several, offsets must stay those of text
+    return ''.join(char.lower() if len(char.lower()) == 1 else char
+                   for char in text)
+
+
+def mask_with(pattern, text: str) -> str:
+    """To replace matches of pattern in text, keeping the rest as typed.
+    Words are lowercase, so the lowered text is searched, which is
+    several times faster than an IGNORECASE pattern"""
+    if pattern is None:
+        return text
+    parts = []
+    end = 0
+    for match in pattern.finditer(_lower(text)):
+        parts.append(text[end:match.start()])
+        parts.append(MASK)
+        end = match.end()
+    if not parts:
+        return text
+    parts.append(text[end:])
+    return ''.join(parts)
+
+
+def mask(text: str) -> str:
+    """To replace banned words in text"""
+    return mask_with(matcher(), text)
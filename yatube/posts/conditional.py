@@ -0,0 +1,126 @@
+"""Validators of the feed and detail pages for conditional GET.
+
+They come from an aggregate query or two and the feed generation,
+never from rendering. The ETag covers everything a page shows: the
+generation, which every change to a post card bumps, the newest
+post or comment, which every worker sees even with a cache per
+process, the counters the page prints, the url, and the visitor
+with their session: the page has their name and buttons, and a
+CSRF token that is rotated along with the session on login.
+Last-Modified is the time of the last bump or the newest comment,
+it is only sent to anonymous visitors of pages without counters
+that change outside of the generation.
+
+A cache per process holds a generation of its own worker, which the
+bumps of the others do not reach, but keeps it and the time of the
+last bump CACHE_LOCAL_TIMEOUT at most. A 304 there is as stale as the
+fragments the worker would render anyway, and no staler.
+"""
+import hashlib
+from collections import namedtuple
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.views.decorators.http import condition
+
+from . import fragments, identities, stats
+from .models import Follow, Post
+
+
+# parts go into the ETag, dated pages get a Last-Modified, context
+# holds the objects the view would otherwise load again
+PageState = namedtuple('PageState', 'parts dated context')
+
+
+def _once(state):
+    """To compute the state of a page once per request,
+    condition() and the view ask for it apart"""
+    @wraps(state)
+    def wrapper(request, *args, **kwargs):
+        states = request.__dict__.setdefault('_page_states', {})
+        if state not in states:
+            states[state] = state(request, *args, **kwargs)
+        return states[state]
+    return wrapper
+
+
+@_once
+def index_state(request):
+    latest = Post.objects.aggregate(latest=Max('created'))['latest']
+    return PageState([latest], True, {})
+
+
+@_once
+def group_state(request, slug):
+    group = identities.groups.get(slug)
+    if group is None:
+        return None
+    newest = group.posts.aggregate(latest=Max('created'), pk=Max('pk'))
+    latest = newest['latest']
+    return PageState([group.pk, latest, newest['pk']], True, {
+        'group': group, 'newest': (latest, newest['pk']),
+    })
+
+
+@_once
+def profile_state(request, username):
+    author = identities.users.get(username)
+    if author is None:
+        return None
+    latest = author.posts.aggregate(latest=Max('created'))['latest']
+    counters = stats.get_stats(author)
+    following = request.user.is_authenticated and Follow.objects.filter(
+        user=request.user, author=author
+    ).exists()
+    # follows change the counters without a bump
+    return PageState(
+        [author.pk, latest, counters.posts, counters.followers,
+         counters.following, following],
+        False,
+        {'author': author, 'author_stats': counters, 'following': following},
+    )
+
+
+@_once
+def post_state(request, post_id):
+    post = Post.objects.select_related('author', 'group').annotate(
+        latest=Max('comments__created'), total=Count('comments')
+    ).filter(pk=post_id).first()
+    if post is None:
+        return None
+    return PageState([post.pk, post.latest, post.total], True,
+                     {'post': post})
+
+
+def etag(state):
+    def func(request, *args, **kwargs):
+        page = state(request, *args, **kwargs)
+        if page is None:
+            return None
+        session = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        parts = [fragments.generation(), request.get_full_path(),
+                 request.user.pk, session, *page.parts]
+        return hashlib.md5(repr(parts).encode()).hexdigest()
+    return func
+
+
+def last_modified(state):
+    def func(request, *args, **kwargs):
+        page = state(request, *args, **kwargs)
+        changed = fragments.changed()
+        if (page is None or not page.dated or changed is None
+                or request.user.is_authenticated):
+            return None
+        changed = datetime.fromtimestamp(changed, timezone.utc)
+        return max(value for value in [changed, *page.parts]
+                   if isinstance(value, datetime))
+    return func
+
+
+def conditional(state):
+    """To answer a GET of the view with 304 Not Modified
+    while state of the page is unchanged"""
+    return condition(etag_func=etag(state),
+                     last_modified_func=last_modified(state))
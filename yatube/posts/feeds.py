@@ -0,0 +1,145 @@
+"""Materialized follow feed.
+
+A new post is copied into the timeline of every follower of its
+author, so follow_index reads one user's timeline with an index
+range scan. Authors with more than FOLLOW_FEED_MAX_FOLLOWERS
+followers are not fanned out, and users following such an author
+or more than FOLLOW_FEED_MAX_FOLLOWING authors read the feed with
+the join instead (fan-out-on-read).
+"""
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, QuerySet
+
+from .models import Follow, Post, TimelineEntry, User
+
+BROADCAST_AUTHORS_KEY = 'posts:feed:broadcast'
+BATCH_SIZE = 1000
+
+
+def broadcast_authors() -> set:
+    """To return ids of authors whose posts are not fanned out"""
+    authors = cache.get(BROADCAST_AUTHORS_KEY)
+    if authors is None:
+        authors = list(
+            Follow.objects.values('author')
+            .annotate(followers=Count('pk'))
+            .filter(followers__gt=settings.FOLLOW_FEED_MAX_FOLLOWERS)
+            .values_list('author', flat=True)
+        )
+        cache.set(BROADCAST_AUTHORS_KEY, authors,
+                  settings.FOLLOW_FEED_BROADCAST_TIMEOUT)
+    return set(authors)
+
+
+def uses_timeline(user: User) -> bool:
+    """To decide whether the feed of user is read from the timeline"""
+    if not settings.FOLLOW_FEED_FANOUT:
+        return False
+    authors = set(
+        Follow.objects.filter(user=user).values_list('author', flat=True)
+        [:settings.FOLLOW_FEED_MAX_FOLLOWING + 1]
+    )
+    if len(authors) > settings.FOLLOW_FEED_MAX_FOLLOWING:
+        return False
+    return not authors & broadcast_authors()
+
+
+def timeline(user: User) -> QuerySet:
+    return TimelineEntry.objects.filter(user=user).select_related(
+        'post__author', 'post__group'
+    )
+
+
+def fan_out(post: Post) -> None:
+    """To copy a new post into the timelines of the author's followers"""
+    if (not settings.FOLLOW_FEED_FANOUT
+            or post.author_id in broadcast_authors()):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user', flat=True)
+    _insert(
+        TimelineEntry(user_id=follower, post=post, created=post.created)
+        for follower in followers.iterator()
+    )
+
+
+def backfill(user_id: int, author_id: int) -> None:
+    """To copy all posts of a newly followed author into the timeline"""
+    if (not settings.FOLLOW_FEED_FANOUT
+            or author_id in broadcast_authors()):
+        return
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('pk', 'created')
+    _insert(
+        TimelineEntry(user_id=user_id, post_id=pk, created=created)
+        for pk, created in posts.iterator()
+    )
+
+
+def backfill_all(after: int = 0) -> int:
+    """To copy the posts with pk above after into the timelines of
+    the followers of their authors with one INSERT ... SELECT,
+    for rows written in bulk, returns the number of entries"""
+    if not settings.FOLLOW_FEED_FANOUT:
+        return 0
+    cache.delete(BROADCAST_AUTHORS_KEY)
+    broadcast = sorted(broadcast_authors())
+    sql = (
+        f'INSERT INTO {TimelineEntry._meta.db_table} '
+        f'(user_id, post_id, created) '
+        f'SELECT follow.user_id, post.id, post.created '
+        f'FROM {Follow._meta.db_table} follow '
+        f'JOIN {Post._meta.db_table} post '
+        f'ON post.author_id = follow.author_id WHERE post.id > %s'
+    )
+    if broadcast:
+        sql += ' AND follow.author_id NOT IN (%s)' % ', '.join(
+            ['%s'] * len(broadcast)
+        )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [after, *broadcast])
+        return cursor.rowcount
+
+
+def _insert(entries) -> None:
+    """To write entries by batches, so memory does not
+    grow with the audience of the author"""
+    entries = iter(entries)
+    batch = list(islice(entries, BATCH_SIZE))
+    while batch:
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+        batch = list(islice(entries, BATCH_SIZE))
+
+
+def prune(user_id: int, author_id: int) -> None:
+    """To remove posts of an unfollowed author from the timeline"""
+    TimelineEntry.objects.filter(
+        user_id=user_id,
+        post__author_id=author_id,
+    ).delete()
+
+
+def rebuild(user: User) -> None:
+    """To drop the timeline of user and fill it from scratch"""
+    TimelineEntry.objects.filter(user=user).delete()
+    for author_id in Follow.objects.filter(
+            user=user).values_list('author', flat=True):
+        backfill(user.pk, author_id)
+
+
+def check(user: User):
+    """To return (missing, extra) post ids of the timeline of user,
+    only meaningful for users that read the feed from the timeline"""
+    expected = set(Post.objects.filter(
+        author__following__user=user
+    ).values_list('pk', flat=True))
+    stored = set(TimelineEntry.objects.filter(
+        user=user
+    ).values_list('post', flat=True))
+    return expected - stored, stored - expected
@@ -1,5 +1,6 @@
 from django import forms
 
+from . import blacklist
 from .models import Post, Comment
 
 
@@ -23,17 +24,5 @@ class CommentForm(forms.ModelForm):
         fields = ('text',)
 
     def clean_text(self):
-        """replace the second name from
-        black list on *** """
-        data = self.cleaned_data['text']
-        black_list = {
-            'бузова': '******',
-            'донцова': '******',
-        }
-        data = data.lower()
-        temp_data = data
-        for second_name, replacing in black_list.items():
-            upd_data = temp_data.replace(second_name, replacing)
-            temp_data = upd_data
-        upd_data = upd_data.capitalize()
-        return upd_data
+        """replace words from the black list on ******"""
+        return blacklist.mask(self.cleaned_data['text'])
@@ -0,0 +1,62 @@
+"""Versioned cache for rendered feed fragments.
+
+Fragments are keyed on a feed generation counter and on the ids of
+the posts they show. Any change to what a post card displays bumps
+the generation, so a fragment can live for FEED_CACHE_TIMEOUT
+without ever being served stale. That holds with a shared cache only:
+in a cache per process a bump reaches the generation of its own worker
+alone, so fragments live for CACHE_LOCAL_TIMEOUT there.
+
+Hits and misses are counted in the shared cache for
+fragment_cache_stats, they are not counted in a cache per process,
+which no other process could read.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.cache import bump as bump_counter, current, shared_timeout
+
+GENERATION_KEY = 'posts:feed:generation'
+CHANGED_KEY = 'posts:feed:changed'
+STATS_KEY = 'posts:fragments:{name}:{outcome}'
+
+
+def generation() -> int:
+    return current(GENERATION_KEY)
+
+
+def bump() -> None:
+    """To invalidate every cached feed fragment"""
+    bump_counter(GENERATION_KEY)
+    cache.set(CHANGED_KEY, time.time(), shared_timeout(None))
+
+
+def changed():
+    """To return the time of the last bump, None once it is lost"""
+    return cache.get(CHANGED_KEY)
+
+
+def fragment_key(name: str, post_ids) -> str:
+    ids = ','.join(str(pk) for pk in post_ids)
+    digest = hashlib.md5(ids.encode()).hexdigest()
+    return f'posts:fragment:{name}:{generation()}:{digest}'
+
+
+def record(name: str, hit: bool) -> None:
+    if not settings.CACHE_SHARED:
+        return
+    key = STATS_KEY.format(name=name, outcome='hits' if hit else 'misses')
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, None)
+
+
+def hit_stats(name: str) -> dict:
+    keys = {outcome: STATS_KEY.format(name=name, outcome=outcome)
+            for outcome in ('hits', 'misses')}
+    values = cache.get_many(keys.values())
+    return {outcome: values.get(key, 0) for outcome, key in keys.items()}
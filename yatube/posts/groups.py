@@ -0,0 +1,78 @@
+"""Cached group feed.
+
+The ids of the newest posts of a group, enough for
+GROUP_FEED_CACHED_PAGES pages, are kept as a plain list of
+integers, along with the created and pk of the newest post they
+were read after. Signals drop the list of a group when one of its
+posts is created, moved or deleted. Any change to a group, and bulk
+loads, which send no signals, move the version all the keys carry.
+Groups themselves are looked up through posts.identities.
+
+With a cache per process the signals reach the list of their own
+worker only: the page checks the newest post against the database,
+which catches new posts everywhere, and lists live for
+CACHE_LOCAL_TIMEOUT at most, which bounds moves and deletions.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.cache import bump, current, shared_timeout
+
+from .models import Group
+
+VERSION_KEY = 'posts:groups:version'
+POST_IDS_KEY = 'posts:group:{version}:{group_id}:post_ids'
+CHOICES_KEY = 'posts:groups:{version}:choices'
+
+
+def version() -> int:
+    return current(VERSION_KEY)
+
+
+def changed() -> None:
+    """To drop every cached list of post ids and the choices"""
+    bump(VERSION_KEY)
+
+
+def cached_posts() -> int:
+    # one more id tells whether the last cached page has a next one
+    return settings.GROUP_FEED_CACHED_PAGES * settings.SORTED_VALUES_AMOUNT + 1
+
+
+def post_ids(group: Group, newest=None) -> list:
+    """To return ids of the newest posts of group, newest first.
+    newest is (created, pk) of the newest post of the group in the
+    database, a list read before that post is read again"""
+    key = POST_IDS_KEY.format(version=version(), group_id=group.pk)
+    stamp = repr(newest)
+    cached = cache.get(key)
+    if cached is not None and (newest is None
+                               or cached['newest'] == stamp):
+        return cached['ids']
+    ids = list(group.posts.order_by('-created', '-pk').values_list(
+        'pk', flat=True
+    )[:cached_posts()])
+    cache.set(key, {'newest': stamp, 'ids': ids},
+              shared_timeout(settings.FEED_CACHE_TIMEOUT))
+    return ids
+
+
+def forget_posts(*group_ids) -> None:
+    """To drop the cached post ids of groups, None is no group"""
+    current = version()
+    cache.delete_many([
+        POST_IDS_KEY.format(version=current, group_id=group_id)
+        for group_id in group_ids if group_id is not None
+    ])
+
+
+def choices() -> list:
+    """To return (pk, title) of every group in their order, for the
+    group selects of the admin"""
+    key = CHOICES_KEY.format(version=version())
+    values = cache.get(key)
+    if values is None:
+        values = list(Group.objects.values_list('pk', 'title'))
+        cache.set(key, values, shared_timeout(settings.FEED_CACHE_TIMEOUT))
+    return [tuple(value) for value in values]
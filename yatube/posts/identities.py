@@ -0,0 +1,131 @@
+"""Cached resolution of Group.slug and User.username into rows.
+
+A lookup goes through a bounded LRU of the process, then the shared
+cache, then the database. Misses are cached too, so a bot scanning
+for missing profiles costs a cache read. Signals forget the old and
+the new name of a renamed, created or deleted row in the shared
+cache and in the LRU of their own process. Other processes see the
+change after IDENTITY_LOCAL_TIMEOUT at most: their LRU expires by
+then, and unless the cache is shared, their copy of it too. Bulk
+loads, which send no signals, call clear().
+
+Rows come back with only the fields the pages show loaded, the
+rest are deferred, so a save() writes those fields alone.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.cache import bump, current
+
+from .models import Group, User
+
+VERSION_KEY = 'posts:identities:version'
+KEY = 'posts:identity:{version}:{name}:{digest}'
+
+
+class LRU:
+    """Thread-safe mapping of at most size items with a timeout"""
+
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or item[0] < time.monotonic():
+                return default
+            self._items.move_to_end(key)
+            return item[1]
+
+    def set(self, key, value, timeout=None) -> None:
+        if timeout is None:
+            timeout = self.timeout
+        with self._lock:
+            self._items[key] = (time.monotonic() + timeout, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    def delete(self, key) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+class Resolver:
+    """Finds a row of model by the unique field, keeping fields"""
+
+    def __init__(self, name, model, field, fields):
+        self.name = name
+        self.model = model
+        self.field = field
+        self.fields = fields
+        self.local = LRU(settings.IDENTITY_CACHE_SIZE,
+                         settings.IDENTITY_LOCAL_TIMEOUT)
+
+    def key(self, value) -> str:
+        # any text of the url reaches here, keys stay short and safe
+        digest = hashlib.md5(value.encode()).hexdigest()
+        return KEY.format(version=version(), name=self.name, digest=digest)
+
+    def get(self, value):
+        """To return the row whose field is value, None if none"""
+        values = self.local.get(value)
+        if values is None:
+            key = self.key(value)
+            values = cache.get(key)
+            if values is None:
+                row = self.model.objects.filter(
+                    **{self.field: value}
+                ).values_list(*self.fields).first()
+                # an empty list is a cached miss
+                values = list(row or ())
+                cache.set(key, values, cache_timeout())
+            # read on every call, tests set it to 0
+            self.local.set(value, values, settings.IDENTITY_LOCAL_TIMEOUT)
+        if not values:
+            return None
+        return self.model.from_db('default', self.fields, values)
+
+    def forget(self, *values) -> None:
+        values = [value for value in values if value is not None]
+        cache.delete_many([self.key(value) for value in values])
+        for value in values:
+            self.local.delete(value)
+
+
+groups = Resolver('group', Group, 'slug', ('id', 'title', 'slug',
+                                           'description'))
+users = Resolver('user', User, 'username', ('id', 'username',
+                                            'first_name', 'last_name'))
+RESOLVERS = {Group: groups, User: users}
+
+
+def cache_timeout() -> int:
+    if settings.CACHE_SHARED:
+        return settings.IDENTITY_CACHE_TIMEOUT
+    # a cache per process is no more reachable than the LRU
+    return min(settings.IDENTITY_CACHE_TIMEOUT,
+               settings.IDENTITY_LOCAL_TIMEOUT)
+
+
+def version() -> int:
+    return current(VERSION_KEY)
+
+
+def clear() -> None:
+    """To forget every cached row and miss"""
+    bump(VERSION_KEY)
+    for resolver in RESOLVERS.values():
+        resolver.local.clear()
@@ -0,0 +1,294 @@
+"""Uploaded images of posts processed outside of the request.
+
+Views save the upload as it came, streamed to a temporary file, and
+schedule the post. A thread pool takes it after the transaction
+commits: the whole image is decoded and checked, turned by its EXIF
+orientation, stripped of EXIF and scaled down to POST_IMAGE_MAX_SIZE,
+then the feed thumbnail is rendered with sorl and its url stored in
+Post.thumbnail_url for the templates, along with the srcset of its
+responsive variants in Post.image_sources. Until then the post is
+shown with a placeholder. Post.image is content-addressed, so an
+image uploaded again reuses the file cleaned the first time and the
+thumbnails sorl rendered for it. The pool queue lives in memory:
+posts a stopped worker left pending are taken up by
+generate_thumbnails --pending.
+"""
+import json
+import logging
+import mimetypes
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import EXTENSIONS
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import (EMPTY_VALUE, KVStore,
+                                                       KVStoreModel)
+
+from . import fragments
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+CLEANED_KEY = 'posts:image:cleaned:{name}'
+EXIF_ORIENTATION = 0x0112
+# what Pillow needs to write an image as it was, anything else,
+# comments and XMP, goes with EXIF
+KEPT_INFO = ('transparency', 'icc_profile', 'dpi')
+
+_executor = None
+
+
+def executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def make_thumbnail(image):
+    return get_thumbnail(image,
+                         settings.POST_THUMBNAIL_GEOMETRY,
+                         **settings.POST_THUMBNAIL_OPTIONS)
+
+
+def variant_formats() -> list:
+    """To keep the configured formats both Pillow and sorl can write"""
+    Image.init()
+    return [fmt for fmt in settings.POST_IMAGE_FORMATS
+            if fmt in Image.SAVE and fmt in EXTENSIONS]
+
+
+def variant_geometry(width: int) -> str:
+    """To scale the feed thumbnail geometry down to width"""
+    base_width, base_height = (
+        int(side) for side in settings.POST_THUMBNAIL_GEOMETRY.split('x')
+    )
+    return f'{width}x{round(width * base_height / base_width)}'
+
+
+def make_variants(image) -> dict:
+    """To render image at every POST_IMAGE_WIDTHS, in every variant
+    format and in its own one, and return srcset by MIME type,
+    modern formats first"""
+    sources = {}
+    for fmt in [*variant_formats(), None]:
+        options = dict(settings.POST_THUMBNAIL_OPTIONS)
+        if fmt:
+            options['format'] = fmt
+        thumbnails = [
+            (get_thumbnail(image, variant_geometry(width), **options), width)
+            for width in settings.POST_IMAGE_WIDTHS
+        ]
+        mime_type = mimetypes.guess_type(thumbnails[0][0].name)[0]
+        sources.setdefault(mime_type, ', '.join(
+            f'{thumbnail.url} {width}w' for thumbnail, width in thumbnails
+        ))
+    return sources
+
+
+def _needs_saving(source) -> bool:
+    orientation = source.getexif().get(EXIF_ORIENTATION, 1)
+    return ('exif' in source.info or orientation != 1
+            or max(source.size) > settings.POST_IMAGE_MAX_SIZE)
+
+
+def clean_image(image) -> str:
+    """To check the whole uploaded image, save it turned upright,
+    without EXIF and at most POST_IMAGE_MAX_SIZE a side under a new
+    name, returns the name of the image to keep. Raises whatever
+    Pillow raises on a broken or a too large image"""
+    storage = image.storage
+    with storage.open(image.name) as file:
+        with Image.open(file) as source:
+            source.verify()
+    with storage.open(image.name) as file, Image.open(file) as source:
+        # animations would lose their frames, small clean images
+        # are kept as they came
+        if getattr(source, 'is_animated', False) or not _needs_saving(
+                source):
+            return image.name
+        image_format = source.format
+        side = settings.POST_IMAGE_MAX_SIZE
+        # JPEG decodes at the nearest scale above the size asked for
+        source.draft(source.mode, (side, side))
+        cleaned = ImageOps.exif_transpose(source)
+        cleaned.thumbnail((side, side), Image.LANCZOS)
+        # some plugins write what info holds, others what save is given
+        cleaned.info = {key: value for key, value in source.info.items()
+                        if key in KEPT_INFO}
+        buffer = BytesIO()
+        cleaned.save(buffer, image_format,
+                     quality=settings.POST_IMAGE_QUALITY, **cleaned.info)
+    name = image.field.generate_filename(None, os.path.basename(image.name))
+    return storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def cleaned_image(image) -> str:
+    """To return clean_image of an upload, reusing the file cleaned
+    for the same upload before: names are content hashes, the same
+    name is the same image"""
+    key = CLEANED_KEY.format(name=image.name)
+    name = cache.get(key)
+    if name == image.name or name and image.storage.reference(name):
+        return name
+    name = clean_image(image)
+    cache.set(key, name, None)
+    return name
+
+
+def process_image(post_id: int) -> str:
+    """To clean the uploaded image of a pending post and render its
+    thumbnails, returns the thumbnail url. A broken image is dropped
+    from the post"""
+    post = Post.objects.filter(pk=post_id).only(
+        'image', 'image_pending'
+    ).first()
+    if post is None or not post.image:
+        return ''
+    if post.image_pending:
+        uploaded = post.image.name
+        try:
+            name = cleaned_image(post.image)
+        except Exception:
+            logger.warning('Image of post %s is broken', post_id,
+                           exc_info=True)
+            Post.objects.filter(pk=post_id, image=uploaded).update(
+                image='', image_pending=False
+            )
+            post.image.storage.delete(uploaded)
+            fragments.bump()
+            return ''
+        if name != uploaded:
+            # the image may have been replaced while we were busy
+            if not Post.objects.filter(pk=post_id, image=uploaded).update(
+                    image=name):
+                post.image.storage.delete(name)
+                return ''
+            post.image.storage.delete(uploaded)
+    return generate_thumbnail(post_id)
+
+
+def thumbnail_name(image) -> str:
+    """To name the thumbnail of image the way get_thumbnail does,
+    without touching the storage or the key-value store"""
+    backend = default.backend
+    source = ImageFile(image)
+    options = dict(settings.POST_THUMBNAIL_OPTIONS)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return backend._get_thumbnail_filename(
+        source, settings.POST_THUMBNAIL_GEOMETRY, options
+    )
+
+
+def resolve_thumbnails(posts) -> None:
+    """To fill thumbnail_url of the posts of a page whose thumbnail
+    is not stored yet with one bulk read of the sorl key-value store.
+    Thumbnails sorl has never rendered are left to the template."""
+    kvstore = default.kvstore
+    if not isinstance(kvstore, KVStore):
+        return
+    names = {}
+    for post in posts:
+        if post.image and not post.thumbnail_url and not post.image_pending:
+            name = thumbnail_name(post.image)
+            key = add_prefix(ImageFile(name, default.storage).key)
+            names.setdefault(key, (name, []))[1].append(post)
+    if not names:
+        return
+    found = kvstore.cache.get_many(names)
+    missing = [key for key in names if key not in found]
+    if missing:
+        stored = dict(KVStoreModel.objects.filter(
+            key__in=missing
+        ).values_list('key', 'value'))
+        kvstore.cache.set_many(
+            {key: stored.get(key, EMPTY_VALUE) for key in missing},
+            sorl_settings.THUMBNAIL_CACHE_TIMEOUT,
+        )
+        found.update(stored)
+    for key, (name, key_posts) in names.items():
+        if found.get(key, EMPTY_VALUE) is EMPTY_VALUE:
+            continue
+        url = default.storage.url(name)
+        for post in key_posts:
+            post.thumbnail_url = url
+
+
+def generate_thumbnail(post_id: int) -> str:
+    """To render the thumbnail of a post with its variants
+    and store their urls"""
+    post = Post.objects.filter(pk=post_id).only('image').first()
+    if post is None or not post.image:
+        return ''
+    url = make_thumbnail(post.image).url
+    sources = make_variants(post.image)
+    # the image may have been replaced while we were busy
+    Post.objects.filter(pk=post_id, image=post.image.name).update(
+        thumbnail_url=url,
+        image_sources=json.dumps(sources),
+        image_pending=False,
+    )
+    fragments.bump()
+    return url
+
+
+def _render(post_id: int) -> None:
+    try:
+        process_image(post_id)
+    except Exception:
+        logger.exception('Thumbnail of post %s failed', post_id)
+        # the template renders the thumbnail itself then
+        Post.objects.filter(pk=post_id).update(image_pending=False)
+        fragments.bump()
+
+
+def _run(post_id: int) -> None:
+    try:
+        _render(post_id)
+    finally:
+        connection.close()
+
+
+def release(*names) -> None:
+    """To drop references of posts to image files once the transaction
+    commits, the last reference to a file deletes it"""
+    storage = Post._meta.get_field('image').storage
+    names = [name for name in names if name]
+
+    def delete():
+        for name in names:
+            storage.delete(name)
+
+    if names:
+        transaction.on_commit(delete)
+
+
+def schedule(post: Post) -> None:
+    """To process the image of post once the transaction commits,
+    in the pool unless THUMBNAIL_WORKERS is 0"""
+    if not post.image:
+        return
+    if settings.THUMBNAIL_WORKERS:
+        transaction.on_commit(lambda: executor().submit(_run, post.pk))
+    else:
+        transaction.on_commit(lambda: _render(post.pk))
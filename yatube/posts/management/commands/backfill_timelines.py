@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from posts import feeds
+from posts.models import Follow, User
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the materialized follow feeds from the Follow table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='*',
+                            help='only rebuild feeds of these users')
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(
+            pk__in=Follow.objects.values('user')
+        )
+        if options['usernames']:
+            users = User.objects.filter(username__in=options['usernames'])
+        rebuilt = 0
+        for user in users.iterator():
+            feeds.rebuild(user)
+            rebuilt += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {rebuilt} timelines'
+        ))
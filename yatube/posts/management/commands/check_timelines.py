@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import feeds
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = ('Compares the materialized follow feeds with the Follow table '
+            'and fails if they differ')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true',
+                            help='rebuild the broken timelines')
+
+    def handle(self, *args, **options):
+        broken = 0
+        for user in User.objects.only('username').iterator():
+            if not feeds.uses_timeline(user):
+                continue
+            missing, extra = feeds.check(user)
+            if not missing and not extra:
+                continue
+            broken += 1
+            self.stdout.write(
+                f'{user.username}: {len(missing)} missing, '
+                f'{len(extra)} extra entries'
+            )
+            if options['fix']:
+                feeds.rebuild(user)
+        if broken and not options['fix']:
+            raise CommandError(f'{broken} timelines are inconsistent')
+        message = 'Timelines are consistent'
+        if broken:
+            message = f'{broken} timelines fixed'
+        self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,100 @@
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+
+from posts.models import Follow, Group, Post
+from posts.paginators import encode_cursor
+
+# plan lines that read a table without an index but are fine
+HARMLESS_SCANS = ('CONSTANT ROW', '(subquery', 'VIRTUAL TABLE')
+
+
+def full_scans(plan) -> list:
+    """To pick the lines of EXPLAIN QUERY PLAN that scan a whole table"""
+    return [
+        detail for detail in plan
+        if detail.startswith('SCAN') and 'USING' not in detail
+        and not any(harmless in detail for harmless in HARMLESS_SCANS)
+    ]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Runs EXPLAIN QUERY PLAN on the queries of every feed view '
+            'and fails when one of them scans a whole table')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('EXPLAIN QUERY PLAN is SQLite only')
+        failures = 0
+        for name, url, user in self.requests():
+            for sql in self.capture(url, user):
+                plan = self.explain(sql)
+                scans = full_scans(plan)
+                failures += bool(scans)
+                # a sort is worth a look, a LIMIT can not stop it early
+                sorts = any('TEMP B-TREE' in detail for detail in plan)
+                if scans or sorts or options['verbosity'] > 1:
+                    style = (self.style.ERROR if scans else
+                             self.style.WARNING if sorts else
+                             self.style.NOTICE)
+                    self.stdout.write(style(f'{name}: {sql}'))
+                    for detail in plan:
+                        self.stdout.write(f'    {detail}')
+        if failures:
+            raise CommandError(f'{failures} queries scan a whole table')
+        self.stdout.write(self.style.SUCCESS('No full table scans'))
+
+    def requests(self):
+        """To yield (name, url, user) for each view that has data,
+        feeds twice: the first page and a page reached by cursor"""
+        post = Post.objects.select_related('author').first()
+        group = Group.objects.first()
+        follow = Follow.objects.select_related('user').first()
+        feeds = [('index', reverse('posts:all posts'), None)]
+        if post is not None:
+            feeds.append(('profile', reverse(
+                'posts:profile', args=(post.author.username,)
+            ), None))
+            yield 'post_detail', reverse(
+                'posts:post_detail', args=(post.pk,)
+            ), None
+        if group is not None:
+            feeds.append(('group_posts', reverse(
+                'posts:sorted_posts', args=(group.slug,)
+            ), None))
+        if follow is not None:
+            feeds.append(
+                ('follow_index', reverse('posts:follow_index'), follow.user)
+            )
+        for name, url, user in feeds:
+            yield name, url, user
+            if post is not None:
+                # the plan of a seek does not depend on the cursor value
+                yield name, f'{url}?page=2&after={encode_cursor(post)}', user
+
+    def capture(self, url, user):
+        """To return the SELECTs a GET of url runs, rolled back"""
+        request = RequestFactory().get(url)
+        request.user = user or AnonymousUser()
+        match = resolve(request.path)
+        try:
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as captured:
+                    match.func(request, *match.args, **match.kwargs)
+                raise Rollback
+        except Rollback:
+            pass
+        return [query['sql'] for query in captured.captured_queries
+                if query['sql'].lstrip().upper().startswith('SELECT')]
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall()]
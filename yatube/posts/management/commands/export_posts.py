@@ -0,0 +1,43 @@
+import sys
+
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = ('Streams users, groups, posts, comments and follows '
+            'to NDJSON or to the columnar format of posts.transfer')
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='file to write, - for stdout')
+        parser.add_argument('--columnar', action='store_true',
+                            help='compact columnar format instead of NDJSON')
+        parser.add_argument('--chunk-size', type=int,
+                            default=transfer.CHUNK_SIZE)
+        parser.add_argument('--media',
+                            help='directory to copy the post images to')
+        parser.add_argument('--jobs', type=int, default=8,
+                            help='threads copying the images')
+
+    def handle(self, *args, **options):
+        if options['output'] == '-':
+            written = transfer.dump(sys.stdout.buffer, options['columnar'],
+                                    options['chunk_size'])
+        else:
+            with open(options['output'], 'wb') as stream:
+                written = transfer.dump(stream, options['columnar'],
+                                        options['chunk_size'])
+        copied = 0
+        if options['media']:
+            copied = transfer.copy_files(
+                transfer.image_names(), default_storage,
+                FileSystemStorage(location=options['media']),
+                options['jobs'],
+            )
+        self.stderr.write(self.style.SUCCESS(
+            'Exported ' + ', '.join(
+                f'{rows} {kind}s' for kind, rows in written.items()
+            ) + f', copied {copied} images'
+        ))
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import fragments
+
+
+class Command(BaseCommand):
+    help = 'Shows hits and misses of the cached feed fragments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', default=['index_page'],
+                            help='fragment names, index_page by default')
+
+    def handle(self, *args, **options):
+        if not settings.CACHE_SHARED:
+            # this process has a cache of its own, the workers' counts
+            # are out of its reach
+            raise CommandError(
+                'Fragment stats are kept in a shared cache only, '
+                'set YATUBE_CACHE_BACKEND=sqlite'
+            )
+        for name in options['names']:
+            stats = fragments.hit_stats(name)
+            total = stats['hits'] + stats['misses']
+            ratio = stats['hits'] / total if total else 0
+            self.stdout.write(
+                f'{name}: {stats["hits"]} hits, {stats["misses"]} misses, '
+                f'hit rate {ratio:.1%}'
+            )
@@ -0,0 +1,117 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+
+from posts import fragments
+from posts.images import make_thumbnail, make_variants, process_image
+from posts.models import Post
+
+CHUNK_SIZE = 100
+
+
+def render_chunk(post_ids):
+    """To render thumbnails of a chunk of posts in a worker process"""
+    urls = {}
+    for post in Post.objects.filter(pk__in=post_ids).only('image'):
+        try:
+            urls[post.pk] = (
+                post.image.name,
+                make_thumbnail(post.image).url,
+                make_variants(post.image),
+            )
+        except Exception as error:
+            urls[post.pk] = (post.image.name, error, None)
+    return urls
+
+
+class Command(BaseCommand):
+    help = 'Renders the feed thumbnails of every post with an image'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='worker processes, one per core by default')
+        parser.add_argument('--missing', action='store_true',
+                            help='skip posts that already have '
+                                 'a thumbnail and its variants')
+        parser.add_argument('--pending', type=int, metavar='MINUTES',
+                            help='only process the uploads still pending '
+                                 'MINUTES after they were stored, left by '
+                                 'a worker that stopped')
+
+    def handle(self, *args, **options):
+        if options['pending'] is not None:
+            self.process_pending(timedelta(minutes=options['pending']))
+            return
+        # pending uploads are not checked yet, their worker renders them,
+        # or --pending when the worker is gone
+        posts = Post.objects.exclude(image='').filter(image_pending=False)
+        if options['missing']:
+            posts = posts.filter(Q(thumbnail_url='') | Q(image_sources=''))
+        post_ids = list(posts.values_list('pk', flat=True))
+        chunks = [post_ids[i:i + CHUNK_SIZE]
+                  for i in range(0, len(post_ids), CHUNK_SIZE)]
+        if options['workers'] > 1:
+            # forked workers must not share the parent's connections
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+                done, failed = self.store(pool.map(render_chunk, chunks))
+        else:
+            done, failed = self.store(map(render_chunk, chunks))
+        fragments.bump()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rendered {done} thumbnails, {failed} failed'
+        ))
+
+    def store(self, results):
+        done = failed = 0
+        for urls in results:
+            for pk, (image, url, sources) in urls.items():
+                if isinstance(url, Exception):
+                    failed += 1
+                    self.stderr.write(f'post {pk}: {url}')
+                    continue
+                Post.objects.filter(pk=pk, image=image).update(
+                    thumbnail_url=url,
+                    image_sources=json.dumps(sources),
+                )
+                done += 1
+        return done, failed
+
+    def process_pending(self, age):
+        """To clean and render the images of pending posts whose upload
+        is older than age. Pools keep their queue in memory, a worker
+        that stopped leaves its posts pending. The age of an upload is
+        that of its file: content shared with an earlier upload counts
+        from then, and a post still queued may be processed twice,
+        which the updates of process_image allow"""
+        stored_before = timezone.now() - age
+        done = dropped = failed = 0
+        posts = Post.objects.filter(image_pending=True).exclude(
+            image=''
+        ).only('image')
+        for post in posts:
+            storage = post.image.storage
+            # a lost file is stale too, process_image drops it
+            if storage.exists(post.image.name) and (
+                    storage.get_modified_time(post.image.name)
+                    > stored_before):
+                continue
+            try:
+                if process_image(post.pk):
+                    done += 1
+                else:
+                    dropped += 1
+            except Exception as error:
+                failed += 1
+                self.stderr.write(f'post {post.pk}: {error}')
+        fragments.bump()
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {done} pending images, {dropped} dropped, '
+            f'{failed} failed'
+        ))
@@ -0,0 +1,44 @@
+import sys
+
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = ('Loads a dump of export_posts in batches into a database '
+            'without groups, posts, comments and follows')
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='file to read, - for stdin')
+        parser.add_argument('--batch-size', type=int,
+                            default=transfer.CHUNK_SIZE)
+        parser.add_argument('--media',
+                            help='directory to copy the post images from')
+        parser.add_argument('--jobs', type=int, default=8,
+                            help='threads copying the images')
+
+    def handle(self, *args, **options):
+        try:
+            if options['input'] == '-':
+                loaded = transfer.load(sys.stdin.buffer,
+                                       options['batch_size'])
+            else:
+                with open(options['input'], 'rb') as stream:
+                    loaded = transfer.load(stream, options['batch_size'])
+        except transfer.TransferError as error:
+            raise CommandError(error)
+        copied = 0
+        if options['media']:
+            copied = transfer.copy_files(
+                transfer.image_names(),
+                FileSystemStorage(location=options['media']),
+                default_storage, options['jobs'],
+            )
+        self.stdout.write(self.style.SUCCESS(
+            'Imported ' + ', '.join(
+                f'{rows} {kind}s' for kind, rows in loaded.items()
+            ) + f', copied {copied} images. '
+            'Run generate_thumbnails --missing for their thumbnails'
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = ('Indexes every post for the full-text search, needed after '
+            'switching POST_SEARCH_FTS or restoring posts without signals')
+
+    def handle(self, *args, **options):
+        indexed = search.rebuild()
+        backend = 'FTS5' if search.uses_fts() else 'SearchTerm'
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {indexed} posts into {backend}'
+        ))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from posts import stats
+from posts.models import User, UserStats
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = 'Recounts the denormalized user counters and repairs drift'
+
+    def handle(self, *args, **options):
+        user_ids = User.objects.order_by('pk').values_list('pk', flat=True)
+        repaired = 0
+        batch = []
+        for user_id in user_ids.iterator():
+            batch.append(user_id)
+            if len(batch) == BATCH_SIZE:
+                repaired += self.recount(batch)
+                batch = []
+        if batch:
+            repaired += self.recount(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'Repaired {repaired} stats rows'
+        ))
+
+    def recount(self, user_ids):
+        counters = stats.count(user_ids)
+        stored = UserStats.objects.in_bulk(user_ids)
+        changed, missing = [], []
+        for user_id, values in counters.items():
+            row = stored.get(user_id)
+            if row is None:
+                missing.append(UserStats(user_id=user_id, **values))
+                continue
+            if any(getattr(row, f) != v for f, v in values.items()):
+                for field, value in values.items():
+                    setattr(row, field, value)
+                changed.append(row)
+        UserStats.objects.bulk_update(changed, list(stats.COUNTED))
+        UserStats.objects.bulk_create(missing)
+        return len(changed) + len(missing)
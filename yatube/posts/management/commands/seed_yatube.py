@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.seeding import Seeder
+
+
+class Command(BaseCommand):
+    help = ('Fills the database with synthetic users, groups, posts, '
+            'comments and follows in bulk, for runs at production scale')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=30000)
+        parser.add_argument('--follows', type=int, default=10,
+                            help='mean number of authors a user follows')
+        parser.add_argument('--alpha', type=float, default=1.0,
+                            help='exponent of the Zipf law of authors')
+        parser.add_argument('--days', type=int, default=365,
+                            help='posts are spread over this many days')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--raw', action='store_true',
+                            help='multi-row INSERT instead of bulk_create')
+        parser.add_argument('--prefix', default='seed',
+                            help='of the usernames and group slugs')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        seeder = Seeder(
+            batch_size=options['batch_size'], raw=options['raw'],
+            alpha=options['alpha'], days=options['days'],
+            prefix=options['prefix'], seed=options['seed'],
+        )
+        start = time.perf_counter()
+        try:
+            report = seeder.seed(
+                users=options['users'], groups=options['groups'],
+                posts=options['posts'], comments=options['comments'],
+                follows=options['follows'],
+            )
+        except ValueError as error:
+            raise CommandError(f'{error}, pick another --prefix')
+        total = 0
+        for table, (rows, seconds) in report.items():
+            total += rows
+            self.stdout.write(
+                f'{table}: {rows} rows in {seconds:.1f} s, '
+                f'{rows / max(seconds, 1e-9):.0f} rows/s'
+            )
+        seconds = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {total} rows in {seconds:.1f} s, '
+            f'{total / max(seconds, 1e-9):.0f} rows/s'
+        ))
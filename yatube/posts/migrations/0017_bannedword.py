@@ -0,0 +1,35 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:08
+
+from django.db import migrations, models
+
+# the list CommentForm.clean_text used to hard-code
+INITIAL_WORDS = ('бузова', 'донцова')
+
+
+def add_initial_words(apps, schema_editor):
+    BannedWord = apps.get_model('posts', 'BannedWord')
+    BannedWord.objects.bulk_create(
+        BannedWord(word=word) for word in INITIAL_WORDS
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_post_image_sources'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BannedWord',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('word', models.CharField(max_length=100, unique=True, verbose_name='Слово')),
+            ],
+            options={
+                'verbose_name_plural': 'Запрещённые слова',
+                'ordering': ('word',),
+            },
+        ),
+        migrations.RunPython(add_initial_words, migrations.RunPython.noop),
+    ]
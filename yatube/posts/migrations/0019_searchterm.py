@@ -0,0 +1,67 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:12
+
+import re
+from collections import Counter
+
+from django.db import OperationalError, migrations, models, transaction
+import django.db.models.deletion
+
+FTS_TABLE = 'posts_post_fts'
+
+
+def create_index(apps, schema_editor):
+    """Fill the FTS5 table where SQLite has it, SearchTerm elsewhere"""
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        try:
+            with transaction.atomic(using=connection.alias):
+                schema_editor.execute(
+                    f'CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(text)'
+                )
+        except OperationalError:
+            pass
+        else:
+            schema_editor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, text) '
+                f'SELECT id, text FROM posts_post'
+            )
+            return
+    Post = apps.get_model('posts', 'Post')
+    SearchTerm = apps.get_model('posts', 'SearchTerm')
+    for post in Post.objects.only('text').iterator():
+        words = Counter(re.findall(r'[^\W_]+', post.text.lower()))
+        SearchTerm.objects.bulk_create(
+            SearchTerm(term=term[:100], post=post, count=count)
+            for term, count in words.items()
+        )
+
+
+def drop_index(apps, schema_editor):
+    schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_comment_post_created_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=100)),
+                ('count', models.IntegerField(default=1)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='posts.Post')),
+            ],
+            options={
+                'verbose_name_plural': 'Поисковый индекс',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchterm',
+            constraint=models.UniqueConstraint(fields=('term', 'post'), name='one search term per post'),
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_comment_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_pending',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Картинка обрабатывается'),
+        ),
+    ]
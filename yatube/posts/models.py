@@ -1,8 +1,11 @@
+import json
+
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.conf import settings
 
 from core.models import CreatedModel
+from core.storage import ContentAddressedStorage
 
 User = get_user_model()
 
@@ -40,15 +43,48 @@ class Post(CreatedModel):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True
     )
+    image_pending = models.BooleanField(
+        'Картинка обрабатывается',
+        default=False,
+        editable=False,
+    )
+    thumbnail_url = models.CharField(
+        'Адрес миниатюры',
+        max_length=255,
+        blank=True,
+        editable=False,
+    )
+    image_sources = models.TextField(
+        'Варианты миниатюры',
+        blank=True,
+        editable=False,
+        help_text='srcset по MIME-типу в JSON',
+    )
 
     def __str__(self):
         return self.text[:settings.SYMBOL_RESTRICTION_FOR_POST_NAME]
 
+    @property
+    def sources(self) -> dict:
+        try:
+            return json.loads(self.image_sources or '{}')
+        except ValueError:
+            return {}
+
     class Meta:
         ordering = ('-created',)
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(fields=('-created', '-id'),
+                         name='post_created_id_idx'),
+            models.Index(fields=('group', '-created', '-id'),
+                         name='post_group_created_idx'),
+            models.Index(fields=('author', '-created', '-id'),
+                         name='post_author_created_idx'),
+        ]
 
 
 class Comment(CreatedModel):
@@ -73,6 +109,13 @@ class Comment(CreatedModel):
     class Meta:
         ordering = ('-created',)
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(fields=('post', '-created', '-id'),
+                         name='comment_post_created_idx'),
+            # the admin changelist and its date hierarchy
+            models.Index(fields=('-created', '-id'),
+                         name='comment_created_id_idx'),
+        ]
 
 
 class Follow(models.Model):
@@ -96,3 +139,87 @@ class Follow(models.Model):
                 name='users follow on uniq authors'
             )
         ]
+
+
+class TimelineEntry(models.Model):
+    """Post of a followed author, copied into the follower's
+    timeline when the post is written (fan-out-on-write)"""
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name='timeline',
+                             )
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name='timeline_entries',
+                             )
+    created = models.DateTimeField(verbose_name='Дата создания поста')
+
+    class Meta:
+        verbose_name_plural = 'Ленты подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='one timeline entry per post'
+            )
+        ]
+        indexes = [
+            models.Index(fields=('user', '-created', '-id'),
+                         name='timeline_user_created_idx'),
+        ]
+
+
+class UserStats(models.Model):
+    """Counters shown on the profile and post pages, kept
+    up to date by signals instead of COUNT on every render"""
+    user = models.OneToOneField(User,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name='stats',
+                                )
+    posts = models.IntegerField(default=0, verbose_name='Постов')
+    followers = models.IntegerField(default=0, verbose_name='Подписчиков')
+    following = models.IntegerField(default=0, verbose_name='Подписок')
+    comments = models.IntegerField(default=0, verbose_name='Комментариев')
+
+    class Meta:
+        verbose_name_plural = 'Статистика пользователей'
+
+
+class BannedWord(models.Model):
+    """Word masked in comments, see posts.blacklist"""
+    word = models.CharField('Слово', max_length=100, unique=True)
+
+    def __str__(self):
+        return self.word
+
+    def clean(self):
+        # before the unique check of the forms, which runs after clean()
+        self.word = self.word.strip().lower()
+
+    def save(self, *args, **kwargs):
+        self.word = self.word.strip().lower()
+        super().save(*args, **kwargs)
+
+    class Meta:
+        ordering = ('word',)
+        verbose_name_plural = 'Запрещённые слова'
+
+
+class SearchTerm(models.Model):
+    """Word of a post in the pure-Python search index,
+    used where SQLite FTS5 is not available"""
+    term = models.CharField(max_length=100)
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name='search_terms',
+                             )
+    count = models.IntegerField(default=1)
+
+    class Meta:
+        verbose_name_plural = 'Поисковый индекс'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['term', 'post'],
+                name='one search term per post'
+            )
+        ]
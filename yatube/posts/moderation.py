@@ -0,0 +1,151 @@
+"""Bulk moderation of posts and comments for the admin actions.
+
+Rows are changed by chunks of CHUNK_SIZE ids, each chunk a few
+UPDATE or DELETE statements in one transaction, and each chunk is
+logged as progress. No signals are sent, so what they would keep
+is kept once per call instead: the cached group feeds are forgotten,
+the feed generation is bumped, deleted posts leave the search index
+and release their image files, and the counters of every author
+touched are dropped, to be counted again exactly on their next read
+as after a bulk load.
+"""
+import logging
+from itertools import islice
+
+from django.db import connection, transaction
+
+from . import blacklist, fragments, groups, images, search
+from .models import Comment, Post, UserStats
+
+CHUNK_SIZE = 500
+
+logger = logging.getLogger(__name__)
+
+
+def _chunks(ids, size=CHUNK_SIZE):
+    ids = iter(ids)
+    chunk = list(islice(ids, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(ids, size))
+
+
+def _progress(action, ids):
+    """To yield the chunks of ids, logging how far action got
+    after each one"""
+    done = 0
+    for chunk in _chunks(ids):
+        yield chunk
+        done += len(chunk)
+        logger.info('%s: %d of %d', action, done, len(ids))
+
+
+def _values(queryset, field) -> set:
+    return set(queryset.order_by().values_list(field, flat=True).distinct())
+
+
+def _execute_delete(model, column, ids) -> int:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {model._meta.db_table} WHERE {column} IN '
+            f'({", ".join(["%s"] * len(ids))})', ids
+        )
+        return cursor.rowcount
+
+
+def _delete_rows(model, ids) -> int:
+    """To DELETE the rows of model with pk in ids, first the rows
+    pointing at them, as the cascade of delete() would. Every
+    relation to posts and comments cascades"""
+    for relation in model._meta.related_objects:
+        related = relation.related_model
+        if related._meta.related_objects:
+            _delete_rows(related, list(related._base_manager.filter(
+                **{f'{relation.field.name}__in': ids}
+            ).values_list('pk', flat=True)))
+        else:
+            _execute_delete(related, relation.field.column, ids)
+    return _execute_delete(model, model._meta.pk.column, ids)
+
+
+def _forget_stats(user_ids) -> None:
+    # the rows are made again from exact counts on their next read
+    for chunk in _chunks(user_ids):
+        UserStats.objects.filter(user_id__in=chunk).delete()
+
+
+def move_posts(post_ids, group_id) -> int:
+    """To put the posts into the group, None for no group,
+    returns the number of posts moved"""
+    touched = {group_id}
+    moved = 0
+    for chunk in _progress('move_posts', post_ids):
+        posts = Post.objects.filter(pk__in=chunk).exclude(group_id=group_id)
+        with transaction.atomic():
+            touched |= _values(posts, 'group_id')
+            moved += posts.update(group_id=group_id)
+    groups.forget_posts(*touched)
+    fragments.bump()
+    return moved
+
+
+def delete_posts(post_ids) -> int:
+    """To delete the posts with their comments,
+    returns the number of posts deleted"""
+    authors, touched = set(), set()
+    deleted = 0
+    for chunk in _progress('delete_posts', post_ids):
+        with transaction.atomic():
+            posts = Post.objects.filter(pk__in=chunk)
+            authors |= _values(posts, 'author_id')
+            authors |= _values(Comment.objects.filter(post__in=chunk),
+                               'author_id')
+            touched |= _values(posts, 'group_id')
+            images.release(*posts.exclude(image='').values_list(
+                'image', flat=True
+            ))
+            search.remove_posts(chunk)
+            deleted += _delete_rows(Post, chunk)
+    _forget_stats(authors)
+    groups.forget_posts(*touched)
+    fragments.bump()
+    return deleted
+
+
+def delete_comments(comment_ids) -> int:
+    """To delete the comments, returns their number"""
+    authors = set()
+    deleted = 0
+    for chunk in _progress('delete_comments', comment_ids):
+        with transaction.atomic():
+            authors |= _values(Comment.objects.filter(pk__in=chunk),
+                               'author_id')
+            deleted += _delete_rows(Comment, chunk)
+    _forget_stats(authors)
+    # Last-Modified of the post pages can not see a deleted comment
+    fragments.bump()
+    return deleted
+
+
+def censor(model, ids) -> int:
+    """To mask the banned words in the text of posts or comments,
+    returns the number of rows changed"""
+    pattern = blacklist.matcher()
+    changed = 0
+    for chunk in _progress('censor', ids):
+        rows = []
+        for pk, text in model.objects.filter(pk__in=chunk).values_list(
+                'pk', 'text'):
+            masked = blacklist.mask_with(pattern, text)
+            if masked != text:
+                rows.append(model(pk=pk, text=masked))
+        with transaction.atomic():
+            # one UPDATE ... CASE WHEN for the chunk
+            model.objects.bulk_update(rows, ['text'])
+            if model is Post:
+                for post in rows:
+                    search.index_post(post)
+        changed += len(rows)
+    if changed:
+        fragments.bump()
+    return changed
@@ -0,0 +1,239 @@
+import datetime
+import hashlib
+from math import ceil
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db import connection
+from django.db.models import Max, Q
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=timezone.utc)
+# what an SQLite INTEGER holds
+MAX_INTEGER = 2 ** 63 - 1
+
+
+def encode_cursor(obj) -> str:
+    """To pack (created, pk) of an object into an url-safe token"""
+    micros = (obj.created - EPOCH) // datetime.timedelta(microseconds=1)
+    return f'{micros}-{obj.pk}'
+
+
+def decode_cursor(token):
+    """To unpack a token made by encode_cursor,
+    None for a missing or broken one"""
+    try:
+        micros, pk = (int(part) for part in token.split('-'))
+        created = EPOCH + datetime.timedelta(microseconds=micros)
+    except (AttributeError, ValueError, OverflowError):
+        return None
+    if not (abs(micros) <= MAX_INTEGER and 0 < pk <= MAX_INTEGER):
+        return None
+    return created, pk
+
+
+class KeysetPaginator(Paginator):
+    """Paginator for CreatedModel querysets ordered by (-created, -pk).
+
+    Pages reached through a cursor are read with an index seek
+    instead of OFFSET, direct jumps to a page number fall back
+    to OFFSET. The total count is only used for the page links,
+    so it is cached for PAGINATOR_COUNT_CACHE_TIMEOUT seconds.
+
+    Pages are plain django Page objects, the cursors of the
+    neighbour pages are kept on the paginator.
+    """
+
+    ordering = ('-created', '-pk')
+
+    def __init__(self, object_list, per_page, after=None, before=None):
+        super().__init__(object_list.order_by(*self.ordering), per_page)
+        self.after = decode_cursor(after)
+        self.before = decode_cursor(before)
+        self.next_cursor = ''
+        self.previous_cursor = ''
+        self._last_page = None
+        self._known_pages = 0
+
+    @cached_property
+    def count_cache_key(self):
+        query = str(self.object_list.query).encode()
+        return 'posts:count:' + hashlib.md5(query).hexdigest()
+
+    @cached_property
+    def count(self):
+        count = cache.get(self.count_cache_key)
+        if count is None:
+            count = self.object_list.count()
+            cache.set(self.count_cache_key, count,
+                      settings.PAGINATOR_COUNT_CACHE_TIMEOUT)
+        return count
+
+    @cached_property
+    def num_pages(self):
+        if self._last_page:
+            return self._last_page
+        hits = max(1, self.count)
+        return max(ceil(hits / self.per_page), self._known_pages)
+
+    def validate_number(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('That page number is not an integer')
+        if number < 1:
+            raise EmptyPage('That page number is less than 1')
+        return number
+
+    def get_page(self, number):
+        try:
+            return self.page(number)
+        except PageNotAnInteger:
+            return self.page(1)
+        except EmptyPage:
+            # the cached count has gone stale, refresh it
+            cache.delete(self.count_cache_key)
+            self.__dict__.pop('count', None)
+            self.__dict__.pop('num_pages', None)
+            self.after = self.before = None
+            try:
+                return self.page(self.num_pages)
+            except EmptyPage:
+                return self.page(1)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if number == 1 or not (self.after or self.before):
+            bottom = (number - 1) * self.per_page
+            rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+            has_next = len(rows) > self.per_page
+        elif self.after:
+            created, pk = self.after
+            # the plain range condition lets the index seek
+            rows = list(self.object_list.filter(
+                Q(created__lt=created) | Q(pk__lt=pk),
+                created__lte=created,
+            )[:self.per_page + 1])
+            has_next = len(rows) > self.per_page
+        else:
+            created, pk = self.before
+            rows = list(self.object_list.reverse().filter(
+                Q(created__gt=created) | Q(pk__gt=pk),
+                created__gte=created,
+            )[:self.per_page])
+            rows.reverse()
+            has_next = True
+
+        return self._make_page(rows[:self.per_page], number, has_next)
+
+    def _make_page(self, rows, number, has_next):
+        if not rows and number > 1:
+            raise EmptyPage('That page contains no results')
+        if has_next:
+            self.next_cursor = encode_cursor(rows[-1])
+            self._known_pages = number + 1
+        else:
+            # the last page tells the exact total for free
+            self._last_page = number
+            self.__dict__.setdefault(
+                'count', (number - 1) * self.per_page + len(rows)
+            )
+        if number > 1 and rows:
+            self.previous_cursor = encode_cursor(rows[0])
+        self.__dict__.pop('num_pages', None)
+        return self._get_page(rows, number, self)
+
+
+class IdListPaginator(KeysetPaginator):
+    """KeysetPaginator whose first pages are cut from ids, the pks
+    of the newest rows of object_list in its order.
+
+    Those pages are read by pk, and a list shorter than asked for
+    is the whole feed, so its length is the count. Later pages are
+    read as KeysetPaginator reads them.
+    """
+
+    def __init__(self, object_list, per_page, ids, limit, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.ids = ids
+        self.complete = len(ids) < limit
+
+    @cached_property
+    def count(self):
+        if self.complete:
+            return len(self.ids)
+        return super().count
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        if not (self.complete or top < len(self.ids)):
+            return super().page(number)
+        ids = self.ids[bottom:top]
+        rows = self.object_list.in_bulk(ids)
+        return self._make_page([rows[pk] for pk in ids if pk in rows],
+                               number, top < len(self.ids))
+
+
+def estimated_rows(model) -> int:
+    """To guess the rows of the table of model without a COUNT:
+    from the planner statistics where the database keeps them,
+    else from the largest pk"""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE relname = %s',
+                [model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        if row and row[0] > 0:
+            return int(row[0])
+    return model._base_manager.aggregate(top=Max('pk'))['top'] or 0
+
+
+class EstimatedCountMixin:
+    """Counts up to ADMIN_EXACT_COUNT_LIMIT rows exactly. Past it an
+    unfiltered list takes the estimated rows of its table and a
+    filtered one the limit, the last pages may turn out empty."""
+
+    @cached_property
+    def count(self):
+        limit = settings.ADMIN_EXACT_COUNT_LIMIT
+        count = self.object_list.order_by()[:limit + 1].count()
+        if count <= limit:
+            return count
+        if self.object_list.query.where:
+            return limit
+        return max(estimated_rows(self.object_list.model), count)
+
+
+class EstimatedCountPaginator(EstimatedCountMixin, Paginator):
+    """Paginator of admin changelists sorted by any column"""
+
+
+class AdminKeysetPaginator(EstimatedCountMixin, KeysetPaginator):
+    """Paginator of admin changelists in the (-created, -pk) order,
+    the next page is read through the cursor of its link"""
+
+    def __init__(self, object_list, per_page, **kwargs):
+        # the page is sought on the index alone, then read by pk
+        super().__init__(object_list.select_related(None).only(
+            'pk', 'created'
+        ), per_page, **kwargs)
+        self.rows = object_list
+
+    def page(self, number):
+        page = super().page(number)
+        # a queryset, the list_editable formset does not take a list.
+        # The rows passed the filters already, they are read by pk
+        # alone, or the planner may start from a search filter
+        rows = self.rows.model._default_manager.filter(
+            pk__in=[row.pk for row in page.object_list]
+        ).order_by(*self.ordering)
+        rows.query.select_related = self.rows.query.select_related
+        rows.query.deferred_loading = self.rows.query.deferred_loading
+        page.object_list = rows
+        return page
@@ -0,0 +1,197 @@
+"""Full-text search over Post.text.
+
+Posts are indexed by the post_save and post_delete signals into
+the SQLite FTS5 table posts_post_fts, ranked with bm25, or, where
+FTS5 is missing or POST_SEARCH_FTS is off, into the SearchTerm
+table, ranked by how often the words occur. Results are ordered
+by (score, pk) descending and paginated by a cursor on that pair.
+"""
+import math
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Q, QuerySet, Sum
+
+from .models import Post, SearchTerm
+from .paginators import MAX_INTEGER, estimated_rows
+
+FTS_TABLE = 'posts_post_fts'
+WORD = re.compile(r'[^\W_]+')
+
+_fts_table = None
+
+
+def tokenize(text: str) -> list:
+    """To split text into words the way the FTS5 unicode61 tokenizer does"""
+    return WORD.findall(text.lower())
+
+
+def uses_fts() -> bool:
+    global _fts_table
+    if not settings.POST_SEARCH_FTS:
+        return False
+    if _fts_table is None:
+        _fts_table = FTS_TABLE in connection.introspection.table_names()
+    return _fts_table
+
+
+def index_post(post: Post) -> None:
+    """To replace the indexed words of post"""
+    if uses_fts():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                           [post.pk])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+                [post.pk, post.text]
+            )
+        return
+    SearchTerm.objects.filter(post=post).delete()
+    SearchTerm.objects.bulk_create(
+        SearchTerm(term=term[:100], post=post, count=count)
+        for term, count in Counter(tokenize(post.text)).items()
+    )
+
+
+def remove_post(post_id: int) -> None:
+    remove_posts([post_id])
+
+
+def remove_posts(post_ids) -> None:
+    if uses_fts():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid IN '
+                f'({", ".join(["%s"] * len(post_ids))})', post_ids
+            )
+    # SearchTerm rows go away with the posts by cascade
+
+
+def rebuild() -> int:
+    """To index every post from scratch, returns their number"""
+    if uses_fts():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, text) '
+                f'SELECT id, text FROM {Post._meta.db_table}'
+            )
+        return Post.objects.count()
+    SearchTerm.objects.all().delete()
+    indexed = 0
+    for post in Post.objects.only('text').iterator():
+        index_post(post)
+        indexed += 1
+    return indexed
+
+
+def _match(terms) -> str:
+    """To quote terms for MATCH, so user input is never FTS5 syntax"""
+    return ' '.join(f'"{term}"' for term in terms)
+
+
+def encode_cursor(score, pk) -> str:
+    return f'{float(score)!r}_{pk}'
+
+
+def decode_cursor(token):
+    """To unpack a token made by encode_cursor,
+    None for a missing or broken one"""
+    try:
+        score, pk = token.rsplit('_', 1)
+        score, pk = float(score), int(pk)
+    except (AttributeError, ValueError):
+        return None
+    if not (math.isfinite(score) and 0 < pk <= MAX_INTEGER):
+        return None
+    return score, pk
+
+
+def ranked_ids(query: str, after=None, limit=settings.SORTED_VALUES_AMOUNT):
+    """To return [(pk, score)] of the best matches of all words of query,
+    starting after the (score, pk) cursor"""
+    terms = sorted(set(tokenize(query)))
+    if not terms:
+        return []
+    if uses_fts():
+        sql = (
+            f'SELECT id, score FROM (SELECT rowid AS id, '
+            f'-bm25({FTS_TABLE}) AS score FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s)'
+        )
+        params = [_match(terms)]
+        if after:
+            sql += ' WHERE score < %s OR (score = %s AND id < %s)'
+            params += [after[0], after[0], after[1]]
+        sql += ' ORDER BY score DESC, id DESC LIMIT %s'
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params + [limit])
+            return cursor.fetchall()
+    matches = SearchTerm.objects.filter(term__in=terms).values(
+        'post'
+    ).annotate(
+        terms=Count('term'), score=Sum('count')
+    ).filter(terms=len(terms))
+    if after:
+        matches = matches.filter(
+            Q(score__lt=after[0]) | Q(score=after[0], post_id__lt=after[1])
+        )
+    # post_id, as post would order by the Meta.ordering of Post
+    return list(matches.order_by('-score', '-post_id').values_list(
+        'post_id', 'score'
+    )[:limit])
+
+
+def search(query: str, after: str = None,
+           limit: int = settings.SORTED_VALUES_AMOUNT):
+    """To return (posts, next_cursor) of one page of results"""
+    ids = ranked_ids(query, decode_cursor(after), limit + 1)
+    next_cursor = ''
+    if len(ids) > limit:
+        ids = ids[:limit]
+        next_cursor = encode_cursor(ids[-1][1], ids[-1][0])
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        [pk for pk, score in ids]
+    )
+    return [posts[pk] for pk, score in ids if pk in posts], next_cursor
+
+
+def _is_common(terms) -> bool:
+    """To tell whether more than SEARCH_COMMON_SHARE of posts
+    contain every word of terms, counting no further than that"""
+    limit = int(estimated_rows(Post) * settings.SEARCH_COMMON_SHARE)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT COUNT(*) FROM (SELECT rowid FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s LIMIT %s)',
+            [_match(terms), limit + 1]
+        )
+        return cursor.fetchone()[0] > limit
+
+
+def filter_queryset(queryset: QuerySet, query: str,
+                    field: str = 'pk') -> QuerySet:
+    """To keep rows of queryset whose post, the row itself or
+    the field pointing at it, contains every word of query"""
+    terms = sorted(set(tokenize(query)))
+    if not terms:
+        return queryset
+    if uses_fts():
+        opts = queryset.model._meta
+        column = (opts.pk if field == 'pk' else opts.get_field(field)).column
+        # + keeps the planner off the index of column: the rows of
+        # the posts of a common word are many, better walked in the
+        # order of the page than gathered and sorted
+        unary = '+' if _is_common(terms) else ''
+        return queryset.extra(
+            where=[f'{unary}{opts.db_table}.{column} IN (SELECT rowid '
+                   f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)'],
+            params=[_match(terms)],
+        )
+    return queryset.filter(**{f'{field}__in': SearchTerm.objects.filter(
+        term__in=terms
+    ).values('post').annotate(
+        terms=Count('term')
+    ).filter(terms=len(terms)).values('post')})
@@ -0,0 +1,187 @@
+"""Synthetic users, groups, posts, comments and follows in bulk.
+
+Authors are ranked at random twice, for writing and for being
+followed, and the author of rank r writes posts or gains followers
+in proportion to 1 / r ** alpha, so that a few authors hold most of
+the posts and a few most of the followers. Were the two rankings
+the same, the timelines of the followers of the top author alone
+would take posts times followers rows. Rows are written in
+batches, one transaction per batch, with bulk_create or, raw, with
+multi-row INSERT statements. No signal runs: timelines, the search
+index and the feed fragments are brought up to date at the end.
+"""
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate, islice
+
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import feeds, fragments, groups, identities, search
+from .models import Comment, Follow, Group, Post, User
+
+WORDS = ('кот', 'сад', 'утро', 'дождь', 'город', 'книга', 'море', 'чай',
+         'дорога', 'песня', 'лес', 'окно', 'зима', 'друг', 'работа')
+GROUP_SHARE = 0.7
+
+
+def zipf_weights(count: int, alpha: float) -> list:
+    """To return cumulative weights of ranks 1..count for choices()"""
+    return list(accumulate(1 / rank ** alpha for rank in range(1, count + 1)))
+
+
+@contextmanager
+def given_dates(*models):
+    """To let bulk_create keep the created values of the rows,
+    auto_now_add would overwrite them with now"""
+    fields = [model._meta.get_field('created') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Seeder:
+    def __init__(self, batch_size=5000, raw=False, alpha=1.0, days=365,
+                 prefix='seed', seed=0):
+        self.batch_size = batch_size
+        self.raw = raw
+        self.alpha = alpha
+        self.days = days
+        self.prefix = prefix
+        self.rand = random.Random(seed)
+        self.now = timezone.now()
+        # table: (rows, seconds)
+        self.report = {}
+
+    def insert(self, model, columns, rows) -> int:
+        """To write rows, tuples of the values of columns, by batches"""
+        start = time.perf_counter()
+        rows = iter(rows)
+        written = 0
+        batch = list(islice(rows, self.batch_size))
+        while batch:
+            with transaction.atomic():
+                if self.raw:
+                    self._insert_raw(model, columns, batch)
+                else:
+                    model.objects.bulk_create(
+                        model(**dict(zip(columns, row))) for row in batch
+                    )
+            written += len(batch)
+            batch = list(islice(rows, self.batch_size))
+        self.report[model._meta.db_table] = (
+            written, time.perf_counter() - start
+        )
+        return written
+
+    def _insert_raw(self, model, columns, batch) -> None:
+        """Columns left out get the default of their field,
+        as a model instance would"""
+        fields = [field for field in model._meta.concrete_fields
+                  if not field.primary_key]
+        given = [columns.index(field.attname)
+                 if field.attname in columns else None for field in fields]
+        defaults = [field.get_db_prep_save(field.get_default(), connection)
+                    for field in fields]
+        limit = connection.features.max_query_params
+        per_statement = limit // len(fields) if limit else len(batch)
+        row_sql = '(%s)' % ', '.join(['%s'] * len(fields))
+        head = 'INSERT INTO %s (%s) VALUES ' % (
+            connection.ops.quote_name(model._meta.db_table),
+            ', '.join(connection.ops.quote_name(f.column) for f in fields),
+        )
+        with connection.cursor() as cursor:
+            for start in range(0, len(batch), per_statement):
+                rows = batch[start:start + per_statement]
+                cursor.execute(head + ', '.join([row_sql] * len(rows)), [
+                    default if index is None
+                    else field.get_db_prep_save(row[index], connection)
+                    for row in rows
+                    for field, index, default in zip(fields, given, defaults)
+                ])
+
+    def text(self, low, high) -> str:
+        words = self.rand.choices(WORDS, k=self.rand.randint(low, high))
+        return ' '.join(words).capitalize()
+
+    def created(self):
+        return self.now - timedelta(seconds=self.rand.uniform(
+            0, self.days * 24 * 60 * 60
+        ))
+
+    def seed(self, users, groups, posts, comments, follows) -> dict:
+        """To write everything, returns the report"""
+        if User.objects.filter(username__startswith=self.prefix).exists():
+            raise ValueError(f'users named {self.prefix}* already exist')
+        last_post = Post.objects.aggregate(last=Max('pk'))['last'] or 0
+        self.insert(User, ('username', 'password', 'date_joined'), (
+            (f'{self.prefix}{number}', '!', self.now)
+            for number in range(users)
+        ))
+        user_ids = list(User.objects.filter(
+            username__startswith=self.prefix
+        ).values_list('pk', flat=True))
+        weights = zipf_weights(len(user_ids), self.alpha)
+        writers = self.rand.sample(user_ids, len(user_ids))
+        self.insert(Group, ('title', 'slug', 'description'), (
+            (f'Группа {number}', f'{self.prefix}-{number}',
+             self.text(5, 15))
+            for number in range(groups)
+        ))
+        group_ids = list(Group.objects.filter(
+            slug__startswith=f'{self.prefix}-'
+        ).values_list('pk', flat=True)) or [None]
+        with given_dates(Post, Comment):
+            self.insert(Post, ('author_id', 'group_id', 'text', 'created'), (
+                (self.rand.choices(writers, cum_weights=weights)[0],
+                 (self.rand.choice(group_ids)
+                  if self.rand.random() < GROUP_SHARE else None),
+                 self.text(5, 60), self.created())
+                for _ in range(posts)
+            ))
+            post_ids = list(Post.objects.filter(
+                pk__gt=last_post
+            ).values_list('pk', flat=True))
+            self.insert(Comment, ('post_id', 'author_id', 'text', 'created'), (
+                (self.rand.choice(post_ids), self.rand.choice(user_ids),
+                 self.text(3, 20), self.created())
+                for _ in range(comments if post_ids else 0)
+            ))
+        popular = self.rand.sample(user_ids, len(user_ids))
+        self.insert(Follow, ('user_id', 'author_id'), (
+            (user, author) for user in user_ids
+            for author in self.followed(user, popular, weights, follows)
+        ))
+        self.finish(last_post)
+        return self.report
+
+    def followed(self, user, popular, weights, mean) -> set:
+        """To pick about mean authors for user, popular ones first"""
+        wanted = min(len(popular) - 1,
+                     round(self.rand.expovariate(1 / mean)) if mean else 0)
+        authors = set()
+        for _ in range(wanted * 4):
+            if len(authors) == wanted:
+                break
+            author = self.rand.choices(popular, cum_weights=weights)[0]
+            if author != user:
+                authors.add(author)
+        return authors
+
+    def finish(self, last_post) -> None:
+        start = time.perf_counter()
+        entries = feeds.backfill_all(after=last_post)
+        self.report['timelines'] = (entries, time.perf_counter() - start)
+        start = time.perf_counter()
+        indexed = search.rebuild()
+        self.report['search index'] = (indexed, time.perf_counter() - start)
+        fragments.bump()
+        groups.changed()
+        identities.clear()
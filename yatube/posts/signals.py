@@ -0,0 +1,121 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import (blacklist, feeds, fragments, groups, identities, images,
+               search, stats)
+from .models import BannedWord, Comment, Follow, Group, Post, User
+
+SHOWN_USER_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, raw, update_fields, **kwargs):
+    # the group a post is moved out of has to forget it
+    if instance._state.adding or raw or (
+            update_fields and 'group' not in update_fields):
+        return
+    instance._previous_group_id = Post.objects.filter(
+        pk=instance.pk
+    ).values_list('group_id', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw, update_fields, **kwargs):
+    fragments.bump()
+    previous = getattr(instance, '_previous_group_id', instance.group_id)
+    if created or previous != instance.group_id:
+        groups.forget_posts(previous, instance.group_id)
+    if not update_fields or 'text' in update_fields:
+        search.index_post(instance)
+    if created and not raw:
+        feeds.fan_out(instance)
+        stats.bump(instance.author_id, posts=1)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    fragments.bump()
+    groups.forget_posts(instance.group_id)
+    search.remove_post(instance.pk)
+    stats.bump(instance.author_id, posts=-1)
+    images.release(instance.image.name)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, **kwargs):
+    fragments.bump()
+    groups.changed()
+
+
+@receiver(pre_save, sender=Group)
+@receiver(pre_save, sender=User)
+def identity_saving(sender, instance, raw, update_fields, **kwargs):
+    # a rename has to forget the old name too
+    resolver = identities.RESOLVERS[sender]
+    if instance._state.adding or raw or (
+            update_fields and resolver.field not in update_fields):
+        return
+    instance._previous_identity = sender.objects.filter(
+        pk=instance.pk
+    ).values_list(resolver.field, flat=True).first()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_save, sender=User)
+def identity_saved(sender, instance, update_fields, **kwargs):
+    # a new row replaces a cached miss
+    resolver = identities.RESOLVERS[sender]
+    if update_fields and not update_fields & set(resolver.fields):
+        return
+    resolver.forget(getattr(instance, '_previous_identity', None),
+                    getattr(instance, resolver.field))
+
+
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=User)
+def identity_deleted(sender, instance, **kwargs):
+    resolver = identities.RESOLVERS[sender]
+    resolver.forget(getattr(instance, resolver.field))
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields, **kwargs):
+    # a login only touches last_login, a new user has no posts yet
+    if created or (update_fields and not SHOWN_USER_FIELDS & update_fields):
+        return
+    fragments.bump()
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        feeds.backfill(instance.user_id, instance.author_id)
+        stats.bump(instance.author_id, followers=1)
+        stats.bump(instance.user_id, following=1)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    feeds.prune(instance.user_id, instance.author_id)
+    stats.bump(instance.author_id, followers=-1)
+    stats.bump(instance.user_id, following=-1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        stats.bump(instance.author_id, comments=1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    # Last-Modified of the post page can not see a deleted comment
+    fragments.bump()
+    stats.bump(instance.author_id, comments=-1)
+
+
+@receiver(post_save, sender=BannedWord)
+@receiver(post_delete, sender=BannedWord)
+def banned_word_changed(sender, **kwargs):
+    blacklist.changed()
@@ -0,0 +1,46 @@
+"""Denormalized per-user counters.
+
+Signals change the counters with single UPDATE ... SET x = x + 1
+statements, the row itself is created lazily with exact values the
+first time it is read. recount_stats repairs any drift.
+"""
+from django.db.models import Count, F
+
+from .models import Comment, Follow, Post, User, UserStats
+
+COUNTED = {
+    'posts': (Post, 'author'),
+    'followers': (Follow, 'author'),
+    'following': (Follow, 'user'),
+    'comments': (Comment, 'author'),
+}
+
+
+def bump(user_id: int, **deltas) -> None:
+    """To shift the counters of user by deltas atomically,
+    a missing row is left to be created on the next read"""
+    UserStats.objects.filter(user_id=user_id).update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+
+
+def count(user_ids) -> dict:
+    """To return exact counters of users as {user_id: {field: value}}"""
+    counters = {user_id: dict.fromkeys(COUNTED, 0) for user_id in user_ids}
+    for field, (model, owner) in COUNTED.items():
+        rows = (model.objects.filter(**{f'{owner}__in': list(counters)})
+                .order_by().values(owner).annotate(total=Count('pk'))
+                .values_list(owner, 'total'))
+        for user_id, total in rows:
+            counters[user_id][field] = total
+    return counters
+
+
+def get_stats(user: User) -> UserStats:
+    try:
+        return UserStats.objects.get(user=user)
+    except UserStats.DoesNotExist:
+        stats, _ = UserStats.objects.update_or_create(
+            user=user, defaults=count([user.pk])[user.pk]
+        )
+        return stats
@@ -0,0 +1,43 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+
+from core.cache import shared_timeout
+from posts import fragments
+
+register = template.Library()
+
+
+class FeedCacheNode(template.Node):
+    def __init__(self, nodelist, name, page):
+        self.nodelist = nodelist
+        self.name = name
+        self.page = page
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        page = self.page.resolve(context)
+        key = fragments.fragment_key(name, (post.pk for post in page))
+        value = cache.get(key)
+        fragments.record(name, value is not None)
+        if value is None:
+            value = self.nodelist.render(context)
+            cache.set(key, value,
+                      shared_timeout(settings.FEED_CACHE_TIMEOUT))
+        return value
+
+
+@register.tag
+def feed_cache(parser, token):
+    """Caches the rendered posts of a page until any of them changes:
+    {% feed_cache 'index_page' page_obj %} ... {% endfeed_cache %}"""
+    nodelist = parser.parse(('endfeed_cache',))
+    parser.delete_first_token()
+    bits = token.split_contents()
+    if len(bits) != 3:
+        raise template.TemplateSyntaxError(
+            f'{bits[0]} takes a fragment name and a page'
+        )
+    return FeedCacheNode(nodelist,
+                         parser.compile_filter(bits[1]),
+                         parser.compile_filter(bits[2]))
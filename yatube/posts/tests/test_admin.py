@@ -0,0 +1,190 @@
+from datetime import datetime
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.db.models import Max, Min
+from django.urls import reverse
+from django.utils.timezone import utc
+
+from .. import groups
+from ..admin import IndexedDatesQuerySet
+from ..management.commands.explain_views import full_scans
+from ..models import Comment, Group, Post, User
+
+PER_PAGE = 100
+
+
+class AdminChangeListTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        self.client.force_login(self.admin)
+        self.groups = [Group.objects.create(
+            title=f'Группа {i}', slug=f'group-{i}', description='Описание'
+        ) for i in range(3)]
+        self.url = reverse('admin:posts_post_changelist')
+
+    def add_posts(self, amount):
+        start = Post.objects.count()
+        for i in range(start, start + amount):
+            author = User.objects.create_user(username=f'user-{i}')
+            post = Post.objects.create(
+                author=author, group=self.groups[i % 3], text=f'Пост {i}'
+            )
+            Comment.objects.create(post=post, author=author,
+                                   text='Комментарий')
+
+    def queries(self, url):
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(captured)
+
+    def test_queries_do_not_grow_with_rows(self):
+        """Проверка что списки постов и комментариев не делают
+        запрос на каждую строку"""
+        comments = reverse('admin:posts_comment_changelist')
+        self.add_posts(2)
+        self.queries(self.url)
+        few = self.queries(self.url), self.queries(comments)
+        self.add_posts(20)
+        self.assertEqual((self.queries(self.url), self.queries(comments)),
+                         few)
+
+    def test_group_choices_are_cached(self):
+        """Проверка что список групп берётся из кэша
+        и обновляется при изменении группы"""
+        self.assertEqual([title for pk, title in groups.choices()],
+                         ['Группа 0', 'Группа 1', 'Группа 2'])
+        Group.objects.create(title='Группа 3', slug='group-3',
+                             description='Описание')
+        self.assertEqual(len(groups.choices()), 4)
+        with self.assertNumQueries(0):
+            groups.choices()
+
+    def test_cursor_pages_match_offset_pages(self):
+        """Проверка что следующая страница по курсору совпадает
+        со страницей по номеру"""
+        self.add_posts(PER_PAGE + 5)
+        cl = self.client.get(self.url).context['cl']
+        self.assertIn('after=', cl.next_page_url)
+        by_cursor = self.client.get(self.url + cl.next_page_url)
+        by_offset = self.client.get(self.url, {'p': 1})
+        self.assertEqual(list(by_cursor.context['cl'].result_list),
+                         list(by_offset.context['cl'].result_list))
+        self.assertNotIn('after=', by_cursor.context['cl'].get_query_string(
+            {'o': '1'}
+        ))
+
+    def test_group_select(self):
+        """Проверка выбранной группы в редактируемом списке"""
+        self.add_posts(1)
+        post = Post.objects.get()
+        response = self.client.get(self.url)
+        self.assertContains(response, f'<option value="{post.group.pk}" '
+                                      f'selected>{post.group.title}</option>')
+
+    @override_settings(ADMIN_EXACT_COUNT_LIMIT=5)
+    def test_counts_are_estimated(self):
+        """Проверка оценки числа строк у больших таблиц"""
+        self.add_posts(8)
+        Post.objects.filter(pk=Post.objects.order_by('pk')[0].pk).delete()
+        cl = self.client.get(self.url).context['cl']
+        self.assertEqual(cl.result_count, Post.objects.latest('pk').pk)
+        cl = self.client.get(self.url, {'group__id__exact':
+                                        self.groups[1].pk}).context['cl']
+        self.assertEqual(cl.result_count, 3)
+        cl = self.client.get(self.url, {'q': 'Пост'}).context['cl']
+        self.assertEqual(cl.result_count, 5)
+
+
+class AdminSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        cls.ivan = User.objects.create_user(username='ivan')
+        cls.ivanov = User.objects.create_user(username='ivanov')
+        cls.petr = User.objects.create_user(username='petr')
+        cls.cat = Post.objects.create(author=cls.petr, text='Кот в саду')
+        cls.dog = Post.objects.create(author=cls.ivan, text='Пёс дома')
+        cls.comments = {
+            (post.pk, author.username): Comment.objects.create(
+                post=post, author=author, text='Комментарий'
+            )
+            for post in (cls.cat, cls.dog)
+            for author in (cls.ivan, cls.ivanov, cls.petr)
+        }
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def search(self, model, term):
+        cl = self.client.get(reverse(f'admin:posts_{model}_changelist'),
+                             {'q': term}).context['cl']
+        return cl, set(cl.result_list)
+
+    def test_comment_search(self):
+        """Проверка поиска комментариев по id поста, началу имени
+        автора и тексту поста"""
+        comments = self.comments
+        self.assertEqual(self.search('comment', str(self.cat.pk))[1], {
+            comments[self.cat.pk, name] for name in ('ivan', 'ivanov', 'petr')
+        })
+        self.assertEqual(self.search('comment', '@iva')[1], {
+            comments[post.pk, name] for post in (self.cat, self.dog)
+            for name in ('ivan', 'ivanov')
+        })
+        self.assertEqual(self.search('comment', '@ivano саду')[1],
+                         {comments[self.cat.pk, 'ivanov']})
+
+    def test_post_search(self):
+        """Проверка поиска постов по id и автору"""
+        self.assertEqual(self.search('post', str(self.dog.pk))[1],
+                         {self.dog})
+        self.assertEqual(self.search('post', '@petr кот')[1], {self.cat})
+
+    def test_search_of_odd_numbers(self):
+        """Проверка что надстрочные цифры и числа длиннее 64 бит
+        ищутся как слова, а не роняют список"""
+        for model in ('post', 'comment'):
+            for term in ('²', '9' * 23, f'{self.cat.pk} ²'):
+                with self.subTest(model=model, term=term):
+                    self.assertEqual(self.search(model, term)[1], set())
+
+    def test_searches_use_indexes(self):
+        """Проверка что поиск и иерархия дат не читают
+        таблицы целиком"""
+        for model, term in (('comment', f'@iva {self.cat.pk}'),
+                            ('comment', 'саду'), ('post', '@petr')):
+            with self.subTest(model=model, term=term):
+                cl = self.search(model, term)[0]
+                plan = [line.split(maxsplit=3)[-1]
+                        for line in cl.queryset.explain().splitlines()]
+                self.assertEqual(full_scans(plan), [])
+
+    def test_date_hierarchy(self):
+        """Проверка что даты иерархии совпадают с обычными"""
+        Comment.objects.filter(pk=self.comments[self.cat.pk, 'ivan'].pk
+                               ).update(created=datetime(2020, 5, 17,
+                                                         tzinfo=utc))
+        queryset = IndexedDatesQuerySet(Comment)
+        bounds = {'first': Min('created'), 'last': Max('created')}
+        self.assertEqual(queryset.aggregate(**bounds),
+                         Comment.objects.aggregate(**bounds))
+        for kind in ('year', 'month', 'day'):
+            with self.subTest(kind=kind):
+                self.assertEqual(
+                    queryset.dates('created', kind, 'DESC'),
+                    list(Comment.objects.dates('created', kind, 'DESC'))
+                )
+        response = self.client.get(
+            reverse('admin:posts_comment_changelist'),
+            {'created__year': 2020, 'created__month': 5}
+        )
+        self.assertEqual(len(response.context['cl'].result_list), 1)
@@ -0,0 +1,84 @@
+import os
+import re
+import tempfile
+import time
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import blacklist
+from ..forms import CommentForm
+from ..models import BannedWord, User
+
+
+class BlacklistTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_initial_words(self):
+        """Проверка что прежний список перенесён в таблицу"""
+        self.assertEqual(
+            blacklist.mask('Бузова и ДОНЦОВА'), '****** и ******'
+        )
+
+    def test_casing_preserved(self):
+        """Проверка что регистр остального текста не меняется"""
+        form = CommentForm(data={'text': 'Читал Донцову? Нет, БУЗОВА!'})
+        self.assertTrue(form.is_valid())
+        self.assertEqual(
+            form.cleaned_data['text'], 'Читал Донцову? Нет, ******!'
+        )
+
+    def test_trie_pattern(self):
+        """Проверка что из общих префиксов слов собирается одно выражение"""
+        pattern = re.compile(blacklist.trie_pattern(['кот', 'котел', 'кит']))
+        self.assertEqual(
+            pattern.findall('котелок кот кит кат'),
+            ['котел', 'кот', 'кит'],
+        )
+
+    def test_rebuilt_on_change(self):
+        """Проверка что новое слово применяется без перезапуска"""
+        self.assertEqual(blacklist.mask('спам'), 'спам')
+        word = BannedWord.objects.create(word=' Спам ')
+        self.assertEqual(word.word, 'спам')
+        self.assertEqual(blacklist.mask('Спам'), '******')
+        word.delete()
+        self.assertEqual(blacklist.mask('Спам'), 'Спам')
+
+    def test_word_of_other_worker(self):
+        """Проверка что слово, добавленное другим процессом со своим
+        кэшем, применяется после CACHE_LOCAL_TIMEOUT"""
+        with self.settings(CACHE_SHARED=False, CACHE_LOCAL_TIMEOUT=0.05):
+            self.assertEqual(blacklist.mask('спам'), 'спам')
+            # bulk_create sends no signals, as a save in another worker
+            BannedWord.objects.bulk_create([BannedWord(word='спам')])
+            self.assertEqual(blacklist.mask('спам'), 'спам')
+            time.sleep(0.1)
+            self.assertEqual(blacklist.mask('спам'), '******')
+
+    def test_admin_duplicate_in_other_case(self):
+        """Проверка что слово в другом регистре в админке даёт ошибку
+        формы, а не ошибку базы"""
+        BannedWord.objects.create(word='спам')
+        self.client.force_login(User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        ))
+        response = self.client.post(
+            reverse('admin:posts_bannedword_add'), {'word': ' Спам '}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['adminform'].form.errors['word'])
+        self.assertEqual(BannedWord.objects.filter(word='спам').count(), 1)
+
+    def test_file_words(self):
+        """Проверка слов из файла"""
+        with tempfile.NamedTemporaryFile(
+                'w', suffix='.txt', delete=False, encoding='utf-8') as file:
+            file.write('# комментарий\nреклама\n\n')
+        self.addCleanup(os.remove, file.name)
+        with self.settings(COMMENT_BLACKLIST_FILE=file.name):
+            self.assertEqual(blacklist.mask('Реклама'), '******')
+            self.assertEqual(blacklist.mask('комментарий'), 'комментарий')
+        self.assertEqual(blacklist.mask('Реклама'), 'Реклама')
@@ -0,0 +1,114 @@
+import time
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.post = Post.objects.create(
+            author=self.author, group=self.group, text='Текст'
+        )
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.urls = [
+            reverse('posts:all posts'),
+            reverse('posts:sorted_posts', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.author.username,)),
+            reverse('posts:post_detail', args=(self.post.pk,)),
+        ]
+
+    def revalidate(self, client, url, **headers):
+        response = client.get(url)
+        return client.get(url, HTTP_IF_NONE_MATCH=response['ETag'],
+                          **headers)
+
+    def test_unchanged_pages_are_not_modified(self):
+        """Проверка ответа 304 без тела для неизменных страниц"""
+        for url in self.urls:
+            for client in (self.client, self.reader_client):
+                with self.subTest(url=url):
+                    response = self.revalidate(client, url)
+                    self.assertEqual(response.status_code, 304)
+                    self.assertEqual(response.content, b'')
+
+    def test_changes_modify_pages(self):
+        """Проверка что правка поста, комментарий и подписка
+        меняют ETag"""
+        changes = {
+            self.urls[0]: lambda: Post.objects.create(
+                author=self.reader, text='Новый'
+            ),
+            self.urls[1]: lambda: self.post.save(),
+            self.urls[2]: lambda: Follow.objects.create(
+                user=self.reader, author=self.author
+            ),
+            self.urls[3]: lambda: Comment.objects.create(
+                post=self.post, author=self.reader, text='Комментарий'
+            ),
+        }
+        for url, change in changes.items():
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                change()
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_visitor(self):
+        """Проверка что страница другого пользователя не подходит"""
+        url = self.urls[3]
+        etag = self.reader_client.get(url)['ETag']
+        self.assertNotEqual(self.client.get(url)['ETag'], etag)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_last_modified_for_anonymous(self):
+        """Проверка Last-Modified для анонимов и его отсутствия
+        у профиля и у пользователей"""
+        response = self.client.get(self.urls[0])
+        response = self.client.get(
+            self.urls[0], HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(self.client.get(self.urls[2]).has_header(
+            'Last-Modified'
+        ))
+        self.assertFalse(self.reader_client.get(self.urls[0]).has_header(
+            'Last-Modified'
+        ))
+
+    def test_missing_objects(self):
+        """Проверка 404 без валидаторов"""
+        for url in (reverse('posts:sorted_posts', args=('missing',)),
+                    reverse('posts:profile', args=('missing',)),
+                    reverse('posts:post_detail', args=(0,))):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 404)
+                self.assertFalse(response.has_header('ETag'))
+
+    @override_settings(CACHE_SHARED=False, CACHE_LOCAL_TIMEOUT=0.3)
+    def test_validators_without_shared_cache(self):
+        """Проверка что без общего кэша страница отдаёт 304, а правка
+        из другого процесса видна через CACHE_LOCAL_TIMEOUT"""
+        cache.clear()
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        response = self.client.get(url)
+        etag = response['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        # update() sends no signals, as a save in another worker
+        Post.objects.filter(pk=self.post.pk).update(text='Правка')
+        time.sleep(0.4)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Правка')
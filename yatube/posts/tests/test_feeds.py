@@ -0,0 +1,86 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.follower = User.objects.create_user(username='follower')
+        self.old_post = Post.objects.create(
+            author=self.author,
+            text='Старый пост',
+        )
+        self.follower_client = Client()
+        self.follower_client.force_login(self.follower)
+
+    def timeline_posts(self):
+        return list(TimelineEntry.objects.filter(
+            user=self.follower
+        ).values_list('post', flat=True))
+
+    def test_follow_backfills_timeline(self):
+        """Проверка что подписка добавляет старые посты автора в ленту"""
+        self.follower_client.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': self.author.username}
+        ))
+        self.assertEqual(self.timeline_posts(), [self.old_post.pk])
+
+    def test_new_post_fanned_out(self):
+        """Проверка что новый пост попадает в ленты подписчиков"""
+        Follow.objects.create(user=self.follower, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertIn(new_post.pk, self.timeline_posts())
+
+    def test_unfollow_prunes_timeline(self):
+        """Проверка что отписка убирает посты автора из ленты"""
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.follower_client.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.author.username}
+        ))
+        self.assertEqual(self.timeline_posts(), [])
+
+    def test_follow_index_reads_timeline(self):
+        """Проверка что лента подписок строится из материализованной
+        ленты"""
+        Follow.objects.create(user=self.follower, author=self.author)
+        TimelineEntry.objects.all().delete()
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    @override_settings(FOLLOW_FEED_MAX_FOLLOWERS=0)
+    def test_broadcast_author_read_on_demand(self):
+        """Проверка что посты популярного автора не размножаются,
+        а лента подписчика читается запросом с join"""
+        Follow.objects.create(user=self.follower, author=self.author)
+        cache.clear()
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertNotIn(new_post.pk, self.timeline_posts())
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']), [new_post, self.old_post]
+        )
+
+    def test_check_timelines(self):
+        """Проверка команд сверки и восстановления лент"""
+        Follow.objects.create(user=self.follower, author=self.author)
+        call_command('check_timelines', stdout=StringIO())
+        TimelineEntry.objects.all().delete()
+        with self.assertRaises(CommandError):
+            call_command('check_timelines', stdout=StringIO())
+        call_command('check_timelines', '--fix', stdout=StringIO())
+        self.assertEqual(self.timeline_posts(), [self.old_post.pk])
+        TimelineEntry.objects.all().delete()
+        call_command('backfill_timelines', stdout=StringIO())
+        self.assertEqual(self.timeline_posts(), [self.old_post.pk])
@@ -0,0 +1,84 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import fragments
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class IndexFragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='Test-slug',
+            description='Тестовое описание',
+        )
+        self.post = Post.objects.create(
+            author=self.user,
+            text='Старый текст',
+            group=self.group,
+        )
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.url = reverse('posts:all posts')
+
+    def test_fragment_cached_until_post_changes(self):
+        """Проверка что фрагмент берётся из кэша, пока пост
+        не изменён, и обновляется сразу после сохранения"""
+        self.client.get(self.url)
+        Post.objects.filter(pk=self.post.pk).update(text='Тихая правка')
+        self.assertContains(self.client.get(self.url), 'Старый текст')
+
+        self.post.text = 'Новый текст'
+        self.post.save()
+        self.assertContains(self.client.get(self.url), 'Новый текст')
+
+    def test_group_change_invalidates(self):
+        """Проверка что изменение группы сбрасывает кэш"""
+        self.client.get(self.url)
+        generation = fragments.generation()
+        self.group.title = 'Новое название'
+        self.group.save()
+        self.assertNotEqual(fragments.generation(), generation)
+
+    def test_login_keeps_generation(self):
+        """Проверка что вход пользователя не сбрасывает кэш,
+        а смена имени сбрасывает"""
+        generation = fragments.generation()
+        self.client.login(username='auth', password='')
+        self.user.last_login = None
+        self.user.save(update_fields=['last_login'])
+        self.assertEqual(fragments.generation(), generation)
+        self.user.first_name = 'Иван'
+        self.user.save()
+        self.assertNotEqual(fragments.generation(), generation)
+
+    def test_fragment_shared_between_users(self):
+        """Проверка что анонимы и пользователи делят одну запись,
+        и попадания считаются"""
+        self.client.get(self.url)
+        self.authorized_client.get(self.url)
+        self.client.get(self.url)
+        self.assertEqual(
+            fragments.hit_stats('index_page'), {'hits': 2, 'misses': 1}
+        )
+
+    def test_stats_command(self):
+        """Проверка что статистика читается из общего кэша,
+        а без него команда сообщает об ошибке"""
+        self.client.get(self.url)
+        self.client.get(self.url)
+        out = StringIO()
+        call_command('fragment_cache_stats', stdout=out)
+        self.assertIn('index_page: 1 hits, 1 misses', out.getvalue())
+        with override_settings(CACHE_SHARED=False):
+            with self.assertRaises(CommandError):
+                call_command('fragment_cache_stats')
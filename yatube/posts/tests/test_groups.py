@@ -0,0 +1,109 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import groups
+from ..models import Group, Post, User
+from ..paginators import IdListPaginator
+
+PER_PAGE = settings.SORTED_VALUES_AMOUNT
+
+
+class GroupFeedCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.other = Group.objects.create(
+            title='Другая', slug='other', description='Описание'
+        )
+        self.posts = [Post.objects.create(
+            author=self.user, group=self.group, text=f'Пост {i}'
+        ) for i in range(3)]
+
+    def test_post_ids_follow_posts(self):
+        """Проверка что список id меняется при создании,
+        переносе и удалении поста"""
+        ids = [post.pk for post in reversed(self.posts)]
+        self.assertEqual(groups.post_ids(self.group), ids)
+        new = Post.objects.create(author=self.user, group=self.group,
+                                  text='Новый')
+        self.assertEqual(groups.post_ids(self.group), [new.pk, *ids])
+        groups.post_ids(self.other)
+        new.group = self.other
+        new.save()
+        self.assertEqual(groups.post_ids(self.group), ids)
+        self.assertEqual(groups.post_ids(self.other), [new.pk])
+        self.posts[0].delete()
+        self.assertEqual(groups.post_ids(self.group), ids[:-1])
+
+    def test_edit_keeps_post_ids(self):
+        """Проверка что правка текста не сбрасывает список id"""
+        groups.post_ids(self.group)
+        self.posts[0].text = 'Правка'
+        self.posts[0].save()
+        with self.assertNumQueries(0):
+            groups.post_ids(self.group)
+
+    def test_post_of_other_worker_shown(self):
+        """Проверка что пост, чей сигнал не дошёл до этого процесса,
+        появляется на странице группы"""
+        url = reverse('posts:sorted_posts', args=('group',))
+        self.client.get(url)
+        # bulk_create sends no signals, as a post saved by another
+        # worker with a cache of its own
+        Post.objects.bulk_create([Post(
+            author=self.user, group=self.group, text='Из другого процесса'
+        )])
+        response = self.client.get(url)
+        self.assertEqual(response.context['page_obj'][0].text,
+                         'Из другого процесса')
+
+    def test_warm_group_page(self):
+        """Проверка что тёплая страница группы не считает посты
+        и не ищет группу"""
+        url = reverse('posts:sorted_posts', args=('group',))
+        self.client.get(url)
+        # the newest post for the ETag and the page by pk
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(len(response.context['page_obj']), 3)
+
+
+class IdListPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.bulk_create(Post(
+            author=cls.user, text=f'Пост {i}'
+        ) for i in range(PER_PAGE * 3 + 5))
+        cls.expected = list(Post.objects.order_by('-created', '-pk'))
+
+    def setUp(self):
+        cache.clear()
+
+    def pages(self, limit):
+        ids = [post.pk for post in self.expected[:limit]]
+        paginator = IdListPaginator(Post.objects.all(), PER_PAGE,
+                                    ids=ids, limit=limit)
+        return [list(paginator.get_page(number))
+                for number in range(1, paginator.num_pages + 1)]
+
+    def test_pages_match_the_feed(self):
+        """Проверка что страницы из списка id и из запроса совпадают"""
+        chunks = [self.expected[i:i + PER_PAGE]
+                  for i in range(0, len(self.expected), PER_PAGE)]
+        self.assertEqual(self.pages(PER_PAGE * 2 + 1), chunks)
+        self.assertEqual(self.pages(len(self.expected) + 1), chunks)
+
+    def test_complete_list_counts(self):
+        """Проверка что полный список id заменяет COUNT"""
+        ids = [post.pk for post in self.expected]
+        paginator = IdListPaginator(Post.objects.all(), PER_PAGE,
+                                    ids=ids, limit=len(ids) + 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(paginator.num_pages, 4)
@@ -0,0 +1,83 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import identities
+from ..models import Group, User
+
+
+class IdentityCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='auth',
+                                             first_name='Иван')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+
+    def test_rows_are_cached(self):
+        """Проверка что группа и пользователь берутся из кэша"""
+        identities.groups.get('group')
+        identities.users.get('auth')
+        with self.assertNumQueries(0):
+            self.assertEqual(identities.groups.get('group').title, 'Группа')
+            user = identities.users.get('auth')
+            self.assertEqual(user, self.user)
+            self.assertEqual(user.get_full_name(), 'Иван')
+
+    def test_misses_are_cached(self):
+        """Проверка что отсутствие тоже кэшируется и сбрасывается
+        при создании"""
+        url = reverse('posts:profile', args=('bot',))
+        self.assertEqual(self.client.get(url).status_code, 404)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).status_code, 404)
+        User.objects.create_user(username='bot')
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    @override_settings(CACHE_SHARED=False, IDENTITY_LOCAL_TIMEOUT=0)
+    def test_rename_by_other_worker(self):
+        """Проверка что без общего кэша переименование в другом
+        процессе видно после IDENTITY_LOCAL_TIMEOUT"""
+        identities.groups.get('group')
+        # update() sends no signals, as a save in another worker
+        Group.objects.filter(pk=self.group.pk).update(slug='renamed')
+        self.assertIsNone(identities.groups.get('group'))
+        self.assertEqual(identities.groups.get('renamed'), self.group)
+
+    def test_rename_and_delete(self):
+        """Проверка сброса при переименовании и удалении"""
+        identities.groups.get('group')
+        identities.users.get('auth')
+        self.group.slug = 'renamed'
+        self.group.save()
+        self.user.username = 'renamed'
+        self.user.save(update_fields=['username'])
+        self.assertIsNone(identities.groups.get('group'))
+        self.assertIsNone(identities.users.get('auth'))
+        self.assertEqual(identities.users.get('renamed'), self.user)
+        self.user.delete()
+        self.assertIsNone(identities.users.get('renamed'))
+
+    def test_deferred_fields_are_not_saved(self):
+        """Проверка что сохранение строки из кэша не затирает
+        остальные поля"""
+        self.user.set_password('secret')
+        self.user.save()
+        user = identities.users.get('auth')
+        user.first_name = 'Пётр'
+        user.save()
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('secret'))
+        self.assertEqual(self.user.first_name, 'Пётр')
+
+    def test_lru_is_bounded(self):
+        """Проверка вытеснения давно не использованных записей"""
+        lru = identities.LRU(2, 60)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertEqual(lru.get('a'), 1)
+        self.assertIsNone(lru.get('b'))
+        self.assertIsNone(identities.LRU(2, 0).get('a'))
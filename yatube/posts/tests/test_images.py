@@ -0,0 +1,297 @@
+import mimetypes
+import os
+import re
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from core.models import Blob
+from ..images import (EXIF_ORIENTATION, generate_thumbnail, make_thumbnail,
+                      process_image, variant_formats, variant_geometry)
+from ..models import Follow, Group, Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='auth')
+        self.post = Post.objects.create(
+            author=self.user,
+            text='Тестовый пост',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        )
+
+    def test_generated_thumbnail_used_by_card(self):
+        """Проверка что карточка берёт сохранённую миниатюру"""
+        url = generate_thumbnail(self.post.pk)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.thumbnail_url, url)
+        self.assertTrue(url.startswith(settings.MEDIA_URL))
+        response = Client().get(reverse('posts:all posts'))
+        self.assertContains(response, f'src="{url}"')
+
+    def test_variants_in_srcset(self):
+        """Проверка что карточка получает srcset всех ширин"""
+        generate_thumbnail(self.post.pk)
+        self.post.refresh_from_db()
+        sources = self.post.sources
+        fallback = mimetypes.guess_type(self.post.thumbnail_url)[0]
+        self.assertIn(fallback, sources)
+        for srcset in sources.values():
+            widths = [candidate.rsplit(' ', 1)[1]
+                      for candidate in srcset.split(', ')]
+            self.assertEqual(
+                widths, [f'{width}w' for width in settings.POST_IMAGE_WIDTHS]
+            )
+        response = Client().get(reverse('posts:all posts'))
+        self.assertContains(
+            response, f'srcset="{sources[fallback]}"'
+        )
+
+    def test_variant_formats(self):
+        """Проверка что неподдерживаемые форматы пропускаются"""
+        with self.settings(POST_IMAGE_FORMATS=('BMPX', 'PNG')):
+            self.assertEqual(variant_formats(), ['PNG'])
+        self.assertEqual(variant_geometry(480), '480x170')
+
+    def test_new_image_resets_thumbnail(self):
+        """Проверка что замена картинки сбрасывает миниатюру"""
+        generate_thumbnail(self.post.pk)
+        client = Client()
+        client.force_login(self.user)
+        client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+            data={
+                'text': 'Тестовый пост',
+                'image': SimpleUploadedFile(
+                    'other.gif', SMALL_GIF, 'image/gif'
+                ),
+            },
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.thumbnail_url, '')
+        self.assertEqual(self.post.image_sources, '')
+
+    def test_generate_thumbnails_command(self):
+        """Проверка команды пересоздания миниатюр"""
+        call_command('generate_thumbnails', '--workers', '1',
+                     stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertNotEqual(self.post.thumbnail_url, '')
+        self.assertNotEqual(self.post.image_sources, '')
+
+
+def photo(width, height, orientation):
+    """JPEG as phones save it, sideways with an EXIF orientation"""
+    exif = Image.Exif()
+    exif[EXIF_ORIENTATION] = orientation
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), 'red').save(buffer, 'JPEG',
+                                                  exif=exif.tobytes())
+    return SimpleUploadedFile('photo.jpg', buffer.getvalue(), 'image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_IMAGE_MAX_SIZE=64)
+class UploadProcessingTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        caches['default'].clear()
+        self.user = User.objects.create_user(username='auth')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def create(self, image):
+        self.client.post(reverse('posts:post_create'),
+                         data={'text': 'Тестовый пост', 'image': image})
+        return Post.objects.get()
+
+    def test_pending_post_shows_placeholder(self):
+        """Проверка что пост виден сразу, с заглушкой вместо картинки"""
+        post = self.create(photo(200, 100, 6))
+        self.assertTrue(post.image_pending)
+        for url in (reverse('posts:all posts'),
+                    reverse('posts:post_detail', args=(post.pk,))):
+            with self.subTest(url=url):
+                self.assertContains(Client().get(url),
+                                    'Картинка обрабатывается')
+
+    def test_image_cleaned(self):
+        """Проверка поворота по EXIF, удаления EXIF и уменьшения"""
+        post = self.create(photo(200, 100, 6))
+        uploaded = post.image.name
+        url = process_image(post.pk)
+        post.refresh_from_db()
+        self.assertFalse(post.image_pending)
+        self.assertEqual(post.thumbnail_url, url)
+        self.assertNotEqual(post.image.name, uploaded)
+        self.assertFalse(post.image.storage.exists(uploaded))
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (32, 64))
+            self.assertNotIn('exif', image.info)
+
+    def test_same_upload_cleaned_once(self):
+        """Проверка что одинаковые загрузки делят файл и миниатюры"""
+        first = self.create(photo(200, 100, 6))
+        process_image(first.pk)
+        first.refresh_from_db()
+        uploaded = Post.objects.create(author=self.user, text='Копия',
+                                       image=photo(200, 100, 6),
+                                       image_pending=True).image.name
+        second = Post.objects.latest('pk')
+        with mock.patch('posts.images.clean_image') as clean:
+            self.assertEqual(process_image(second.pk), first.thumbnail_url)
+        clean.assert_not_called()
+        second.refresh_from_db()
+        self.assertEqual(second.image.name, first.image.name)
+        self.assertEqual(Blob.objects.get(name=first.image.name).references,
+                         2)
+        self.assertFalse(first.image.storage.exists(uploaded))
+
+    def test_broken_image_dropped(self):
+        """Проверка что битая картинка убирается из поста"""
+        # the header is whole, the pixels are cut short
+        post = self.create(SimpleUploadedFile(
+            'broken.jpg', photo(200, 100, 6).read()[:700], 'image/jpeg'
+        ))
+        self.assertTrue(post.image_pending)
+        uploaded = post.image.name
+        with self.assertLogs('posts.images', 'WARNING'):
+            self.assertEqual(process_image(post.pk), '')
+        post.refresh_from_db()
+        self.assertEqual(post.image.name, '')
+        self.assertFalse(post.image_pending)
+        self.assertFalse(post.image.storage.exists(uploaded))
+
+    def test_stale_pending_images_recovered(self):
+        """Проверка что команда доделывает картинки, брошенные
+        остановленным воркером, и не трогает свежие"""
+        post = self.create(photo(200, 100, 6))
+        uploaded = post.image.name
+        call_command('generate_thumbnails', '--pending', '10',
+                     stdout=StringIO())
+        post.refresh_from_db()
+        self.assertTrue(post.image_pending)
+        stored = os.path.getmtime(post.image.path) - 11 * 60
+        os.utime(post.image.path, (stored, stored))
+        output = StringIO()
+        call_command('generate_thumbnails', '--pending', '10', stdout=output)
+        self.assertIn('Processed 1 pending images', output.getvalue())
+        post.refresh_from_db()
+        self.assertFalse(post.image_pending)
+        self.assertNotEqual(post.thumbnail_url, '')
+        self.assertFalse(post.image.storage.exists(uploaded))
+
+    def test_not_an_image_rejected(self):
+        """Проверка что не картинка отклоняется формой"""
+        response = self.client.post(reverse('posts:post_create'), data={
+            'text': 'Тестовый пост',
+            'image': SimpleUploadedFile('text.gif', b'text', 'image/gif'),
+        })
+        self.assertFormError(response, 'form', 'image', [
+            'Загрузите правильное изображение. Файл, который вы загрузили, '
+            'поврежден или не является изображением.'
+        ])
+        self.assertFalse(Post.objects.exists())
+
+
+def small_gif(number):
+    """GIF of its own content, stored apart from the others"""
+    buffer = BytesIO()
+    Image.new('L', (2, 1), number).save(buffer, 'GIF')
+    return SimpleUploadedFile(f'small_{number}.gif', buffer.getvalue(),
+                              'image/gif')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailQueryCountTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.follower = User.objects.create_user(username='follower')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='Test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.follower, author=cls.author)
+        for i in range(settings.SORTED_VALUES_AMOUNT):
+            post = Post.objects.create(
+                author=cls.author,
+                group=cls.group,
+                text=f'Тестовый пост {i}',
+                image=small_gif(i),
+            )
+            # rendered by sorl, but not stored on the post yet
+            make_thumbnail(post.image)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        caches['default'].clear()
+        caches['thumbnails'].clear()
+        self.client = Client()
+        self.client.force_login(self.follower)
+        # creates the lazy author stats row
+        self.client.get(reverse('posts:profile',
+                                kwargs={'username': self.author.username}))
+
+    def test_paginated_views_query_count(self):
+        """Проверка что миниатюры страницы читаются одним запросом,
+        а не запросом на каждую карточку"""
+        # index, group and profile read the newest post for their ETag,
+        # the cold group feed also fills its list of post ids
+        views = {
+            reverse('posts:all posts'): 5,
+            reverse('posts:sorted_posts',
+                    kwargs={'slug': self.group.slug}): 7,
+            reverse('posts:profile',
+                    kwargs={'username': self.author.username}): 8,
+            reverse('posts:follow_index'): 6,
+        }
+        for url, queries in views.items():
+            caches['default'].clear()
+            caches['thumbnails'].clear()
+            with self.subTest(url=url), self.assertNumQueries(queries):
+                response = self.client.get(url)
+            self.assertContains(
+                response, 'src="/media/cache/',
+                count=settings.SORTED_VALUES_AMOUNT
+            )
+            # one thumbnail of each post, none shared
+            self.assertEqual(len(set(re.findall(
+                r'src="(/media/cache/[^"]+)"', response.content.decode()
+            ))), settings.SORTED_VALUES_AMOUNT)
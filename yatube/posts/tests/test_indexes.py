@@ -0,0 +1,49 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..management.commands.explain_views import full_scans
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ExplainViewsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='author')
+        follower = User.objects.create_user(username='follower')
+        group = Group.objects.create(
+            title='Тестовая группа',
+            slug='Test-slug',
+            description='Тестовое описание',
+        )
+        for i in range(15):
+            Post.objects.create(
+                author=author, group=group, text=f'Тестовый пост {i}'
+            )
+        Follow.objects.create(user=follower, author=author)
+        Comment.objects.create(
+            post=Post.objects.first(), author=follower, text='Коммент'
+        )
+
+    def test_feed_queries_use_indexes(self):
+        """Проверка что запросы лент не читают таблицы целиком"""
+        out = StringIO()
+        call_command('explain_views', stdout=out)
+        self.assertIn('No full table scans', out.getvalue())
+
+    def test_full_scans(self):
+        """Проверка разбора EXPLAIN QUERY PLAN"""
+        plan = [
+            'SCAN posts_post',
+            'SCAN TABLE posts_group',
+            'SCAN posts_post USING INDEX post_created_id_idx',
+            'SEARCH auth_user USING INTEGER PRIMARY KEY (rowid=?)',
+            'SCAN CONSTANT ROW',
+        ]
+        self.assertEqual(
+            full_scans(plan), ['SCAN posts_post', 'SCAN TABLE posts_group']
+        )
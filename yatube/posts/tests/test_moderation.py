@@ -0,0 +1,144 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+
+from .. import fragments, groups, moderation, search, stats
+from ..models import (BannedWord, Comment, Follow, Group, Post,
+                      TimelineEntry, User)
+
+
+class ModerationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.spammer = User.objects.create_user(username='spammer')
+        self.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=self.reader, author=self.spammer)
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.other = Group.objects.create(
+            title='Другая', slug='other', description='Описание'
+        )
+        self.posts = [Post.objects.create(
+            author=self.spammer, group=self.group, text=f'Реклама {i}'
+        ) for i in range(3)]
+        for post in self.posts:
+            Comment.objects.create(post=post, author=self.reader,
+                                   text='Ответ')
+        self.kept = Post.objects.create(author=self.reader, text='Пост')
+        Comment.objects.create(post=self.kept, author=self.spammer,
+                               text='Купите рекламу')
+
+    def assertStatsExact(self, *users):
+        for user in users:
+            with self.subTest(user=user.username):
+                row = stats.get_stats(user)
+                self.assertEqual(
+                    {field: getattr(row, field) for field in stats.COUNTED},
+                    stats.count([user.pk])[user.pk]
+                )
+
+    def test_move_posts(self):
+        """Проверка переноса постов и сброса списков групп"""
+        groups.post_ids(self.group)
+        groups.post_ids(self.other)
+        generation = fragments.generation()
+        ids = [post.pk for post in self.posts[:2]]
+        self.assertEqual(moderation.move_posts(ids, self.other.pk), 2)
+        self.assertEqual(set(groups.post_ids(self.other)), set(ids))
+        self.assertEqual(groups.post_ids(self.group), [self.posts[2].pk])
+        self.assertNotEqual(fragments.generation(), generation)
+        self.assertEqual(moderation.move_posts(ids, self.other.pk), 0)
+
+    def test_delete_posts(self):
+        """Проверка удаления постов с комментариями, лентами,
+        поиском и счётчиками"""
+        for user in (self.spammer, self.reader):
+            stats.get_stats(user)
+        groups.post_ids(self.group)
+        ids = [post.pk for post in self.posts]
+        self.assertEqual(moderation.delete_posts(ids), 3)
+        self.assertFalse(Post.objects.filter(pk__in=ids).exists())
+        self.assertFalse(Comment.objects.filter(post__in=ids).exists())
+        self.assertFalse(TimelineEntry.objects.filter(post__in=ids).exists())
+        self.assertEqual(search.search('реклама')[0], [])
+        self.assertEqual(groups.post_ids(self.group), [])
+        self.assertStatsExact(self.spammer, self.reader)
+
+    def test_delete_comments(self):
+        """Проверка удаления комментариев и счётчиков"""
+        stats.get_stats(self.reader)
+        ids = list(Comment.objects.filter(
+            author=self.reader
+        ).values_list('pk', flat=True))
+        self.assertEqual(moderation.delete_comments(ids), 3)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertStatsExact(self.reader)
+
+    def test_censor(self):
+        """Проверка маскировки слов в постах и комментариях"""
+        BannedWord.objects.create(word='реклам')
+        ids = list(Comment.objects.values_list('pk', flat=True))
+        self.assertEqual(moderation.censor(Comment, ids), 1)
+        self.assertEqual(Comment.objects.get(author=self.spammer).text,
+                         'Купите ******у')
+        ids = [post.pk for post in self.posts]
+        self.assertEqual(moderation.censor(Post, ids), 3)
+        self.assertEqual(search.search('реклама')[0], [])
+        self.assertEqual(Post.objects.get(pk=ids[0]).text, '******а 0')
+
+    def test_queries_do_not_grow_with_rows(self):
+        """Проверка что удаление идёт пачками, а не по строке"""
+        def queries(ids):
+            with CaptureQueriesContext(connection) as captured:
+                moderation.delete_posts(ids)
+            return len(captured)
+
+        few = queries([self.posts[0].pk])
+        many = [Post.objects.create(author=self.spammer, text='Ещё').pk
+                for _ in range(20)]
+        self.assertEqual(queries(many), few)
+
+
+@override_settings(MESSAGE_STORAGE='django.contrib.messages.storage.'
+                                   'cookie.CookieStorage')
+class ModerationActionsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        admin = User.objects.create_superuser('admin', 'admin@example.com',
+                                              'password')
+        self.client.force_login(admin)
+        self.spammer = User.objects.create_user(username='spammer')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.posts = [Post.objects.create(author=self.spammer,
+                                          text=f'Пост {i}')
+                      for i in range(3)]
+        self.url = reverse('admin:posts_post_changelist')
+
+    def act(self, action, url=None, **data):
+        return self.client.post(url or self.url, {
+            'action': action, 'index': 0,
+            '_selected_action': [self.posts[0].pk], **data,
+        }, follow=True)
+
+    def test_move_to_group(self):
+        """Проверка действия переноса в группу"""
+        self.act('move_to_group', group=self.group.pk)
+        self.assertEqual(Post.objects.filter(group=self.group).count(), 1)
+        response = self.act('move_to_group')
+        self.assertContains(response, 'Выберите группу')
+
+    def test_delete_by_authors(self):
+        """Проверка удаления всего от автора после подтверждения"""
+        Comment.objects.create(post=self.posts[1], author=self.spammer,
+                               text='Комментарий')
+        response = self.act('delete_by_authors')
+        self.assertContains(response, 'spammer: 3')
+        self.assertEqual(Post.objects.count(), 3)
+        self.act('delete_by_authors', post='yes')
+        self.assertFalse(Post.objects.exists())
+        self.assertFalse(Comment.objects.exists())
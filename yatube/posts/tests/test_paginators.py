@@ -0,0 +1,108 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.test import TestCase
+
+from ..models import Post
+from ..paginators import KeysetPaginator, decode_cursor, encode_cursor
+
+User = get_user_model()
+
+TEST_POST_AMOUNT = 25
+PER_PAGE = 10
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.bulk_create(Post(
+            author=cls.user,
+            text=f'Тестовый пост {i}',
+        ) for i in range(TEST_POST_AMOUNT))
+        cls.expected = list(Post.objects.order_by('-created', '-pk'))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_is_django_paginator(self):
+        """Проверка совместимости с интерфейсом Paginator/Page"""
+        page = KeysetPaginator(Post.objects.all(), PER_PAGE).get_page(1)
+        self.assertIsInstance(page, Page)
+        self.assertIsInstance(page.paginator, Paginator)
+
+    def test_cursor_pages_match_offset_pages(self):
+        """Проверка что переход по курсору даёт те же страницы,
+        что и OFFSET"""
+        page = KeysetPaginator(Post.objects.all(), PER_PAGE).get_page(1)
+        number = 1
+        while page.has_next():
+            bottom = (number - 1) * PER_PAGE
+            with self.subTest(number=number):
+                self.assertEqual(
+                    list(page), self.expected[bottom:bottom + PER_PAGE]
+                )
+            number += 1
+            cursor = page.paginator.next_cursor
+            page = KeysetPaginator(
+                Post.objects.all(), PER_PAGE, after=cursor
+            ).get_page(number)
+        self.assertEqual(number, 3)
+        self.assertEqual(list(page), self.expected[2 * PER_PAGE:])
+
+    def test_previous_cursor(self):
+        """Проверка перехода на предыдущую страницу по курсору"""
+        third = KeysetPaginator(Post.objects.all(), PER_PAGE).get_page(3)
+        cursor = third.paginator.previous_cursor
+        second = KeysetPaginator(
+            Post.objects.all(), PER_PAGE, before=cursor
+        ).get_page(2)
+        self.assertEqual(list(second), self.expected[PER_PAGE:2 * PER_PAGE])
+        self.assertTrue(second.has_next())
+
+    def test_cursor_seek_skips_count(self):
+        """Проверка что последняя страница по курсору
+        читается одним запросом без COUNT"""
+        cursor = encode_cursor(self.expected[2 * PER_PAGE - 1])
+        paginator = KeysetPaginator(Post.objects.all(), PER_PAGE, after=cursor)
+        with self.assertNumQueries(1):
+            page = paginator.get_page(3)
+            self.assertFalse(page.has_next())
+            self.assertEqual(paginator.count, TEST_POST_AMOUNT)
+
+    def test_count_is_cached(self):
+        """Проверка что общее количество берётся из кэша"""
+        KeysetPaginator(Post.objects.all(), PER_PAGE).count
+        with self.assertNumQueries(0):
+            KeysetPaginator(Post.objects.all(), PER_PAGE).count
+
+    def test_page_out_of_range(self):
+        """Проверка что несуществующая страница отдаёт последнюю,
+        а не корректная - первую"""
+        paginator = KeysetPaginator(Post.objects.all(), PER_PAGE)
+        self.assertEqual(paginator.get_page(100).number, 3)
+        paginator = KeysetPaginator(Post.objects.all(), PER_PAGE)
+        self.assertEqual(paginator.get_page('abc').number, 1)
+
+    def test_broken_cursor(self):
+        """Проверка что испорченный курсор игнорируется"""
+        self.assertIsNone(decode_cursor('abc'))
+        self.assertIsNone(decode_cursor(None))
+        page = KeysetPaginator(
+            Post.objects.all(), PER_PAGE, after='abc'
+        ).get_page(2)
+        self.assertEqual(list(page), self.expected[PER_PAGE:2 * PER_PAGE])
+
+    def test_oversized_cursor(self):
+        """Проверка что курсор за пределами 64 бит не роняет ленту"""
+        huge = '9' * 23
+        for token in (f'{huge}-1', f'1-{huge}', f'-{huge}-1'):
+            with self.subTest(token=token):
+                self.assertIsNone(decode_cursor(token))
+        for cursor in ('after', 'before'):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(
+                    '/', {'page': 2, cursor: f'1-{huge}'}
+                )
+                self.assertEqual(response.status_code, 200)
@@ -0,0 +1,115 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import search
+from ..models import Post
+
+User = get_user_model()
+
+TEST_POST_AMOUNT = 25
+PER_PAGE = 10
+
+
+class SearchTestsMixin:
+    def setUp(self):
+        self.user = User.objects.create_user(username='auth')
+        self.often = Post.objects.create(
+            author=self.user, text='Кот, кот и ещё раз кот в саду'
+        )
+        self.once = Post.objects.create(
+            author=self.user, text='Кот гуляет в саду'
+        )
+        self.other = Post.objects.create(
+            author=self.user, text='Собака спит'
+        )
+
+    def test_ranking(self):
+        """Проверка что пост с большим числом совпадений выше"""
+        posts, next_cursor = search.search('КОТ')
+        self.assertEqual(posts, [self.often, self.once])
+        self.assertEqual(next_cursor, '')
+
+    def test_every_word_must_match(self):
+        """Проверка что находятся посты со всеми словами запроса"""
+        self.assertEqual(search.search('кот гуляет')[0], [self.once])
+        self.assertEqual(search.search('кот собака')[0], [])
+        self.assertEqual(search.search('"OR" -*')[0], [])
+
+    def test_index_follows_edit_and_delete(self):
+        """Проверка что индекс обновляется при правке и удалении"""
+        self.other.text = 'Кошка спит'
+        self.other.save()
+        self.assertEqual(search.search('кошка')[0], [self.other])
+        self.assertEqual(search.search('собака')[0], [])
+        self.other.delete()
+        self.assertEqual(search.search('кошка')[0], [])
+
+    def test_cursor_pagination(self):
+        """Проверка что курсор проходит все результаты без повторов"""
+        Post.objects.bulk_create(Post(
+            author=self.user, text=f'Кот номер {i}'
+        ) for i in range(TEST_POST_AMOUNT))
+        search.rebuild()
+        found = []
+        posts, cursor = search.search('кот', limit=PER_PAGE)
+        found += posts
+        while cursor:
+            posts, cursor = search.search('кот', cursor, limit=PER_PAGE)
+            found += posts
+        self.assertEqual(len(found), TEST_POST_AMOUNT + 2)
+        self.assertEqual(len(set(found)), len(found))
+        self.assertEqual(found[0], self.often)
+
+    def test_broken_cursor(self):
+        """Проверка что курсор с бесконечной оценкой или огромным id
+        ведёт на первую страницу"""
+        for token in ('1.0_' + '9' * 23, 'inf_1', 'nan_1', '-inf_1'):
+            with self.subTest(token=token):
+                self.assertIsNone(search.decode_cursor(token))
+                response = self.client.get(reverse('posts:search'),
+                                           {'q': 'гуляет', 'after': token})
+                self.assertEqual(response.context['posts'], [self.once])
+
+    def test_filter_queryset(self):
+        """Проверка фильтра для списка постов в админке
+        по редкому и частому слову"""
+        for share in (0, 1):
+            with self.subTest(share=share), override_settings(
+                SEARCH_COMMON_SHARE=share
+            ):
+                self.assertQuerysetEqual(
+                    search.filter_queryset(Post.objects.order_by('pk'),
+                                           'саду'),
+                    [self.often.pk, self.once.pk],
+                    transform=lambda post: post.pk,
+                )
+
+    def test_admin_changelist(self):
+        """Проверка что поиск в админке идёт через индекс"""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'гуляет'}
+        )
+        self.assertEqual(list(response.context['cl'].result_list),
+                         [self.once])
+
+    def test_search_page(self):
+        """Проверка страницы поиска"""
+        response = self.client.get(reverse('posts:search'), {'q': 'гуляет'})
+        self.assertTemplateUsed(response, 'posts/search.html')
+        self.assertEqual(response.context['posts'], [self.once])
+
+
+class FTSSearchTests(SearchTestsMixin, TestCase):
+    def test_uses_fts(self):
+        """Проверка что на SQLite используется FTS5"""
+        self.assertTrue(search.uses_fts())
+
+
+@override_settings(POST_SEARCH_FTS=False)
+class PythonSearchTests(SearchTestsMixin, TestCase):
+    pass
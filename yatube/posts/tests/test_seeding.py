@@ -0,0 +1,79 @@
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.db.models import F
+from django.test import TestCase
+
+from .. import feeds, search
+from ..models import Comment, Follow, Group, Post, User
+from ..seeding import Seeder
+
+USERS = 30
+POSTS = 200
+COMMENTS = 50
+
+
+class SeedingTests(TestCase):
+    raw = False
+
+    def seed(self, **options):
+        return Seeder(raw=self.raw, batch_size=64, **options).seed(
+            users=USERS, groups=3, posts=POSTS,
+            comments=COMMENTS, follows=4,
+        )
+
+    def test_rows_are_written(self):
+        """Проверка что все строки записаны и даты разбросаны"""
+        report = self.seed()
+        self.assertEqual(User.objects.count(), USERS)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), POSTS)
+        self.assertEqual(Comment.objects.count(), COMMENTS)
+        self.assertEqual(report['posts_post'][0], POSTS)
+        self.assertGreater(
+            Post.objects.values('created').distinct().count(), POSTS // 2
+        )
+        self.assertFalse(User.objects.filter(is_superuser=True).exists())
+
+    def test_timelines_and_search_are_filled(self):
+        """Проверка что ленты подписок и поиск заполнены"""
+        self.seed()
+        for user in User.objects.filter(following__isnull=False).distinct():
+            self.assertEqual(feeds.check(user), (set(), set()))
+        self.assertTrue(search.search('кот')[0])
+
+    def test_authors_follow_power_law(self):
+        """Проверка что у популярного автора большая доля постов"""
+        self.seed()
+        counts = sorted(
+            Post.objects.filter(author=user).count()
+            for user in User.objects.all()
+        )
+        self.assertGreater(counts[-1], POSTS / USERS * 3)
+        self.assertFalse(Follow.objects.filter(
+            user_id=F('author_id')
+        ).exists())
+
+    def test_prefix_must_be_new(self):
+        """Проверка что повторный запуск с тем же префиксом запрещён"""
+        self.seed()
+        with self.assertRaises(ValueError):
+            self.seed()
+        self.seed(prefix='again')
+        self.assertEqual(User.objects.count(), USERS * 2)
+
+
+class RawSeedingTests(SeedingTests):
+    raw = True
+
+
+class SeedCommandTests(TestCase):
+    def test_command_reports_speed(self):
+        """Проверка вывода команды seed_yatube"""
+        out = StringIO()
+        call_command('seed_yatube', '--users', '5', '--posts', '10',
+                     '--comments', '5', '--raw', stdout=out)
+        self.assertIn('posts_post: 10 rows', out.getvalue())
+        self.assertIn('rows/s', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('seed_yatube', '--users', '5', stdout=out)
@@ -0,0 +1,77 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Post, UserStats
+from ..stats import get_stats
+
+User = get_user_model()
+
+
+class UserStatsTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.follower = User.objects.create_user(username='follower')
+        self.post = Post.objects.create(author=self.author, text='Пост')
+        self.follower_client = Client()
+        self.follower_client.force_login(self.follower)
+
+    def assertStats(self, user, **expected):
+        stats = UserStats.objects.get(user=user)
+        for field, value in expected.items():
+            with self.subTest(field=field):
+                self.assertEqual(getattr(stats, field), value)
+
+    def test_stats_created_on_read(self):
+        """Проверка что строка счётчиков создаётся при первом чтении"""
+        self.assertFalse(UserStats.objects.filter(user=self.author).exists())
+        self.assertEqual(get_stats(self.author).posts, 1)
+
+    def test_counters_follow_views(self):
+        """Проверка обновления счётчиков из view-функций"""
+        get_stats(self.author)
+        get_stats(self.follower)
+        self.follower_client.post(
+            reverse('posts:post_create'), data={'text': 'Ещё пост'}
+        )
+        self.follower_client.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': self.author.username}
+        ))
+        self.follower_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            data={'text': 'Коммент'}
+        )
+        self.assertStats(self.author, posts=1, followers=1, following=0)
+        self.assertStats(self.follower, posts=1, following=1, comments=1)
+
+        self.follower_client.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.author.username}
+        ))
+        Comment.objects.all().delete()
+        self.post.delete()
+        self.assertStats(self.author, posts=0, followers=0)
+        self.assertStats(self.follower, following=0, comments=0)
+
+    def test_profile_reads_stored_counters(self):
+        """Проверка что профиль показывает сохранённые значения"""
+        Follow.objects.create(user=self.follower, author=self.author)
+        get_stats(self.author)
+        UserStats.objects.filter(user=self.author).update(posts=42)
+        response = self.follower_client.get(reverse(
+            'posts:profile', kwargs={'username': self.author.username}
+        ))
+        self.assertContains(response, 'Всего постов: 42')
+        self.assertContains(response, 'Всего подписчиков: 1')
+
+    def test_recount_stats(self):
+        """Проверка что recount_stats исправляет расхождения"""
+        get_stats(self.author)
+        UserStats.objects.filter(user=self.author).update(posts=42)
+        call_command('recount_stats', stdout=StringIO())
+        self.assertStats(self.author, posts=1)
+        self.assertStats(self.follower, posts=0)
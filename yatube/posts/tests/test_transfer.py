@@ -0,0 +1,120 @@
+import io
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .. import feeds, search, transfer
+from ..models import Comment, Follow, Group, Post, TimelineEntry, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class TransferTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.posts = [Post.objects.create(
+            author=self.author, group=self.group, text=f'Кот номер {i}'
+        ) for i in range(5)]
+        Post.objects.filter(pk=self.posts[0].pk).update(
+            created=timezone.now() - timedelta(days=30)
+        )
+        Comment.objects.create(post=self.posts[0], author=self.reader,
+                               text='Комментарий')
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def round_trip(self, columnar):
+        stream = io.BytesIO()
+        written = transfer.dump(stream, columnar, chunk_size=2)
+        expected = list(Post.objects.order_by('pk').values_list(
+            'pk', 'author', 'group', 'text', 'created'
+        ))
+        Post.objects.all().delete()
+        Group.objects.all().delete()
+        Follow.objects.all().delete()
+        stream.seek(0)
+        loaded = transfer.load(io.BufferedReader(stream), batch_size=2)
+        self.assertEqual(written['post'], 5)
+        self.assertEqual(loaded['post'], 5)
+        # users that are already here are kept
+        self.assertEqual(loaded['user'], 0)
+        self.assertEqual(list(Post.objects.order_by('pk').values_list(
+            'pk', 'author', 'group', 'text', 'created'
+        )), expected)
+        self.assertEqual(Comment.objects.get().author, self.reader)
+        self.assertEqual(TimelineEntry.objects.filter(
+            user=self.reader
+        ).count(), 5)
+        self.assertEqual(feeds.check(self.reader), (set(), set()))
+        self.assertEqual(len(search.search('кот')[0]), 5)
+
+    def test_ndjson_round_trip(self):
+        """Проверка выгрузки и загрузки в NDJSON"""
+        self.round_trip(columnar=False)
+
+    def test_columnar_round_trip(self):
+        """Проверка выгрузки и загрузки в колоночном формате"""
+        self.round_trip(columnar=True)
+
+    def test_ndjson_lines(self):
+        """Проверка что каждая строка NDJSON - одна запись"""
+        stream = io.BytesIO()
+        transfer.dump(stream)
+        lines = stream.getvalue().decode().splitlines()
+        self.assertEqual(len(lines), 2 + 1 + 5 + 1 + 1)
+        self.assertIn('"type": "post"', lines[3])
+
+    def test_load_refuses_foreign_users_and_posts(self):
+        """Проверка отказа при занятых id и непустой базе"""
+        stream = io.BytesIO()
+        transfer.dump(stream)
+        with self.assertRaises(transfer.TransferError):
+            transfer.load(io.BufferedReader(io.BytesIO(stream.getvalue())))
+        Post.objects.all().delete()
+        Group.objects.all().delete()
+        Follow.objects.all().delete()
+        User.objects.filter(pk=self.reader.pk).update(username='other')
+        with self.assertRaises(transfer.TransferError):
+            transfer.load(io.BufferedReader(io.BytesIO(stream.getvalue())))
+
+    def test_commands_copy_images(self):
+        """Проверка команд и копирования картинок"""
+        post = self.posts[1]
+        post.image.save('cat.gif', ContentFile(b'GIF89a'), save=True)
+        export_dir = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, export_dir, ignore_errors=True)
+        dump = os.path.join(export_dir, 'dump.bin')
+        media = os.path.join(export_dir, 'media')
+        call_command('export_posts', dump, '--columnar', '--media', media,
+                     stderr=io.StringIO())
+        self.assertTrue(FileSystemStorage(media).exists(post.image.name))
+        with self.assertRaises(CommandError):
+            call_command('import_posts', dump, stdout=io.StringIO())
+        Post.objects.all().delete()
+        Group.objects.all().delete()
+        Follow.objects.all().delete()
+        os.remove(os.path.join(TEMP_MEDIA_ROOT, post.image.name))
+        out = io.StringIO()
+        call_command('import_posts', dump, '--media', media, stdout=out)
+        self.assertIn('5 posts', out.getvalue())
+        self.assertIn('copied 1 images', out.getvalue())
+        self.assertTrue(os.path.exists(
+            os.path.join(TEMP_MEDIA_ROOT, post.image.name)
+        ))
@@ -8,6 +8,7 @@ from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
 
+from .. import images, stats
 from ..models import Group, Post, Comment, Follow
 from ..forms import PostForm, CommentForm
 
@@ -228,8 +229,8 @@ class PostViewTests(TestCase):
         response_form = response.context.get('form')
         self.assertIsInstance(response_form, CommentForm)
         self.assertEqual(response.context['post'], PostViewTests.some_post)
-        self.assertEqual(response.context['comments'].count(), comments_count)
-        self.assertEqual(response.context['comments'].last(), comment)
+        self.assertEqual(len(response.context['comments']), comments_count)
+        self.assertEqual(response.context['comments'][0], comment)
 
     def test_post_edit_contains_post_edit_form(self):
         """Проверка, что post_edit содержит форму PostForm"""
@@ -321,7 +322,7 @@ class PostViewTests(TestCase):
         )
         content_before_delete = response.context.get('page_obj').object_list
 
-        self.some_post.delete()
+        content_before_delete[0].delete()
         cache.delete('index_page')
 
         response_after_cache_delete = self.authorized_client.get(
@@ -423,6 +424,72 @@ class PostViewTests(TestCase):
         )
 
 
+class CommentPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+        Comment.objects.bulk_create(Comment(
+            post=cls.post,
+            author=User.objects.create_user(username=f'user_{i}'),
+            text=f'Тестовый коммент {i}',
+        ) for i in range(settings.COMMENTS_PER_PAGE + 5))
+        cls.expected = list(
+            Comment.objects.filter(post=cls.post).order_by('-created', '-pk')
+        )
+        stats.get_stats(cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_first_page_of_comments(self):
+        """Проверка что post_detail показывает одну страницу
+        комментариев и не читает авторов по одному"""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        comments = response.context['comments']
+        self.assertEqual(
+            list(comments), self.expected[:settings.COMMENTS_PER_PAGE]
+        )
+        self.assertContains(
+            response, reverse('posts:post_comments',
+                              kwargs={'post_id': self.post.pk})
+        )
+
+    def test_next_comments_fragment(self):
+        """Проверка фрагмента со следующей страницей комментариев"""
+        first = self.client.get(reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}
+        )).context['comments']
+        url = reverse('posts:post_comments',
+                      kwargs={'post_id': self.post.pk})
+        query = {'page': 2, 'after': first.paginator.next_cursor}
+        response = self.client.get(url, query)
+        self.assertTemplateUsed(response, 'posts/includes/comments_page.html')
+        self.assertEqual(
+            list(response.context['comments']),
+            self.expected[settings.COMMENTS_PER_PAGE:]
+        )
+        self.assertNotContains(response, 'comments-more')
+
+        data = self.client.get(url, {**query, 'format': 'json'}).json()
+        self.assertEqual(
+            [comment['id'] for comment in data['comments']],
+            [comment.pk for comment in
+             self.expected[settings.COMMENTS_PER_PAGE:]]
+        )
+        self.assertIsNone(data['next'])
+
+    def test_comments_of_missing_post(self):
+        """Проверка что для несуществующего поста отдаётся 404"""
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 0})
+        )
+        self.assertEqual(response.status_code, 404)
+
+
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class PostWithImageTests(TestCase):
     @classmethod
@@ -453,6 +520,8 @@ class PostWithImageTests(TestCase):
             group=cls.group,
             image=cls.uploaded,
         )
+        # as the thumbnail workers do once the post is committed
+        images.generate_thumbnail(cls.post.pk)
         cls.authorized_client = Client()
         cls.authorized_client.force_login(PostWithImageTests.user)
 
@@ -1,77 +1,137 @@
 from django.shortcuts import redirect, render, get_object_or_404
-from django.core.paginator import Paginator
+from django.core.paginator import Page
 from django.contrib.auth.decorators import login_required
-from django.http import HttpRequest
+from django.http import Http404, HttpRequest, JsonResponse
+from django.urls import reverse
 from django.conf import settings
 from django.db.models import QuerySet
 
-from .models import Post, Group, User, Follow
+from . import feeds, groups, identities, images, search, stats
+from .conditional import (conditional, group_state, index_state,
+                          post_state, profile_state)
+from .models import Comment, Post, Follow
 from .forms import PostForm, CommentForm
+from .paginators import IdListPaginator, KeysetPaginator
 
 
 def paginator_func(some_query: QuerySet,
                    request: HttpRequest,
                    list_per_page:
-                   int = settings.SORTED_VALUES_AMOUNT,) -> Paginator:
-    """To return Paginator object"""
-    paginator: Paginator = Paginator(some_query, list_per_page)
+                   int = settings.SORTED_VALUES_AMOUNT,
+                   paginator_class=KeysetPaginator,
+                   **options) -> Page:
+    """To return page of KeysetPaginator, the cursor of
+    the neighbour page is taken from the query string"""
+    paginator: KeysetPaginator = paginator_class(
+        some_query,
+        list_per_page,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        **options,
+    )
     page_number: int = request.GET.get('page')
-    page_obj: Paginator = paginator.get_page(page_number)
+    page_obj: Page = paginator.get_page(page_number)
     return page_obj
 
 
+def page_context(state) -> dict:
+    """To return the objects the validators of a page loaded"""
+    if state is None:
+        raise Http404
+    return state.context
+
+
+@conditional(index_state)
 def index(request):
     template = 'posts/index.html'
     post_list = Post.objects.select_related('author', 'group').all()
     page_obj = paginator_func(some_query=post_list,
                               request=request,)
+    images.resolve_thumbnails(page_obj)
     context = {'page_obj': page_obj, }
     return render(request, template, context)
 
 
+@conditional(group_state)
 def group_posts(request, slug):
     template = 'posts/group_list.html'
-    group = get_object_or_404(Group, slug=slug)
+    state = page_context(group_state(request, slug))
+    group = state['group']
     post_list = group.posts.select_related('author',).all()
     page_obj = paginator_func(some_query=post_list,
-                              request=request,)
+                              request=request,
+                              paginator_class=IdListPaginator,
+                              ids=groups.post_ids(group, state['newest']),
+                              limit=groups.cached_posts(),)
+    images.resolve_thumbnails(page_obj)
     context = {'group': group,
                'page_obj': page_obj, }
     return render(request, template, context)
 
 
+@conditional(profile_state)
 def profile(request, username):
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.select_related('group').all()
+    context = page_context(profile_state(request, username))
+    post_list = context['author'].posts.select_related('group').all()
     page_obj = paginator_func(some_query=post_list,
                               request=request,)
+    images.resolve_thumbnails(page_obj)
 
-    if request.user.is_authenticated and Follow.objects.filter(
-            user=request.user,
-            author=author).exists():
-        following = True
-    else:
-        following = False
-
-    context = {'author': author,
-               'page_obj': page_obj,
-               'following': following}
+    context = {**context,
+               'page_obj': page_obj, }
     return render(request, template, context)
 
 
+def comments_func(post_id: int, request: HttpRequest) -> Page:
+    """To return a page of comments of a post with their authors"""
+    comments = Comment.objects.filter(
+        post_id=post_id
+    ).select_related('author')
+    return paginator_func(some_query=comments,
+                          request=request,
+                          list_per_page=settings.COMMENTS_PER_PAGE,)
+
+
+@conditional(post_state)
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post.objects.select_related('author'), pk=post_id)
-    comments = post.comments.all()
+    post = page_context(post_state(request, post_id))['post']
     form = CommentForm()
     context = {'post': post,
-               'comments': comments,
+               'author_stats': stats.get_stats(post.author),
+               'comments': comments_func(post_id, request),
                'form': form,
                }
     return render(request, template, context)
 
 
+def post_comments(request, post_id):
+    """Next pages of comments of post_detail, as an html fragment
+    or as JSON with ?format=json"""
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    comments = comments_func(post_id, request)
+    if request.GET.get('format') != 'json':
+        return render(request, 'posts/includes/comments_page.html',
+                      {'comments': comments})
+    next_url = None
+    if comments.paginator.next_cursor:
+        next_url = (
+            f"{reverse('posts:post_comments', args=(post_id,))}"
+            f'?format=json&page={comments.number + 1}'
+            f'&after={comments.paginator.next_cursor}'
+        )
+    return JsonResponse({
+        'comments': [{
+            'id': comment.pk,
+            'author': comment.author.username,
+            'text': comment.text,
+            'created': comment.created,
+        } for comment in comments],
+        'next': next_url,
+    })
+
+
 @login_required
 def post_create(request):
     template = 'posts/create_post.html'
@@ -82,7 +142,9 @@ def post_create(request):
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
+        post.image_pending = bool(post.image)
         post.save()
+        images.schedule(post)
         return redirect('posts:profile', post.author)
     context = {'form': form}
     return render(request, template, context)
@@ -94,13 +156,22 @@ def post_edit(request, post_id):
     if post.author != request.user:
         return redirect('posts:post_detail', post_id)
     template = 'posts/create_post.html'
+    previous_image = post.image.name
     form = PostForm(
         request.POST or None,
         instance=post,
         files=request.FILES or None,
     )
     if form.is_valid():
-        form.save()
+        post = form.save(commit=False)
+        image_changed = 'image' in form.changed_data
+        if image_changed:
+            post.thumbnail_url = post.image_sources = ''
+            post.image_pending = bool(post.image)
+        post.save()
+        if image_changed:
+            images.release(previous_image)
+            images.schedule(post)
         return redirect('posts:post_detail', post_id)
 
     context = {'form': form,
@@ -123,11 +194,17 @@ def add_comment(request, post_id):
 @login_required
 def follow_index(request):
     template = 'posts/follow.html'
-    posts = Post.objects.filter(
-        author__following__user=request.user
-    ).select_related('author', 'group')
-    page_obj = paginator_func(some_query=posts,
-                              request=request,)
+    if feeds.uses_timeline(request.user):
+        page_obj = paginator_func(some_query=feeds.timeline(request.user),
+                                  request=request,)
+        page_obj.object_list = [entry.post for entry in page_obj]
+    else:
+        posts = Post.objects.filter(
+            author__following__user=request.user
+        ).select_related('author', 'group')
+        page_obj = paginator_func(some_query=posts,
+                                  request=request,)
+    images.resolve_thumbnails(page_obj)
     context = {'page_obj': page_obj, }
 
     return render(request, template, context)
@@ -135,7 +212,9 @@ def follow_index(request):
 
 @login_required
 def profile_follow(request, username):
-    author = get_object_or_404(User, username=username)
+    author = identities.users.get(username)
+    if author is None:
+        raise Http404
 
     if request.user.username != username:
         Follow.objects.get_or_create(
@@ -150,7 +229,9 @@ def profile_follow(request, username):
 
 @login_required
 def profile_unfollow(request, username):
-    author = get_object_or_404(User, username=username)
+    author = identities.users.get(username)
+    if author is None:
+        raise Http404
 
     subscription = author.following.filter(user=request.user)
 
@@ -159,3 +240,14 @@ def profile_unfollow(request, username):
         'posts:profile',
         author
     )
+
+
+def post_search(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    posts, next_cursor = search.search(query, after=request.GET.get('after'))
+    images.resolve_thumbnails(posts)
+    context = {'query': query,
+               'posts': posts,
+               'next_cursor': next_cursor, }
+    return render(request, template, context)
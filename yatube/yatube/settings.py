@@ -48,6 +48,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -79,6 +80,18 @@ TEMPLATES = [
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# MEDIA_URL served by core.media, with or without DEBUG; off when the
+# front server maps it to MEDIA_ROOT itself
+MEDIA_SERVE = True
+MEDIA_BLOCK_SIZE = 256 * 1024
+# hash-named files never change, the others may be replaced
+MEDIA_IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+MEDIA_MAX_AGE = 60 * 60
+# 'x-accel-redirect' hands the files to nginx at the internal location
+# MEDIA_ACCEL_PREFIX aliased to MEDIA_ROOT, 'x-sendfile' to Apache
+# mod_xsendfile or lighttpd; unset, they are sent from Python
+MEDIA_ACCEL = os.getenv('YATUBE_MEDIA_ACCEL') or None
+MEDIA_ACCEL_PREFIX = '/protected-media/'
 
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
@@ -137,17 +150,161 @@ USE_TZ = True
 
 SORTED_VALUES_AMOUNT = 10
 
+COMMENTS_PER_PAGE = 20
+
+# full-text search uses SQLite FTS5 when the migration could create
+# its table, off falls back to the SearchTerm table
+POST_SEARCH_FTS = True
+# admin searches walk the rows in page order for words found in
+# more than this share of posts
+SEARCH_COMMON_SHARE = 0.1
+
+PAGINATOR_COUNT_CACHE_TIMEOUT = 60
+
+# admin changelists estimate the number of rows past this many
+ADMIN_EXACT_COUNT_LIMIT = 10000
+
+FOLLOW_FEED_FANOUT = True
+FOLLOW_FEED_MAX_FOLLOWERS = 10000
+FOLLOW_FEED_MAX_FOLLOWING = 1000
+FOLLOW_FEED_BROADCAST_TIMEOUT = 300
+
 SYMBOL_RESTRICTION_FOR_POST_NAME = 15
 
+FEED_CACHE_TIMEOUT = 60 * 60 * 24
+# pages of a group feed served from its cached list of post ids
+GROUP_FEED_CACHED_PAGES = 5
+
+# locmem keeps a copy per worker process, sqlite is shared by all
+# workers of the host through one file
+CACHE_BACKEND = os.getenv('YATUBE_CACHE_BACKEND', 'locmem')
+# entries kept until invalidated (fragments, post id lists, identities)
+# live CACHE_LOCAL_TIMEOUT seconds at most in a cache per process: the
+# invalidations of one worker do not reach the copies of the others
+CACHE_SHARED = CACHE_BACKEND != 'locmem'
+CACHE_LOCAL_TIMEOUT = 20
+
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'sqlite': {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.getenv('YATUBE_CACHE_LOCATION',
+                              os.path.join(BASE_DIR, 'cache.sqlite3')),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+
 CACHES = {
-    'default': {
+    'default': CACHE_BACKENDS[CACHE_BACKEND],
+    # sorl caches a class sentinel only pickle can store, its key-value
+    # store is kept in the database anyway
+    'thumbnails': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'LOCATION': 'thumbnails',
+    },
 }
 
+THUMBNAIL_CACHE = 'thumbnails'
+
+POST_THUMBNAIL_GEOMETRY = '960x339'
+POST_THUMBNAIL_OPTIONS = {'crop': 'center', 'upscale': True}
+# responsive variants of the thumbnail, same crop at every width;
+# formats Pillow cannot write are skipped
+POST_IMAGE_WIDTHS = (320, 480, 720, 960)
+POST_IMAGE_FORMATS = ('AVIF', 'WEBP')
+# uploads are stored scaled down to this many pixels a side, upright
+# and without EXIF, by the thumbnail workers
+POST_IMAGE_MAX_SIZE = 2560
+POST_IMAGE_QUALITY = 85
+# every upload is written to a temporary file chunk by chunk instead
+# of being held in memory: PostForm reads the image header from the
+# file rather than a copy in memory, saving it then moves the file.
+# The chunks are hashed on the way for the content-addressed storage
+# of Post.image
+FILE_UPLOAD_HANDLERS = [
+    'core.storage.HashingUploadHandler',
+]
+# 0 renders in the committing thread
+THUMBNAIL_WORKERS = 2
+
+# Group.slug and User.username lookups: shared cache, and an LRU per
+# process, which the other processes' signals can not reach; without
+# CACHE_SHARED the cache is kept IDENTITY_LOCAL_TIMEOUT too
+IDENTITY_CACHE_TIMEOUT = 60 * 60
+IDENTITY_CACHE_SIZE = 10000
+IDENTITY_LOCAL_TIMEOUT = 5
+
+# text file of words masked in comments, one per line,
+# on top of the BannedWord table
+COMMENT_BLACKLIST_FILE = os.getenv('YATUBE_COMMENT_BLACKLIST_FILE')
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/2.2/howto/static-files/
 
 STATIC_URL = '/static/'
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
+
+# per request metrics of core.metrics: one JSON line per request to
+# the core.metrics logger and histograms at /metrics/. Budgets map a
+# view name to limits of queries, db_ms, render_ms, total_ms,
+# cache_hits or cache_misses; going over logs a warning, or raises
+REQUEST_METRICS = True
+REQUEST_BUDGETS_RAISE = False
+REQUEST_BUDGETS = {
+    'posts:all posts': {'queries': 10},
+    'posts:sorted_posts': {'queries': 10},
+    'posts:follow_index': {'queries': 10},
+    # the first view of a profile builds its UserStats row
+    'posts:profile': {'queries': 20},
+    'posts:post_detail': {'queries': 20},
+    'posts:post_comments': {'queries': 5},
+    'posts:search': {'queries': 10},
+    # post_create and post_edit are left out: under tests thumbnails
+    # of the saved image render inside the request
+    'posts:add_comment': {'queries': 10},
+}
+# /metrics/ is open to staff and to scrapers sending
+# "Authorization: Bearer <token>"
+REQUEST_METRICS_TOKEN = os.getenv('YATUBE_METRICS_TOKEN')
+# render time and cache reads are counted by wrapping Template.render
+# and get and get_many of the backend classes of these cache aliases,
+# for every instance in the process
+REQUEST_METRICS_TEMPLATES = True
+REQUEST_METRICS_CACHES = ['default']
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.metrics': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        # progress of the bulk moderation actions of the admin
+        'posts.moderation': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+TEST_RUNNER = 'core.runner.TestRunner'
+# applied over the settings above while tests run, by TEST_RUNNER and
+# by the conftest.py of pytest
+TEST_SETTINGS = {
+    # no worker may outlive the test database and media directory
+    'THUMBNAIL_WORKERS': 0,
+    # rolled back rows send no signals to the LRU of posts.identities
+    'IDENTITY_LOCAL_TIMEOUT': 0,
+    'REQUEST_BUDGETS_RAISE': True,
+    # the only process of the run sees every invalidation
+    'CACHE_SHARED': True,
+}